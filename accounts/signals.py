@@ -32,6 +32,15 @@ def log_successful_login(sender, request, user, **kwargs):
     )
 
 
+@receiver(user_logged_in)
+def merge_guest_cart_on_login(sender, request, user, **kwargs):
+    # Keep what the visitor put in their cart before logging in
+    if not request or not hasattr(request, 'session'):
+        return
+    from cart.identity import merge_guest_cart
+    merge_guest_cart(request, user)
+
+
 @receiver(user_login_failed)
 def log_failed_login(sender, credentials, request, **kwargs):
     email = ''
@@ -1,3 +1,84 @@
+import io
+
+import openpyxl
 from django.test import TestCase
+from django.urls import reverse
+
+from aromas.exports import format_datetime
+from .models import Account, LoginAttempt
+from .reports import USER_REPORT_HEADER, user_counts, user_report, user_report_rows
+
+
+class UserReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Account.objects.create_user('Sam', 'Staff', 'sam', 'sam@example.com', 'secret')
+        cls.staff.is_active = True
+        cls.staff.is_staff = True
+        cls.staff.save()
+        cls.asha = Account.objects.create_user('Asha', 'Rao', 'asha', 'asha@example.com', 'secret')
+        cls.asha.is_active = True
+        cls.asha.save()
+        cls.bala = Account.objects.create_user('Bala', 'Iyer', 'bala', 'bala@example.com', 'secret')
+        for success in [True, False, True]:
+            LoginAttempt.objects.create(user=cls.asha, email=cls.asha.email, success=success)
+        LoginAttempt.objects.create(email='nobody@example.com')
+
+    def test_user_report_annotations(self):
+        with self.assertNumQueries(1):
+            report = {user.username: user for user in user_report()}
+
+        self.assertEqual(list(report), ['bala', 'asha', 'sam'])
+        self.assertEqual((report['asha'].total_login_attempts, report['asha'].successful_logins), (3, 2))
+        self.assertIsNotNone(report['asha'].last_login_attempt)
+        self.assertEqual((report['bala'].total_login_attempts, report['bala'].successful_logins), (0, 0))
+        self.assertIsNone(report['bala'].last_login_attempt)
+
+    def test_user_counts(self):
+        with self.assertNumQueries(1):
+            counts = user_counts()
+        self.assertEqual(counts, {'total_users': 3, 'active_users': 2, 'inactive_users': 1})
+
+    def test_user_report_rows(self):
+        rows = list(user_report_rows(chunk_size=1))
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(len(row) == len(USER_REPORT_HEADER) for row in rows))
+
+        bala, asha = rows[0], rows[1]
+        self.assertEqual(asha[:5], [self.asha.pk, 'asha@example.com', 'asha', 'Asha', 'Rao'])
+        self.assertEqual(bala[12:14], [format_datetime(self.bala.date_joined), format_datetime(self.bala.last_login)])
+        self.assertEqual(asha[14:], ['Yes', 'No', 'No', 3, 2])
+        self.assertEqual(bala[14], 'No')
+
+    def test_view_all_users(self):
+        self.client.force_login(self.staff)
+        context = self.client.get(reverse('admin_view_users')).context
+        self.assertEqual(context['total_users'], 3)
+        self.assertEqual(context['inactive_users'], 1)
+
+    def test_csv_export(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin_export_users_csv'))
+        self.assertTrue(response.streaming)
+        self.assertRegex(response['Content-Disposition'], r'filename="all_users_\d{8}_\d{6}\.csv"')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), USER_REPORT_HEADER)
+        self.assertEqual([line.split(',')[2] for line in lines[1:]], ['bala', 'asha', 'sam'])
+
+    def test_excel_export(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('admin_export_users_excel'))
+        self.assertRegex(response['Content-Disposition'], r'filename="all_users_\d{8}_\d{6}\.xlsx"')
+
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content)))['All Users']
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), USER_REPORT_HEADER)
+        self.assertEqual([row[2] for row in rows[1:]], ['bala', 'asha', 'sam'])
+        # force_login counts as a successful login for the staff user
+        self.assertEqual(rows[3][-2:], (1, 1))
 
-# Create your tests here.
+    def test_exports_are_staff_only(self):
+        self.client.force_login(self.asha)
+        for name in ['admin_export_users_csv', 'admin_export_users_excel']:
+            self.assertEqual(self.client.get(reverse(name)).status_code, 302)
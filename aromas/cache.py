@@ -0,0 +1,139 @@
+"""
+Caching helpers shared by the apps.
+
+Cached data is grouped in namespaces. Each namespace has a version token in
+the cache and every key embeds it, so invalidating a namespace is a single
+write (bump the token) and the old entries simply stop being read and
+expire on their own. The version tokens must live in a cache every worker
+shares (Redis, or the file cache production falls back to); the local
+memory backend is only used in development and tests.
+
+    @cache_on_model(Product, Category, namespace='store:facets')
+    def get_store_facets():
+        ...
+
+caches the result until a Product or Category is saved or deleted.
+"""
+import functools
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+VERSION_KEY = 'version:{}'
+
+# Model label -> namespaces invalidated by its changes
+_model_namespaces = {}
+
+
+def get_version(namespace):
+    """Get the current version token of a namespace (creating one if missing)"""
+    version = cache.get(VERSION_KEY.format(namespace))
+    if version is None:
+        version = bump_version(namespace)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate everything cached in a namespace"""
+    version = uuid.uuid4().hex[:12]
+    cache.set(VERSION_KEY.format(namespace), version, None)
+    return version
+
+
+def versioned_key(namespace, *parts):
+    """Build a cache key that is invalidated together with its namespace"""
+    key = ':'.join(str(part) for part in (namespace, get_version(namespace)) + parts)
+    if len(key) > 200:
+        key = f'{namespace}:{hashlib.md5(key.encode()).hexdigest()}'
+    return key
+
+
+def invalidate_on_change(namespace, *models):
+    """
+    Bump a namespace's version whenever one of the models is saved or deleted.
+
+    The version is bumped immediately and again once the surrounding
+    transaction commits, so a request that reads the old rows in between
+    cannot leave stale data cached under the new version.
+
+    Args:
+        namespace: Cache namespace to invalidate
+        *models: Model classes whose changes invalidate it
+    """
+    def receiver(sender, **kwargs):
+        if kwargs.get('raw'):
+            return
+        bump_version(namespace)
+        transaction.on_commit(lambda: bump_version(namespace))
+
+    for model in models:
+        _model_namespaces.setdefault(model._meta.label, set()).add(namespace)
+        for action, signal in (('save', post_save), ('delete', post_delete)):
+            signal.connect(
+                receiver, sender=model, weak=False,
+                dispatch_uid=f'cache:{namespace}:{model._meta.label}:{action}',
+            )
+    return receiver
+
+
+def invalidate_model(model):
+    """
+    Invalidate every namespace that depends on ``model``.
+
+    For bulk changes (queryset update(), bulk_create()) that do not send
+    post_save, so the signal-driven invalidation does not run.
+    """
+    namespaces = _model_namespaces.get(model._meta.label, ())
+
+    def bump_all():
+        for namespace in namespaces:
+            bump_version(namespace)
+
+    bump_all()
+    transaction.on_commit(bump_all)
+
+
+def cache_on_model(*models, namespace=None, timeout=60 * 60, local=False):
+    """
+    Cache a function's result until one of ``models`` changes.
+
+    Args:
+        *models: Model classes whose save/delete invalidates the result
+        namespace: Cache namespace (defaults to the function's dotted path)
+        timeout: Seconds to keep a result (safety net; signals normally
+            invalidate first)
+        local: Also keep the latest result in process memory, so a hit costs
+            one version lookup instead of fetching and unpickling the value
+
+    The decorated function gets ``invalidate()`` to drop its results
+    explicitly and ``namespace`` for building related keys.
+    """
+    def decorator(func):
+        ns = namespace or f'{func.__module__}.{func.__qualname__}'
+        local_results = {}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            arg_key = hashlib.md5(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+            key = versioned_key(ns, arg_key)
+            if local and key in local_results:
+                return local_results[key]
+
+            result = cache.get(key)
+            if result is None:
+                result = func(*args, **kwargs)
+                cache.set(key, result, timeout)
+            if local:
+                local_results.clear()
+                local_results[key] = result
+            return result
+
+        wrapper.namespace = ns
+        wrapper.invalidate = lambda: bump_version(ns)
+        invalidate_on_change(ns, *models)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,64 @@
+"""
+Streaming file exports shared by the admin views.
+
+Exports are written row by row into a StreamingHttpResponse instead of
+being built in memory, so their size is limited only by the client. Rows
+should come from querysets read with ``.iterator(chunk_size=EXPORT_CHUNK_SIZE)``
+and, where possible, ``values_list`` projections, so the database
+driver never holds more than one chunk either.
+
+    return streaming_csv_response('orders.csv', header, rows)
+"""
+import csv
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class Echo:
+    """File-like object whose write() returns the data instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def format_datetime(value, default=''):
+    """Format a datetime in the local time zone for an export cell"""
+    if not value:
+        return default
+    return timezone.localtime(value).strftime(DATETIME_FORMAT)
+
+
+def timestamped_filename(prefix, extension):
+    """e.g. all_users_20241215_103000.csv"""
+    return f"{prefix}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+
+def iter_csv(header, rows):
+    """Yield the CSV lines for a header and an iterable of rows"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def streaming_csv_response(filename, header, rows):
+    """
+    Stream rows to the client as a CSV download.
+
+    Args:
+        filename: Name offered to the browser
+        header: Column titles
+        rows: Iterable of row sequences, consumed lazily while streaming
+
+    Returns:
+        StreamingHttpResponse
+    """
+    response = StreamingHttpResponse(iter_csv(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
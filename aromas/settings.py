@@ -78,6 +78,7 @@ INSTALLED_APPS = [
     'notifications',
     'loyalty',
     'seller',
+    'tasks',
 ]
 
 MIDDLEWARE = [
@@ -141,6 +142,40 @@ else:
     }
 
 
+# Cache
+# Use Redis if REDIS_URL is set (shared by all workers). Without it,
+# production falls back to a file cache, which the gunicorn workers also
+# share: a per-process memory cache would only see the namespace version
+# bumps (aromas/cache.py) made by its own worker, and the others would keep
+# serving stale pages. The in-process memory cache is for development and
+# tests only.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_DIR = os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache'))
+file_cache = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': CACHE_DIR,
+    'TIMEOUT': 300,
+}
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'aromas',
+            'TIMEOUT': 300,
+        }
+    }
+elif DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'aromas',
+            'TIMEOUT': 300,
+        }
+    }
+else:
+    CACHES = {'default': file_cache}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -283,4 +318,25 @@ if RAZORPAY_ENABLED:
         raise ValueError("RAZORPAY_ENABLED is True but RAZORPAY_KEY_SECRET is not set in .env file")
 
 # When RAZORPAY_ENABLED = True, customers can pay online via Razorpay
-# When RAZORPAY_ENABLED = False, only Cash on Delivery (COD) is available
\ No newline at end of file
+# When RAZORPAY_ENABLED = False, only Cash on Delivery (COD) is available
+
+# Stock held for orders awaiting online payment is released after this many
+# minutes (run `python manage.py release_expired_reservations` periodically)
+STOCK_RESERVATION_TTL_MINUTES = int(os.environ.get('STOCK_RESERVATION_TTL_MINUTES', 15))
+
+# Order numbers reserved per process at a time. 1 keeps daily numbers
+# gap-free; raise it during big sales so checkouts don't queue on the counter.
+ORDER_NUMBER_BLOCK_SIZE = int(os.environ.get('ORDER_NUMBER_BLOCK_SIZE', 1))
+
+# A repeated checkout / payment request with the same idempotency key gets the
+# first response for this many minutes (run `python manage.py
+# purge_idempotency_keys` periodically to delete expired keys)
+IDEMPOTENCY_KEY_TTL_MINUTES = int(os.environ.get('IDEMPOTENCY_KEY_TTL_MINUTES', 30))
+
+# Background tasks (order notifications, customer invoice emails).
+# By default they run in the web process right after the request's
+# transaction commits, so emails go out without any extra process.
+# IMPORTANT: setting TASKS_ALWAYS_EAGER=False moves them to the
+# `python manage.py run_tasks` worker; if no worker is running, tasks stay
+# pending and NO order emails are sent.
+TASKS_ALWAYS_EAGER = env_bool('TASKS_ALWAYS_EAGER', True)
@@ -5,6 +5,11 @@ import os
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = False
 
+# The base settings chose the cache from the DEBUG environment variable;
+# here the workers always need one they share (see CACHES in settings.py)
+if not REDIS_URL:
+    CACHES = {'default': file_cache}
+
 # ALLOWED_HOSTS from environment variable
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "193.203.162.238").split(",")
 ALLOWED_HOSTS = [host.strip() for host in ALLOWED_HOSTS if host.strip()]
@@ -0,0 +1,103 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from category.models import Category
+from store.models import Product
+from .cache import bump_version, cache_on_model, get_version, invalidate_model, invalidate_on_change, versioned_key
+from .exports import format_datetime, iter_csv, streaming_csv_response, timestamped_filename
+
+calls = []
+
+
+@cache_on_model(Category, namespace='tests:categories')
+def category_names(prefix=''):
+    calls.append(prefix)
+    return [prefix + name for name in Category.objects.order_by('id').values_list('Category_name', flat=True)]
+
+
+@cache_on_model(Category, namespace='tests:local', local=True)
+def category_count():
+    calls.append('count')
+    return Category.objects.count()
+
+
+invalidate_on_change('tests:products', Product)
+
+
+class VersionedCacheTests(TestCase):
+    def setUp(self):
+        calls.clear()
+        category_names.invalidate()
+        category_count.invalidate()
+
+    def test_versions_change_when_bumped(self):
+        version = get_version('tests:ns')
+        self.assertEqual(get_version('tests:ns'), version)
+        self.assertNotEqual(bump_version('tests:ns'), version)
+        self.assertNotEqual(versioned_key('tests:ns', 'a'), f'tests:ns:{version}:a')
+
+    def test_long_keys_are_hashed(self):
+        key = versioned_key('tests:ns', 'x' * 300)
+        self.assertLessEqual(len(key), 200)
+        self.assertTrue(key.startswith('tests:ns:'))
+
+    def test_result_cached_per_arguments(self):
+        Category.objects.create(Category_name='Attar', slug='attar')
+        self.assertEqual(category_names(), ['Attar'])
+        with self.assertNumQueries(0):
+            self.assertEqual(category_names(), ['Attar'])
+        self.assertEqual(category_names(prefix='#'), ['#Attar'])
+        self.assertEqual(calls, ['', '#'])
+
+    def test_model_change_invalidates(self):
+        category = Category.objects.create(Category_name='Attar', slug='attar')
+        category_names()
+        category.Category_name = 'Oud'
+        category.save()
+        self.assertEqual(category_names(), ['Oud'])
+        category.delete()
+        self.assertEqual(category_names(), [])
+        self.assertEqual(len(calls), 3)
+
+    def test_local_results_still_check_the_version(self):
+        self.assertEqual(category_count(), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(category_count(), 0)
+        Category.objects.create(Category_name='Attar', slug='attar')
+        self.assertEqual(category_count(), 1)
+        self.assertEqual(calls, ['count', 'count'])
+
+    def test_invalidate_model_covers_bulk_changes(self):
+        # Queryset updates send no signals, so callers invalidate explicitly
+        version = get_version('tests:products')
+        invalidate_model(Product)
+        self.assertNotEqual(get_version('tests:products'), version)
+
+
+class ExportHelperTests(SimpleTestCase):
+    def test_iter_csv_yields_one_line_per_row(self):
+        lines = list(iter_csv(['Name', 'Note'], iter([['Oud', 'rich, woody'], ['Musk', '']])))
+        self.assertEqual(lines, ['Name,Note\r\n', 'Oud,"rich, woody"\r\n', 'Musk,\r\n'])
+
+    def test_rows_are_consumed_while_streaming(self):
+        consumed = []
+
+        def rows():
+            for name in ['Oud', 'Musk']:
+                consumed.append(name)
+                yield [name]
+
+        response = streaming_csv_response('products.csv', ['Name'], rows())
+        self.assertEqual(consumed, [])
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.csv"')
+        self.assertEqual(b''.join(response.streaming_content), b'Name\r\nOud\r\nMusk\r\n')
+        self.assertEqual(consumed, ['Oud', 'Musk'])
+
+    @override_settings(TIME_ZONE='Asia/Kolkata')
+    def test_format_datetime_uses_local_time(self):
+        self.assertEqual(format_datetime(datetime(2025, 1, 15, 4, 30, tzinfo=dt_timezone.utc)), '2025-01-15 10:00:00')
+        self.assertEqual(format_datetime(None, default='Never'), 'Never')
+
+    def test_timestamped_filename(self):
+        self.assertRegex(timestamped_filename('all_users', 'xlsx'), r'^all_users_\d{8}_\d{6}\.xlsx$')
@@ -25,6 +25,7 @@ from . import views
 from .admin_utils import download_database
 from accounts.admin_views import view_all_users, export_users_excel, export_users_csv
 from accounts.views import honeypot_admin_login
+from orders.admin_views import export_orders_csv
 
 urlpatterns = [
     path('admin/', honeypot_admin_login, name='admin_honeypot'),
@@ -33,6 +34,7 @@ urlpatterns = [
     path(f'{settings.ADMIN_URL}view-users/', view_all_users, name='admin_view_users'),
     path(f'{settings.ADMIN_URL}export-users-excel/', export_users_excel, name='admin_export_users_excel'),
     path(f'{settings.ADMIN_URL}export-users-csv/', export_users_csv, name='admin_export_users_csv'),
+    path(f'{settings.ADMIN_URL}export-orders-csv/', export_orders_csv, name='admin_export_orders_csv'),
     # Django admin URLs
     path(settings.ADMIN_URL, admin.site.urls),
     path('', views.home, name='home'),
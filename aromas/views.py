@@ -4,20 +4,13 @@ from django.http import FileResponse, Http404
 from django.conf import settings
 import os
 
-from store.models import Product, Banner
+from store.home import HomePage
 
 
 def home(request):
-    products = Product.objects.all().filter(is_available=True)
-    print(products)  # debugging purpose for products
-    print("products fetched successfully")  # debugging purpose for products
-    
-    # Get active banner from database
-    banner = Banner.get_active_banner()
-    
+    # Sections are loaded lazily; cached template fragments skip the queries
     context = {
-        'products': products,
-        'banner': banner,
+        'home': HomePage(),
     }
     return render(request, 'home.html', context)
 
@@ -0,0 +1,128 @@
+"""
+JSON cart API for changing the cart without reloading the page.
+
+    POST /cart/api/add/<product_id>/                 quantity, variation choices
+    POST /cart/api/items/<cart_item_id>/quantity/    quantity
+    POST /cart/api/items/<cart_item_id>/remove/
+
+Every call makes its change and reads the new cart state in one
+transaction and answers with the changed line, the cart totals and the
+badge count:
+
+    {"success": true, "message": "...", "item": {...} or null,
+     "totals": {...}, "cart_count": 3}
+
+Amounts are strings (Decimals from cart.pricing).
+"""
+from django.db import transaction
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_POST
+
+from orders.stock import available_stock
+from store.models import Product
+from .identity import get_cart
+from .lines import add_line, remove_line, resolve_variations, set_line_quantity
+from .models import CartItem
+from .snapshot import get_cart_snapshot, mark_cart_changed
+
+
+def _quantity(request, default=None):
+    try:
+        return int(request.POST.get('quantity', default))
+    except (TypeError, ValueError):
+        return None
+
+
+def _line_data(line):
+    return {
+        'id': line.item.id,
+        'product_id': line.product.id,
+        'product_name': line.product.product_name,
+        'quantity': line.quantity,
+        'unit_price': str(line.unit_price),
+        'line_total': str(line.line_total),
+    }
+
+
+def _cart_response(request, cart_item_id=None, message='', success=True, status=200):
+    """Build the response from the (freshly invalidated) cart snapshot"""
+    snapshot = get_cart_snapshot(request)
+    totals = snapshot.totals(request.session.get('coupon_discount', 0))
+    line = next((line for line in totals if line.item.id == cart_item_id), None)
+    return JsonResponse({
+        'success': success,
+        'message': message,
+        'item': _line_data(line) if line else None,
+        'totals': {
+            'quantity': totals.quantity,
+            'subtotal': str(totals.subtotal),
+            'discount': str(totals.discount),
+            'gst': str(totals.gst),
+            'grand_total': str(totals.grand_total),
+        },
+        'cart_count': totals.quantity,
+    }, status=status)
+
+
+@require_POST
+def add(request, product_id):
+    """Add units of a product (with posted variation choices) to the cart"""
+    product = get_object_or_404(Product, id=product_id)
+    quantity = _quantity(request, default=1)
+    if not quantity or quantity < 1:
+        return JsonResponse({'success': False, 'message': 'Invalid quantity.'}, status=400)
+
+    stock = available_stock(product)
+    if not product.is_available or stock <= 0:
+        return JsonResponse({'success': False, 'message': f'{product.product_name} is currently out of stock.'}, status=409)
+
+    variations = resolve_variations(product, request.POST)
+    if product.variation_set.filter(is_active=True).exists() and not variations:
+        return JsonResponse({'success': False, 'message': 'Please choose the product options.'}, status=400)
+
+    with transaction.atomic():
+        cart = get_cart(request, create=True)
+        added = add_line(cart, product, variations, quantity=quantity, stock=stock)
+        mark_cart_changed(request)
+        cart_item_id = CartItem.objects.filter(
+            cart=cart, product=product, is_active=True,
+            variation_signature=CartItem.make_variation_signature(v.id for v in variations),
+        ).values_list('id', flat=True).first()
+        if not added:
+            return _cart_response(
+                request, cart_item_id, success=False, status=409,
+                message=f'Only {stock} units of {product.product_name} are available.',
+            )
+        return _cart_response(request, cart_item_id, message=f'{product.product_name} added to cart.')
+
+
+@require_POST
+def set_quantity(request, cart_item_id):
+    """Set a line's quantity (limited to the available stock; 0 removes it)"""
+    quantity = _quantity(request)
+    if quantity is None:
+        return JsonResponse({'success': False, 'message': 'Invalid quantity.'}, status=400)
+
+    with transaction.atomic():
+        try:
+            cart_item = set_line_quantity(get_cart(request), cart_item_id, quantity)
+        except CartItem.DoesNotExist:
+            return JsonResponse({'success': False, 'message': 'Item not found in your cart.'}, status=404)
+        mark_cart_changed(request)
+        if cart_item is None:
+            return _cart_response(request, message='Item removed from cart.')
+        message = 'Cart updated.'
+        if cart_item.quantity < quantity:
+            message = f'Only {cart_item.quantity} units of {cart_item.product.product_name} are available.'
+        return _cart_response(request, cart_item.id, message=message)
+
+
+@require_POST
+def remove(request, cart_item_id):
+    """Remove a line from the cart"""
+    with transaction.atomic():
+        if not remove_line(get_cart(request), cart_item_id):
+            return JsonResponse({'success': False, 'message': 'Item not found in your cart.'}, status=404)
+        mark_cart_changed(request)
+        return _cart_response(request, message='Item removed from cart.')
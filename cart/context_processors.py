@@ -1,18 +1,9 @@
-from .models import Cart, CartItem
+from django.utils.functional import SimpleLazyObject
 
-def _cart_id(request):
-    cart = request.session.session_key
-    if not cart:
-        cart = request.session.create()
-    return cart
+from .snapshot import get_cart_snapshot
 
-def cart(request):
-    try:
-        cart = Cart.objects.get(cart_id=_cart_id(request))
-        cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-        cart_count = sum([item.quantity for item in cart_items])
-    except Cart.DoesNotExist:
-        cart_count = 0
-    
-    return dict(cart_count=cart_count)
 
+def cart(request):
+    # Lazy, so pages that never show the cart badge do not load the cart,
+    # and no session is created for visitors without one
+    return dict(cart_count=SimpleLazyObject(lambda: get_cart_snapshot(request).count))
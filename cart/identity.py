@@ -0,0 +1,162 @@
+"""
+Which cart belongs to the current visitor.
+
+Guests are identified by a cart token stored in their session data (not
+the session key, which Django rotates at login). Logged-in users own one
+cart through Cart.user and are looked up by that indexed foreign key, so
+their cart follows them across devices and sessions.
+
+When a guest logs in (``user_logged_in``, see accounts/signals.py) their
+guest cart is merged into the user's cart with a few set-based statements:
+quantities of lines both carts have are added up, the remaining guest
+lines are moved over, the guest cart is deleted, and the merged lines are
+brought back within the stock that is available to sell.
+"""
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum
+
+from .models import Cart, CartItem
+from .stock import reconcile_cart_stock
+
+SESSION_CART_KEY = 'cart_id'
+
+
+def get_cart_id(request, create=False):
+    """
+    Get the guest cart token from the session.
+
+    Sessions from before the token was introduced are keyed by their
+    session key, which is adopted as the token.
+
+    Args:
+        request: Current request
+        create: Assign a token if the session has none
+
+    Returns:
+        str: The cart token, or None if there is none and create is False
+    """
+    session = request.session
+    cart_id = session.get(SESSION_CART_KEY)
+    if cart_id:
+        return cart_id
+    if not create:
+        return session.session_key
+    cart_id = session.session_key or uuid.uuid4().hex
+    session[SESSION_CART_KEY] = cart_id
+    return cart_id
+
+
+def cart_lookup(request):
+    """
+    Filter selecting the current visitor's cart.
+
+    Returns:
+        dict: Lookup for Cart (prefix with ``cart__`` for CartItem), or None
+            if the visitor has no cart token yet
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return {'user_id': user.id}
+    cart_id = get_cart_id(request)
+    if not cart_id:
+        return None
+    return {'cart_id': cart_id, 'user__isnull': True}
+
+
+def get_cart(request, create=False):
+    """
+    Get the current visitor's cart.
+
+    Args:
+        request: Current request
+        create: Create the cart if the visitor has none
+
+    Returns:
+        Cart: The cart, or None if there is none and create is False
+    """
+    lookup = cart_lookup(request)
+    cart = Cart.objects.filter(**lookup).order_by('id').first() if lookup else None
+    if cart is None and create:
+        user = request.user if request.user.is_authenticated else None
+        cart = Cart.objects.create(cart_id=get_cart_id(request, create=True), user=user)
+    return cart
+
+
+def _merge_into(target, source):
+    """Merge the active lines of ``source`` into ``target`` and delete ``source``"""
+    source_lines = CartItem.objects.filter(cart=source, is_active=True)
+    same_line = source_lines.filter(
+        product_id=OuterRef('product_id'),
+        variation_signature=OuterRef('variation_signature'),
+    )
+
+    # Lines both carts have: add the guest quantity
+    CartItem.objects.filter(cart=target, is_active=True).filter(Exists(same_line)).update(
+        quantity=F('quantity') + Subquery(
+            same_line.order_by().values('product_id').annotate(total=Sum('quantity')).values('total')[:1]
+        )
+    )
+
+    # Lines only the guest cart has: move them (with their variations)
+    in_target = CartItem.objects.filter(
+        cart=target, is_active=True,
+        product_id=OuterRef('product_id'),
+        variation_signature=OuterRef('variation_signature'),
+    )
+    source_lines.exclude(Exists(in_target)).update(cart=target)
+
+    source.delete()
+
+
+def _guest_cart_id(request):
+    """
+    The guest cart token of a login request.
+
+    Django rotates the session key (``cycle_key``) before ``user_logged_in``
+    is sent, so for sessions from before the cart token was introduced the
+    pre-login key is read from the session cookie the request came with.
+    """
+    return request.session.get(SESSION_CART_KEY) or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+
+
+def merge_guest_cart(request, user):
+    """
+    Bind the session's guest cart to a user who just logged in.
+
+    The guest cart becomes the user's cart if they have none; otherwise it
+    is merged into their cart (as is any duplicate cart the user has), and
+    the merged quantities are limited to the stock available to sell.
+
+    Args:
+        request: Login request (its session or session cookie identifies the guest cart)
+        user: User who logged in
+    """
+    from .snapshot import mark_cart_changed
+
+    cart_id = _guest_cart_id(request)
+    carts = Q(user=user)
+    if cart_id:
+        carts |= Q(cart_id=cart_id, user__isnull=True)
+    carts = list(Cart.objects.filter(carts).order_by('id'))
+    if not carts:
+        return
+
+    # Keep the user's oldest cart, or adopt the guest cart
+    target = next((cart for cart in carts if cart.user_id == user.id), carts[0])
+    with transaction.atomic():
+        if target.user_id is None:
+            Cart.objects.filter(id=target.id).update(user=user)
+        for cart in carts:
+            if cart.id != target.id:
+                _merge_into(target, cart)
+        if len(carts) > 1:
+            reconcile_cart_stock(
+                target, list(CartItem.objects.filter(cart=target, is_active=True).select_related('product')),
+            )
+
+    if target.cart_id:
+        request.session[SESSION_CART_KEY] = target.cart_id
+    mark_cart_changed(request)
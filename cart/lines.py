@@ -0,0 +1,127 @@
+"""
+Changing cart lines.
+
+Shared by the cart pages (which redirect) and the JSON cart API. Adding
+units is a single conditional statement, and setting a quantity checks
+the stock with the product row locked (as checkout does), so concurrent
+requests cannot push a line past the stock that is available to sell.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from orders.stock import available_stock, lock_products
+from store.models import Variation
+from .models import CartItem
+
+IGNORED_FIELDS = ('csrfmiddlewaretoken', 'quantity')
+
+
+def resolve_variations(product, data):
+    """
+    Resolve posted variation choices (category -> value) in one query.
+
+    Args:
+        product: Product being added
+        data: Posted form data
+
+    Returns:
+        list: Matching active Variation objects
+    """
+    selected = Q(pk__in=[])
+    for key in data.keys():
+        if key in IGNORED_FIELDS:
+            continue
+        value = data.get(key)
+        if value:
+            selected |= Q(variation_category__iexact=key, variation_value__iexact=value)
+    return list(Variation.objects.filter(selected, product=product, is_active=True))
+
+
+def add_line(cart, product, variations=(), quantity=1, stock=None):
+    """
+    Add units of a product (with the chosen variations) to a cart.
+
+    The line for a product and variation combination is unique, so the
+    units are added to it if it exists, otherwise it is created. A
+    concurrent request creating the same line makes the create fail; then
+    the units are added instead.
+
+    Args:
+        cart: Cart to add to
+        product: Product to add
+        variations: Selected Variation objects
+        quantity: Units to add
+        stock: Units available to sell (looked up if not given)
+
+    Returns:
+        bool: False if the line would exceed the available stock
+    """
+    if stock is None:
+        stock = available_stock(product)
+    variation_signature = CartItem.make_variation_signature(v.id for v in variations)
+    cart_line = CartItem.objects.filter(
+        cart=cart, product=product, variation_signature=variation_signature, is_active=True,
+    )
+
+    def add_units():
+        return cart_line.filter(quantity__lte=stock - quantity).update(quantity=F('quantity') + quantity)
+
+    if add_units():
+        return True
+    if quantity > stock:
+        return False
+    try:
+        with transaction.atomic():
+            cart_item = CartItem.objects.create(
+                product=product, cart=cart, quantity=quantity, variation_signature=variation_signature,
+            )
+            if variations:
+                cart_item.variations.set(variations)
+        return True
+    except IntegrityError:
+        return bool(add_units())
+
+
+def set_line_quantity(cart, cart_item_id, quantity):
+    """
+    Set the quantity of a cart line, limited to the available stock.
+
+    Args:
+        cart: Cart the line must belong to
+        cart_item_id: Line to change
+        quantity: New quantity (0 or less removes the line)
+
+    Returns:
+        CartItem: The updated line, or None if it was removed
+
+    Raises:
+        CartItem.DoesNotExist: If the line is not in the cart
+    """
+    cart_item = CartItem.objects.get(id=cart_item_id, cart=cart, is_active=True)
+    cart_line = CartItem.objects.filter(id=cart_item.id, cart=cart, is_active=True)
+    if quantity <= 0:
+        cart_line.delete()
+        return None
+
+    with transaction.atomic():
+        # Checkout locks the product too, so the stock read here cannot be
+        # sold or held before the line is updated
+        cart_item.product = lock_products([cart_item.product_id])[cart_item.product_id]
+        cart_item.quantity = min(quantity, available_stock(cart_item.product))
+        if cart_item.quantity <= 0:
+            cart_line.delete()
+            return None
+        if not cart_line.update(quantity=cart_item.quantity):
+            raise CartItem.DoesNotExist('Cart line was removed')
+    return cart_item
+
+
+def remove_line(cart, cart_item_id):
+    """
+    Remove a line from a cart.
+
+    Returns:
+        bool: True if the line was in the cart
+    """
+    deleted, _ = CartItem.objects.filter(id=cart_item_id, cart=cart).delete()
+    return bool(deleted)
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:10
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Fill in variation_signature and merge active lines that now collide"""
+    CartItem = apps.get_model('cart', 'CartItem')
+    Through = CartItem.variations.through
+
+    variation_ids = defaultdict(list)
+    for cartitem_id, variation_id in Through.objects.values_list('cartitem_id', 'variation_id').iterator():
+        variation_ids[cartitem_id].append(variation_id)
+
+    lines = {}
+    for item in CartItem.objects.order_by('id').iterator():
+        item.variation_signature = ','.join(str(v) for v in sorted(set(variation_ids.get(item.id, []))))
+        key = (item.cart_id, item.product_id, item.variation_signature)
+        if item.is_active and key in lines:
+            kept = lines[key]
+            kept.quantity += item.quantity
+            kept.save(update_fields=['quantity'])
+            item.delete()
+            continue
+        item.save(update_fields=['variation_signature'])
+        if item.is_active:
+            lines[key] = item
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0004_remove_orderproduct_order_and_more'),
+        ('store', '0009_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='variation_signature',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Sorted ids of the selected variations', max_length=255),
+        ),
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('cart', 'product', 'variation_signature'), name='cart_cartitem_unique_line'),
+        ),
+    ]
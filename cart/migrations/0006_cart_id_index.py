@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_cartitem_variation_signature'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cart',
+            name='cart_id',
+            field=models.CharField(blank=True, db_index=True, help_text="Guest cart token kept in the visitor's session", max_length=250),
+        ),
+    ]
@@ -4,7 +4,8 @@ from accounts.models import Account
 
 
 class Cart(models.Model):
-    cart_id = models.CharField(max_length=250, blank=True)
+    cart_id = models.CharField(max_length=250, blank=True, db_index=True,
+                               help_text="Guest cart token kept in the visitor's session")
     user = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True,
                             help_text="User if logged in, null for guest")
     date_added = models.DateField(auto_now_add=True)
@@ -12,6 +13,7 @@ class Cart(models.Model):
     abandoned_at = models.DateTimeField(null=True, blank=True)
     reminder_sent = models.BooleanField(default=False)
     reminder_count = models.IntegerField(default=0)
+    version = models.PositiveIntegerField(default=0, help_text="Bumped on every change to the cart's lines")
 
     def __str__(self):
         if self.user:
@@ -23,11 +25,28 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE)
     variations = models.ManyToManyField(Variation, blank=True)
+    variation_signature = models.CharField(max_length=255, blank=True, default='', editable=False,
+                                           help_text="Sorted ids of the selected variations")
     quantity = models.IntegerField()
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            # One active line per product and variation combination
+            models.UniqueConstraint(
+                fields=['cart', 'product', 'variation_signature'],
+                condition=models.Q(is_active=True),
+                name='cart_cartitem_unique_line',
+            ),
+        ]
+
+    @staticmethod
+    def make_variation_signature(variation_ids):
+        """Canonical form of a set of variation ids (e.g. '3,12')"""
+        return ','.join(str(variation_id) for variation_id in sorted(set(variation_ids)))
+
     def sub_total(self):
-        return self.product.price * self.quantity
+        return self.product.get_current_price() * self.quantity
 
     def __str__(self):
         return self.product.product_name
@@ -0,0 +1,107 @@
+"""
+Cart pricing.
+
+One place computes what a cart costs: the cart page, checkout and
+create_order_from_cart all price the cart through ``price_cart``. Amounts
+are Decimals rounded to paise.
+
+Prices are GST inclusive, so the grand total is the subtotal minus the
+coupon discount; the GST contained in each line is worked out from the
+product's gst_percentage for the tax breakdown. The coupon discount is
+spread over the lines in proportion to their value before the GST is
+extracted, so the breakdown matches what the customer actually pays.
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+PAISE = Decimal('0.01')
+
+
+def to_money(value):
+    """Convert a number to a Decimal rounded to paise"""
+    return Decimal(str(value or 0)).quantize(PAISE, rounding=ROUND_HALF_UP)
+
+
+def unit_price(product):
+    """Price charged for one unit of a product (its sale price while on sale)"""
+    return to_money(product.get_current_price())
+
+
+def included_gst(amount, rate):
+    """GST contained in a GST-inclusive amount"""
+    rate = Decimal(rate or 0)
+    if not rate:
+        return Decimal('0.00')
+    return to_money(amount * rate / (100 + rate))
+
+
+class PricedLine:
+    """A cart item with its price worked out"""
+
+    def __init__(self, item):
+        self.item = item
+        self.product = item.product
+        self.quantity = item.quantity
+        self.unit_price = unit_price(item.product)
+        self.line_total = self.unit_price * item.quantity
+        self.gst_rate = Decimal(item.product.gst_percentage or 0)
+        self.gst = Decimal('0.00')
+
+
+class CartTotals:
+    """
+    Line and order totals for a cart.
+
+    Attributes:
+        lines: PricedLine per cart item
+        quantity: Total number of units
+        subtotal: Sum of the line totals
+        discount: Coupon discount applied (never more than the subtotal)
+        grand_total: Amount payable (subtotal - discount, GST included)
+        gst: GST included in the grand total
+        gst_breakdown: GST rate -> GST amount
+        taxable_value: Grand total excluding GST
+    """
+
+    def __init__(self, items, discount=0):
+        self.lines = [PricedLine(item) for item in items]
+        self.quantity = sum(line.quantity for line in self.lines)
+        self.subtotal = sum((line.line_total for line in self.lines), Decimal('0.00'))
+        self.discount = min(to_money(discount), self.subtotal)
+        self.grand_total = self.subtotal - self.discount
+
+        breakdown = defaultdict(Decimal)
+        for line in self.lines:
+            share = line.line_total
+            if self.discount and self.subtotal:
+                share -= to_money(self.discount * line.line_total / self.subtotal)
+            line.gst = included_gst(share, line.gst_rate)
+            breakdown[line.gst_rate] += line.gst
+        self.gst_breakdown = dict(sorted(breakdown.items()))
+        self.gst = sum(self.gst_breakdown.values(), Decimal('0.00'))
+        self.taxable_value = self.grand_total - self.gst
+
+    def unit_prices(self):
+        """Cart item id -> unit price charged"""
+        return {line.item.id: line.unit_price for line in self.lines}
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+
+def price_cart(items, discount=0):
+    """
+    Price cart items.
+
+    Args:
+        items: CartItem objects with their products loaded
+            (select_related('product'), as the cart snapshot does)
+        discount: Coupon discount for the cart
+
+    Returns:
+        CartTotals: Line totals, order totals and the GST breakdown
+    """
+    return CartTotals(items, discount)
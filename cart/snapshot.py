@@ -0,0 +1,141 @@
+"""
+Request-scoped cart snapshot.
+
+The navbar badge, the store listings, the product page and the cart page
+all need to know what is in the visitor's cart. They share one lazily
+loaded snapshot per request instead of each querying the cart again.
+
+The badge count and product ids are also kept in the session, stamped with
+the cart's id and version. The version lives on the Cart row and is bumped
+on every cart change (``mark_cart_changed``), so a change made from another
+device is noticed too. Checking it is a single indexed row read; the cart
+lines are only loaded again when the version moved.
+"""
+from django.db.models import F
+from django.utils.functional import cached_property
+
+from .identity import cart_lookup
+from .models import Cart, CartItem
+from .pricing import price_cart
+
+SESSION_SUMMARY_KEY = 'cart_summary'
+
+
+class CartSnapshot:
+    """
+    Cart contents for the current session, loaded on first use.
+
+    ``items`` costs one query (cart items with their products); ``count``
+    and ``product_ids`` are answered from the session summary when it is
+    still current, and from ``items`` otherwise.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.lookup = cart_lookup(request)
+        self._totals = {}
+
+    @cached_property
+    def version(self):
+        """
+        Version stamp of the visitor's cart: [cart id, cart version].
+
+        Returns:
+            list: The stamp (a list, as it is stored in the session), or None
+                if the visitor has no cart
+        """
+        if not self.lookup:
+            return None
+        row = Cart.objects.filter(**self.lookup).order_by('id').values_list('id', 'version').first()
+        return list(row) if row else None
+
+    @cached_property
+    def items(self):
+        if not self.lookup:
+            return []
+        return list(
+            CartItem.objects.filter(is_active=True, **{f'cart__{key}': value for key, value in self.lookup.items()})
+            .select_related('product')
+            .order_by('id')
+        )
+
+    @cached_property
+    def _summary(self):
+        if self.version is None:
+            return {'count': 0, 'product_ids': []}
+
+        session = self.request.session
+        summary = session.get(SESSION_SUMMARY_KEY)
+        if summary and summary.get('version') == self.version:
+            return summary
+
+        summary = {
+            'version': self.version,
+            'count': sum(item.quantity for item in self.items),
+            'product_ids': sorted({item.product_id for item in self.items}),
+        }
+        session[SESSION_SUMMARY_KEY] = summary
+        return summary
+
+    @property
+    def count(self):
+        """Total quantity of all items (the cart badge)"""
+        return self._summary['count']
+
+    @cached_property
+    def product_ids(self):
+        return set(self._summary['product_ids'])
+
+    def totals(self, discount=0):
+        """
+        Price the cart (see cart.pricing), memoized per discount.
+
+        Returns:
+            CartTotals: Line and order totals
+        """
+        key = str(discount)
+        if key not in self._totals:
+            self._totals[key] = price_cart(self.items, discount)
+        return self._totals[key]
+
+    @property
+    def total(self):
+        return self.totals().subtotal
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def get_cart_snapshot(request):
+    """
+    Get the cart snapshot shared by everything handling this request.
+
+    Args:
+        request: Current request
+
+    Returns:
+        CartSnapshot: Lazy snapshot (no query until it is used)
+    """
+    snapshot = getattr(request, '_cart_snapshot', None)
+    if snapshot is None or snapshot.lookup != cart_lookup(request):
+        snapshot = CartSnapshot(request)
+        request._cart_snapshot = snapshot
+    return snapshot
+
+
+def mark_cart_changed(request):
+    """
+    Invalidate the cart snapshot after the cart was modified.
+
+    Bumps the version on the cart row, so the badge summary cached in any
+    session of this cart is rebuilt, and drops the summary and snapshot
+    already loaded for this request.
+    """
+    lookup = cart_lookup(request)
+    if lookup:
+        Cart.objects.filter(**lookup).update(version=F('version') + 1)
+    request.session.pop(SESSION_SUMMARY_KEY, None)
+    request._cart_snapshot = None
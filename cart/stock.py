@@ -0,0 +1,70 @@
+"""
+Keeping cart lines within the stock that is left.
+
+The cart page removes lines whose product is unavailable or sold out and
+lowers quantities above the stock that is available to sell (stock minus
+the units held for unpaid orders, see orders.stock). Both are done with
+one statement each, however many lines the cart has; the loaded cart
+items are used to work out what needs fixing and to report what changed.
+"""
+from django.db.models import Case, F, IntegerField, Value, When
+
+from orders.stock import active_holds
+from .models import CartItem
+
+
+class CartAdjustments:
+    """What reconcile_cart_stock changed in a cart"""
+
+    def __init__(self, removed=None, adjusted=None):
+        self.removed = removed or []
+        self.adjusted = adjusted or []
+
+    def __bool__(self):
+        return bool(self.removed or self.adjusted)
+
+
+def reconcile_cart_stock(cart, items):
+    """
+    Bring a cart in line with the stock that is available to sell.
+
+    Args:
+        cart: Cart to fix
+        items: The cart's active items with their products loaded (e.g. the
+            cart snapshot's items)
+
+    Returns:
+        CartAdjustments: Products removed, and (product, new quantity) pairs
+            whose quantity was lowered
+    """
+    if not items:
+        return CartAdjustments()
+
+    held = active_holds({item.product_id for item in items})
+    available = {
+        item.product_id: max(item.product.stock - held.get(item.product_id, 0), 0) if item.product.is_available else 0
+        for item in items
+    }
+    removed = {item.product_id: item.product for item in items if available[item.product_id] <= 0}
+    adjusted = {
+        item.product_id: item.product
+        for item in items
+        if item.product_id not in removed and item.quantity > available[item.product_id]
+    }
+    if not removed and not adjusted:
+        return CartAdjustments()
+
+    lines = CartItem.objects.filter(cart=cart, is_active=True)
+    if removed:
+        lines.filter(product_id__in=removed).delete()
+    if adjusted:
+        lines.filter(product_id__in=adjusted).update(quantity=Case(
+            *[When(product_id=product_id, quantity__gt=available[product_id], then=Value(available[product_id]))
+              for product_id in adjusted],
+            default=F('quantity'),
+            output_field=IntegerField(),
+        ))
+    return CartAdjustments(
+        list(removed.values()),
+        [(product, available[product_id]) for product_id, product in adjusted.items()],
+    )
@@ -1,3 +1,396 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import login
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account
+from category.models import Category
+from orders.models import Order, StockReservation
+from store.models import Product, Variation
+from .lines import add_line, resolve_variations, set_line_quantity
+from .models import Cart, CartItem
+from .pricing import price_cart
+from .snapshot import get_cart_snapshot, mark_cart_changed
+from .stock import reconcile_cart_stock
+
+
+class CartTestMixin:
+    """Users and products shared by the cart tests"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(Category_name='Attar', slug='attar')
+        cls.user = Account.objects.create_user('Asha', 'Rao', 'asha', 'asha@example.com', 'secret')
+        cls.user.is_active = True
+        cls.user.save()
+        cls.oud = cls.create_product('Oud')
+        cls.musk = cls.create_product('Musk')
+
+    @classmethod
+    def create_product(cls, name, price=500, stock=10, **fields):
+        return Product.objects.create(
+            product_name=name, slug=name.lower().replace(' ', '-'), price=price, stock=stock,
+            category=cls.category, images=f'photos/products/{name.lower()}.jpg', **fields,
+        )
+
+    def hold(self, product, quantity, expires_in=timedelta(minutes=15)):
+        """Hold stock for another customer's unpaid order"""
+        order = Order.objects.create(
+            user=self.user, order_number=f'hold-{StockReservation.objects.count()}', first_name='Asha',
+            last_name='Rao', phone='9999999999', email='asha@example.com', address_line_1='1 Street',
+            city='Pune', state='MH', country='India', order_total=0, tax=0,
+        )
+        return StockReservation.objects.create(
+            order=order, product=product, quantity=quantity, expires_at=timezone.now() + expires_in,
+        )
+
+    def request(self, user=None, session=None):
+        """A request with its own session (or the given one)"""
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        if session is None:
+            session = SessionStore()
+            session.create()
+        request.session = session
+        return request
+
+
+class CartSnapshotTests(CartTestMixin, TestCase):
+    def setUp(self):
+        self.cart = Cart.objects.create(cart_id='user-cart', user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.oud, quantity=2)
+
+    def test_summary_is_served_from_session(self):
+        session = SessionStore()
+        session.create()
+        snapshot = get_cart_snapshot(self.request(self.user, session))
+        self.assertEqual(snapshot.count, 2)
+        self.assertEqual(snapshot.product_ids, {self.oud.id})
+
+        # Next page: only the cart version is read, not the cart lines
+        with self.assertNumQueries(1):
+            snapshot = get_cart_snapshot(self.request(self.user, session))
+            self.assertEqual(snapshot.count, 2)
+
+    def test_change_from_another_device_refreshes_summary(self):
+        phone, laptop = self.request(self.user), self.request(self.user)
+        self.assertEqual(get_cart_snapshot(phone).count, 2)
+
+        CartItem.objects.create(cart=self.cart, product=self.musk, quantity=1)
+        mark_cart_changed(laptop)
+
+        snapshot = get_cart_snapshot(self.request(self.user, phone.session))
+        self.assertEqual(snapshot.count, 3)
+        self.assertEqual(snapshot.product_ids, {self.oud.id, self.musk.id})
+
+    def test_deleted_cart_has_empty_summary(self):
+        request = self.request(self.user)
+        self.assertEqual(get_cart_snapshot(request).count, 2)
+        self.cart.delete()
+
+        snapshot = get_cart_snapshot(self.request(self.user, request.session))
+        self.assertEqual(snapshot.count, 0)
+        self.assertEqual(snapshot.product_ids, set())
+
+
+class ReconcileCartStockTests(CartTestMixin, TestCase):
+    def setUp(self):
+        self.cart = Cart.objects.create(cart_id='guest')
+
+    def reconcile(self):
+        items = list(CartItem.objects.filter(cart=self.cart, is_active=True).select_related('product'))
+        adjustments = reconcile_cart_stock(self.cart, items)
+        quantities = dict(CartItem.objects.filter(cart=self.cart).values_list('product_id', 'quantity'))
+        return adjustments, quantities
+
+    def test_cart_within_stock_is_untouched(self):
+        CartItem.objects.create(cart=self.cart, product=self.oud, quantity=4)
+        self.hold(self.oud, 6)
+        items = list(CartItem.objects.filter(cart=self.cart).select_related('product'))
+        # Only the holds are read
+        with self.assertNumQueries(1):
+            self.assertFalse(reconcile_cart_stock(self.cart, items))
+
+    def test_quantity_lowered_to_stock_not_held(self):
+        CartItem.objects.create(cart=self.cart, product=self.oud, quantity=8)
+        CartItem.objects.create(cart=self.cart, product=self.musk, quantity=2)
+        self.hold(self.oud, 7)
+        self.hold(self.musk, 3, expires_in=-timedelta(minutes=1))  # expired holds do not count
+
+        adjustments, quantities = self.reconcile()
+        self.assertEqual(adjustments.adjusted, [(self.oud, 3)])
+        self.assertEqual(adjustments.removed, [])
+        self.assertEqual(quantities, {self.oud.id: 3, self.musk.id: 2})
+
+    def test_fully_held_and_unavailable_products_are_removed(self):
+        amber = self.create_product('Amber', is_available=False)
+        for product in [self.oud, self.musk, amber]:
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+        self.hold(self.oud, 10)
+
+        adjustments, quantities = self.reconcile()
+        self.assertCountEqual(adjustments.removed, [self.oud, amber])
+        self.assertEqual(quantities, {self.musk.id: 1})
+
+
+class MergeGuestCartTests(CartTestMixin, TestCase):
+    def login(self, session):
+        """Log in through django.contrib.auth, as the login view does"""
+        request = self.request(session=session)
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = session.session_key
+        login(request, self.user, backend='django.contrib.auth.backends.ModelBackend')
+        return request
+
+    def guest_session(self, cart_id=None):
+        session = SessionStore()
+        if cart_id:
+            session['cart_id'] = cart_id
+        session.create()
+        return session
+
+    def lines(self, cart):
+        return dict(CartItem.objects.filter(cart=cart).values_list('product_id', 'quantity'))
+
+    def test_guest_cart_is_adopted(self):
+        guest = Cart.objects.create(cart_id='token')
+        CartItem.objects.create(cart=guest, product=self.oud, quantity=2)
+
+        self.login(self.guest_session('token'))
+
+        guest.refresh_from_db()
+        self.assertEqual(guest.user, self.user)
+        self.assertEqual(self.lines(guest), {self.oud.id: 2})
+
+    def test_legacy_cart_keyed_by_session_key_is_merged(self):
+        session = self.guest_session()
+        guest = Cart.objects.create(cart_id=session.session_key)
+        CartItem.objects.create(cart=guest, product=self.oud, quantity=2)
+        pre_login_key = session.session_key
+
+        request = self.login(session)
+
+        self.assertNotEqual(request.session.session_key, pre_login_key)
+        cart = Cart.objects.get(user=self.user)
+        self.assertEqual(self.lines(cart), {self.oud.id: 2})
+        self.assertEqual(request.session['cart_id'], pre_login_key)
+
+    def test_merged_quantities_are_limited_to_available_stock(self):
+        user_cart = Cart.objects.create(cart_id='user', user=self.user)
+        CartItem.objects.create(cart=user_cart, product=self.oud, quantity=6)
+        CartItem.objects.create(cart=user_cart, product=self.musk, quantity=1)
+        guest = Cart.objects.create(cart_id='token')
+        CartItem.objects.create(cart=guest, product=self.oud, quantity=3)
+        CartItem.objects.create(cart=guest, product=self.musk, quantity=1)
+        self.hold(self.oud, 2)
+
+        self.login(self.guest_session('token'))
+
+        self.assertFalse(Cart.objects.filter(id=guest.id).exists())
+        self.assertEqual(self.lines(user_cart), {self.oud.id: 8, self.musk.id: 2})
+
+
+class CartLineTests(CartTestMixin, TestCase):
+    def setUp(self):
+        self.cart = Cart.objects.create(cart_id='user-cart', user=self.user)
+        self.line = CartItem.objects.create(cart=self.cart, product=self.oud, quantity=2)
+
+    def quantity(self):
+        return CartItem.objects.get(id=self.line.id).quantity
+
+    def test_add_line_stops_at_available_stock(self):
+        self.hold(self.oud, 7)
+        self.assertTrue(add_line(self.cart, self.oud))
+        self.assertFalse(add_line(self.cart, self.oud))
+        self.assertEqual(self.quantity(), 3)
+
+    def test_set_quantity_is_limited_to_available_stock(self):
+        self.hold(self.oud, 4)
+        cart_item = set_line_quantity(self.cart, self.line.id, 9)
+        self.assertEqual(cart_item.quantity, 6)
+        self.assertEqual(self.quantity(), 6)
+
+    def test_set_quantity_removes_line_without_stock(self):
+        self.hold(self.oud, 10)
+        self.assertIsNone(set_line_quantity(self.cart, self.line.id, 1))
+        self.assertFalse(CartItem.objects.filter(id=self.line.id).exists())
+
+    def test_set_quantity_of_line_in_another_cart(self):
+        other = Cart.objects.create(cart_id='other')
+        with self.assertRaises(CartItem.DoesNotExist):
+            set_line_quantity(other, self.line.id, 1)
+        self.assertEqual(self.quantity(), 2)
+
+    def test_set_quantity_api(self):
+        self.client.force_login(self.user)
+        url = reverse('cart_api_set_quantity', args=[self.line.id])
+
+        data = self.client.post(url, {'quantity': 12}).json()
+        self.assertEqual(data['item']['quantity'], 10)
+        self.assertEqual(data['message'], 'Only 10 units of Oud are available.')
+        self.assertEqual(data['totals']['quantity'], 10)
+
+        data = self.client.post(url, {'quantity': 0}).json()
+        self.assertIsNone(data['item'])
+        self.assertEqual(self.client.post(url, {'quantity': 1}).status_code, 404)
+
+
+class VariationLineTests(CartTestMixin, TestCase):
+    def setUp(self):
+        self.cart = Cart.objects.create(cart_id='guest')
+        self.red, self.blue = [
+            Variation.objects.create(product=self.oud, variation_category='color', variation_value=value)
+            for value in ['red', 'blue']
+        ]
+        self.small = Variation.objects.create(product=self.oud, variation_category='size', variation_value='small')
+
+    def lines(self):
+        return [
+            (line.quantity, sorted(v.id for v in line.variations.all()))
+            for line in CartItem.objects.filter(cart=self.cart).order_by('id')
+        ]
+
+    def test_resolve_variations_in_one_query(self):
+        with self.assertNumQueries(1):
+            variations = resolve_variations(self.oud, {
+                'csrfmiddlewaretoken': 'x', 'quantity': '2', 'COLOR': 'Red', 'size': 'small', 'scent': 'rose',
+            })
+        self.assertCountEqual(variations, [self.red, self.small])
+
+    def test_same_combination_shares_a_line(self):
+        add_line(self.cart, self.oud, [self.red, self.small])
+        add_line(self.cart, self.oud, [self.small, self.red])
+        add_line(self.cart, self.oud, [self.blue, self.small])
+        add_line(self.cart, self.oud)
+
+        self.assertEqual(self.lines(), [
+            (2, sorted([self.red.id, self.small.id])),
+            (1, sorted([self.blue.id, self.small.id])),
+            (1, []),
+        ])
+
+    def test_full_line_is_not_duplicated(self):
+        CartItem.objects.create(
+            cart=self.cart, product=self.oud, quantity=10,
+            variation_signature=CartItem.make_variation_signature([self.red.id]),
+        )
+        # The guarded UPDATE matches nothing, and the unique line constraint
+        # stops the INSERT that follows
+        self.assertFalse(add_line(self.cart, self.oud, [self.red]))
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 1)
+
+    def test_add_cart_view_posts_variations(self):
+        url = reverse('add_cart', args=[self.oud.id])
+        self.client.post(url, {'color': 'red', 'size': 'small'})
+        self.client.post(url, {'size': 'small', 'color': 'red'})
+
+        cart = Cart.objects.get(cart_id=self.client.session['cart_id'])
+        line = CartItem.objects.get(cart=cart)
+        self.assertEqual(line.quantity, 2)
+        self.assertEqual(line.variation_signature, CartItem.make_variation_signature([self.small.id, self.red.id]))
+
+
+class PricingTests(SimpleTestCase):
+    def item(self, quantity, price, gst, **fields):
+        product = Product(price=Decimal(price), gst_percentage=Decimal(gst), is_available=True, **fields)
+        return CartItem(product=product, quantity=quantity)
+
+    def setUp(self):
+        self.items = [
+            self.item(1, '1180', '18'),
+            self.item(2, '525', '5', sale_price=Decimal('420')),  # on sale
+        ]
+
+    def test_totals_and_included_gst(self):
+        totals = price_cart(self.items)
+        self.assertEqual([line.unit_price for line in totals], [Decimal('1180.00'), Decimal('420.00')])
+        self.assertEqual(totals.quantity, 3)
+        self.assertEqual(totals.subtotal, Decimal('2020.00'))
+        self.assertEqual(totals.grand_total, Decimal('2020.00'))
+        self.assertEqual(totals.gst_breakdown, {Decimal('5'): Decimal('40.00'), Decimal('18'): Decimal('180.00')})
+        self.assertEqual(totals.gst, Decimal('220.00'))
+        self.assertEqual(totals.taxable_value, Decimal('1800.00'))
+
+    def test_discount_is_spread_before_gst(self):
+        totals = price_cart(self.items, discount=202)
+        self.assertEqual(totals.discount, Decimal('202.00'))
+        self.assertEqual(totals.grand_total, Decimal('1818.00'))
+        self.assertEqual([line.gst for line in totals], [Decimal('162.00'), Decimal('36.00')])
+        self.assertEqual(totals.gst, Decimal('198.00'))
+        self.assertEqual(totals.taxable_value, Decimal('1620.00'))
+
+    def test_discount_never_exceeds_subtotal(self):
+        totals = price_cart(self.items, discount='5000')
+        self.assertEqual(totals.discount, Decimal('2020.00'))
+        self.assertEqual(totals.grand_total, Decimal('0.00'))
+        self.assertEqual(totals.gst, Decimal('0.00'))
+
+    def test_amounts_are_rounded_to_paise(self):
+        totals = price_cart([self.item(1, '99.99', '18'), self.item(3, '10', '0')])
+        self.assertEqual(totals.gst_breakdown, {Decimal('0'): Decimal('0.00'), Decimal('18'): Decimal('15.25')})
+        self.assertEqual(totals.subtotal, Decimal('129.99'))
+
+    def test_ended_flash_sale_charges_regular_price(self):
+        now = timezone.now()
+        item = self.item(
+            1, '500', '5', sale_price=Decimal('400'), is_flash_sale=True,
+            flash_sale_start=now - timedelta(days=2), flash_sale_end=now - timedelta(days=1),
+        )
+        self.assertEqual(price_cart([item]).subtotal, Decimal('500.00'))
+
+    def test_empty_cart(self):
+        totals = price_cart([], discount=100)
+        self.assertEqual((totals.subtotal, totals.discount, totals.gst), (0, 0, 0))
+
+
+class CartApiTests(CartTestMixin, TestCase):
+    def add(self, product, **data):
+        return self.client.post(reverse('cart_api_add', args=[product.id]), data)
+
+    def test_guest_adds_and_removes(self):
+        data = self.add(self.oud, quantity=2).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['item']['quantity'], 2)
+        self.assertEqual(data['item']['line_total'], '1000.00')
+        self.assertEqual(data['cart_count'], 2)
+
+        data = self.add(self.musk).json()
+        self.assertEqual(data['totals']['subtotal'], '1500.00')
+        self.assertEqual(data['cart_count'], 3)
+
+        url = reverse('cart_api_remove', args=[data['item']['id']])
+        data = self.client.post(url).json()
+        self.assertIsNone(data['item'])
+        self.assertEqual(data['cart_count'], 2)
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+    def test_add_beyond_available_stock(self):
+        self.hold(self.oud, 7)
+        self.add(self.oud, quantity=2)
+        response = self.add(self.oud, quantity=2)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['item']['quantity'], 2)
+
+        self.hold(self.musk, 10)
+        self.assertEqual(self.add(self.musk).status_code, 409)
+
+    def test_add_requires_options_and_valid_quantity(self):
+        Variation.objects.create(product=self.oud, variation_category='color', variation_value='red')
+        self.assertEqual(self.add(self.oud).status_code, 400)
+        self.assertEqual(self.add(self.oud, color='red', quantity='x').status_code, 400)
+        self.assertEqual(self.add(self.oud, color='red').status_code, 200)
+
+    def test_lines_of_other_carts_are_not_found(self):
+        other = Cart.objects.create(cart_id='other')
+        line = CartItem.objects.create(cart=other, product=self.oud, quantity=1)
+        self.add(self.musk)
+        self.assertEqual(self.client.post(reverse('cart_api_remove', args=[line.id])).status_code, 404)
+        self.assertTrue(CartItem.objects.filter(id=line.id).exists())
+
+    def test_get_is_not_allowed(self):
+        self.assertEqual(self.client.get(reverse('cart_api_add', args=[self.oud.id])).status_code, 405)
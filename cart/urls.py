@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views 
+from . import api, views 
 
 urlpatterns = [
     path('', views.cart, name='cart'),
@@ -7,4 +7,9 @@ urlpatterns = [
     path('remove_cart/<int:product_id>/<int:cart_item_id>/', views.remove_cart, name='remove_cart'),
     path('remove_cart_item/<int:product_id>/<int:cart_item_id>/', views.remove_cart_item, name='remove_cart_item'),
     path('checkout/', views.checkout, name='checkout'),
+
+    # JSON cart API
+    path('api/add/<int:product_id>/', api.add, name='cart_api_add'),
+    path('api/items/<int:cart_item_id>/quantity/', api.set_quantity, name='cart_api_set_quantity'),
+    path('api/items/<int:cart_item_id>/remove/', api.remove, name='cart_api_remove'),
 ]
\ No newline at end of file
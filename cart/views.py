@@ -1,10 +1,21 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.urls import Resolver404, resolve
 from .models import Cart, CartItem
+from .pricing import price_cart
+from .identity import get_cart
+from .lines import add_line, resolve_variations
+from .snapshot import get_cart_snapshot, mark_cart_changed
+from .stock import reconcile_cart_stock
 from orders.forms import OrderForm
+from orders.idempotency import idempotent, json_success
 from orders.models import Order, OrderProduct, Payment
-from store.models import Product, Variation
+from orders.stock import InsufficientStock, available_stock
+from orders.utils import finalize_order, place_order_lines
+from store.models import Product
 import uuid
 import datetime
 
@@ -12,21 +23,13 @@ import datetime
 
 
 
-def _cart_id(request):
-    cart = request.session.session_key
-    if not cart:
-        request.session.create()
-        cart = request.session.session_key
-    # Ensure session is saved
-    if not request.session.exists(request.session.session_key):
-        request.session.save()
-    return cart
-
 def add_cart(request, product_id):
     product = Product.objects.get(id=product_id)
+    # Units held for other customers' pending payments cannot be sold
+    stock = available_stock(product)
     
     # Check if product is available and in stock
-    if not product.is_available or product.stock <= 0:
+    if not product.is_available or stock <= 0:
         messages.warning(request, f'{product.product_name} is currently out of stock.')
         return redirect('product_detail', product_slug=product.slug)
     
@@ -34,68 +37,18 @@ def add_cart(request, product_id):
     if product.variation_set.filter(is_active=True).exists() and request.method != 'POST':
         return redirect('product_detail', product_slug=product.slug)
     
-    product_variation_objs = []
-    product_variation_ids = []
+    # Resolve all posted variations in one query
+    product_variations = []
     if request.method == 'POST':
-        variation_keys = [key for key in request.POST.keys() if key not in ['csrfmiddlewaretoken', 'quantity']]
-        for key in variation_keys:
-            value = request.POST.get(key)
-            if value:
-                try:
-                    variation = Variation.objects.get(product=product, variation_category__iexact=key, variation_value__iexact=value, is_active=True)
-                    product_variation_objs.append(variation)
-                    product_variation_ids.append(variation.id)
-                except Variation.DoesNotExist:
-                    pass
-        product_variation_ids.sort()
+        product_variations = resolve_variations(product, request.POST)
     
-    try:
-        cart = Cart.objects.get(cart_id=_cart_id(request))
-    except Cart.DoesNotExist:
-        cart = Cart.objects.create(
-            cart_id=_cart_id(request)
-        )
-        cart.save()
+    cart = get_cart(request, create=True)
     
-    cart_item = None
-    existing_variation_lists = []
-    ids = []
-    cart_items = CartItem.objects.filter(product=product, cart=cart, is_active=True)
-    if cart_items.exists():
-        for item in cart_items:
-            variations = list(item.variations.all())
-            variation_ids = sorted([var.id for var in variations])
-            existing_variation_lists.append(variation_ids)
-            ids.append(item.id)
-        if product_variation_ids in existing_variation_lists:
-            index = existing_variation_lists.index(product_variation_ids)
-            item_id = ids[index]
-            cart_item = CartItem.objects.get(id=item_id)
-            # Check if we can add more to cart
-            if cart_item.quantity < product.stock:
-                cart_item.quantity += 1
-                cart_item.save()
-            else:
-                messages.warning(request, f'Only {product.stock} units of {product.product_name} are available. You already have {cart_item.quantity} in your cart.')
-        else:
-            # Check stock before adding new item
-            if product.stock > 0:
-                cart_item = CartItem.objects.create(product=product, cart=cart, quantity=1)
-                if product_variation_objs:
-                    cart_item.variations.set(product_variation_objs)
-                cart_item.save()
-            else:
-                messages.warning(request, f'{product.product_name} is out of stock.')
-    else:
-        # Check stock before adding new item
-        if product.stock > 0:
-            cart_item = CartItem.objects.create(product=product, cart=cart, quantity=1)
-            if product_variation_objs:
-                cart_item.variations.set(product_variation_objs)
-            cart_item.save()
-        else:
-            messages.warning(request, f'{product.product_name} is out of stock.')
+    # Add one unit to the line for this product and variation combination
+    if not add_line(cart, product, product_variations, stock=stock):
+        messages.warning(request, f'Only {stock} units of {product.product_name} are available and they are already in your cart.')
 
+    mark_cart_changed(request)
     return redirect('cart')
 
 
@@ -103,52 +56,32 @@ def add_cart(request, product_id):
 
 def cart(request):
     try:
-        cart = Cart.objects.get(cart_id=_cart_id(request))
-        cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-        
-        # Remove items from cart if product is no longer available or out of stock
-        items_to_remove = []
-        for cart_item in cart_items:
-            product = cart_item.product
-            # Remove if product is unavailable or out of stock
-            if not product.is_available or product.stock <= 0:
-                items_to_remove.append(cart_item)
-            # Adjust quantity if requested quantity exceeds available stock
-            elif cart_item.quantity > product.stock:
-                cart_item.quantity = product.stock
-                cart_item.save()
-                if cart_item.quantity <= 0:
-                    items_to_remove.append(cart_item)
+        cart = get_cart(request)
+        if cart is None:
+            raise Cart.DoesNotExist
+        snapshot = get_cart_snapshot(request)
         
-        # Remove unavailable items
-        for item in items_to_remove:
-            item.delete()
+        # Remove items that are no longer available or out of stock and
+        # lower quantities above the remaining stock (two statements at most)
+        adjustments = reconcile_cart_stock(cart, snapshot.items)
         
         # Refresh cart items after cleanup
-        cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-        
-        total = 0
-        quantity = 0
-        tax = 0
-        grand_total = 0
-        
-        for cart_item in cart_items:
-            item_total = cart_item.product.price * cart_item.quantity
-            total += item_total
-            quantity += cart_item.quantity
-            # GST is already included in product price
+        if adjustments:
+            mark_cart_changed(request)
+            snapshot = get_cart_snapshot(request)
+        cart_items = snapshot.items
+        prefetch_related_objects(cart_items, 'variations', 'product__category')
         
-        grand_total = total
-        
-        # Show message if items were removed
-        if items_to_remove:
-            messages.warning(request, 'Some items were removed from your cart because they are no longer available or out of stock.')
+        # Show message if items were removed or reduced
+        if adjustments.removed:
+            names = ', '.join(product.product_name for product in adjustments.removed)
+            messages.warning(request, f'Some items were removed from your cart because they are no longer available or out of stock: {names}.')
+        if adjustments.adjusted:
+            reduced = ', '.join(f'{product.product_name} (now {quantity})' for product, quantity in adjustments.adjusted)
+            messages.warning(request, f'Some quantities were reduced to the stock that is left: {reduced}.')
     except Cart.DoesNotExist:
+        snapshot = None
         cart_items = []
-        total = 0
-        quantity = 0
-        tax = 0
-        grand_total = 0
     
     # Get applied coupon if any
     applied_coupon = None
@@ -162,13 +95,17 @@ def cart(request):
         except:
             pass
     
+    # GST is already included in product prices
+    totals = snapshot.totals(discount) if snapshot else price_cart([], discount)
+    
     context = {
         'cart_items': cart_items,
-        'total': total,
-        'quantity': quantity,
-        'tax': tax,
-        'discount': discount,
-        'grand_total': grand_total,
+        'total': totals.subtotal,
+        'quantity': totals.quantity,
+        'tax': totals.gst,
+        'discount': totals.discount,
+        'grand_total': totals.grand_total,
+        'gst_breakdown': totals.gst_breakdown,
         'applied_coupon': applied_coupon,
     }
     return render(request, 'store/cart.html', context)
@@ -176,10 +113,11 @@ def cart(request):
 
 def remove_cart(request, product_id, cart_item_id):
     try:
-        cart = Cart.objects.get(cart_id=_cart_id(request))
+        cart = get_cart(request)
         product = get_object_or_404(Product, id=product_id)
         cart_item = CartItem.objects.get(product=product, cart=cart, id=cart_item_id)
         cart_item.delete()
+        mark_cart_changed(request)
     except (Cart.DoesNotExist, CartItem.DoesNotExist):
         pass
     return redirect('cart')
@@ -187,7 +125,7 @@ def remove_cart(request, product_id, cart_item_id):
 
 def remove_cart_item(request, product_id, cart_item_id):
     try:
-        cart = Cart.objects.get(cart_id=_cart_id(request))
+        cart = get_cart(request)
         product = get_object_or_404(Product, id=product_id)
         cart_item = CartItem.objects.get(product=product, cart=cart, id=cart_item_id)
         if cart_item.quantity > 1:
@@ -195,11 +133,32 @@ def remove_cart_item(request, product_id, cart_item_id):
             cart_item.save()
         else:
             cart_item.delete()
+        mark_cart_changed(request)
     except (Cart.DoesNotExist, CartItem.DoesNotExist):
         pass
     return redirect('cart')
 
 
+def _order_placed(response):
+    """
+    store_if check for checkout: only a placed order's response is replayed.
+
+    That is the JSON answer handing the order to Razorpay, or the redirect
+    to the order success page. Anything else (the form re-rendered with
+    errors, a redirect back to the cart after a stock shortage) is not kept,
+    so the customer can fix it and submit the same form again. A second
+    submit while the first is still placing the order is sent to the order
+    list (busy_redirect), where the order shows up once placed.
+    """
+    if response.status_code in (301, 302):
+        try:
+            return resolve(response['Location']).view_name == 'orders:order_success'
+        except Resolver404:
+            return False
+    return 'application/json' in response.get('Content-Type', '') and json_success(response)
+
+
+@idempotent('checkout', store_if=_order_placed, busy_redirect='orders:order_list')
 def checkout(request):
     # Check if user is authenticated
     if not request.user.is_authenticated:
@@ -209,32 +168,17 @@ def checkout(request):
         next_url = request.path
         return redirect(f"{login_url}?next={next_url}")
     
-    # Ensure session is saved before getting cart (prevents cart loss on reload)
-    if not request.session.session_key:
-        request.session.create()
-    request.session.save()
-    
     try:
-        cart_id = _cart_id(request)
-        cart = Cart.objects.get(cart_id=cart_id)
-        cart_items = CartItem.objects.filter(cart=cart, is_active=True)
+        cart = get_cart(request)
+        if cart is None:
+            raise Cart.DoesNotExist
+        snapshot = get_cart_snapshot(request)
+        cart_items = snapshot.items
         
-        if not cart_items.exists():
+        if not cart_items:
             messages.warning(request, 'Your cart is empty. Please add items to your cart before checkout.')
             return redirect('cart')
-        
-        total = 0
-        quantity = 0
-        tax = 0
-        grand_total = 0
-        
-        for cart_item in cart_items:
-            item_total = cart_item.product.price * cart_item.quantity
-            total += item_total
-            quantity += cart_item.quantity
-            # GST is already included in product price
-        
-        grand_total = total
+        prefetch_related_objects(cart_items, 'variations')
         
     except Cart.DoesNotExist:
         messages.warning(request, 'Your cart is empty. Please add items to your cart before checkout.')
@@ -296,161 +240,117 @@ def checkout(request):
                     pass
             
             # Recalculate with discount (Subtotal - Discount, GST already included)
-            final_total = total - discount
+            totals = snapshot.totals(discount)
+            total = totals.subtotal
+            discount = totals.discount
+            final_total = totals.grand_total
             
-            # ============================================================
-            # STEP 6: A Payment Record is Created
-            # ============================================================
-            # Create payment record
-            # For Razorpay, status will be 'Pending' until payment is verified
-            payment_status = 'Pending' if payment_method == 'RAZORPAY' else 'Completed'
-            payment = Payment.objects.create(
-                user=request.user,
-                payment_id=str(uuid.uuid4()),
-                payment_method=payment_method,
-                amount_paid=str(final_total),
-                status=payment_status
-            )
+            # Payment, order, coupon usage, order products, stock and cart
+            # clearing are committed together or not at all
+            try:
+                with transaction.atomic():
+                    # ============================================================
+                    # STEP 6: A Payment Record is Created
+                    # ============================================================
+                    # Create payment record
+                    # For Razorpay, status will be 'Pending' until payment is verified
+                    payment_status = 'Pending' if payment_method == 'RAZORPAY' else 'Completed'
+                    payment = Payment.objects.create(
+                        user=request.user,
+                        payment_id=str(uuid.uuid4()),
+                        payment_method=payment_method,
+                        amount_paid=str(final_total),
+                        status=payment_status
+                    )
             
-            # ============================================================
-            # STEP 5: A Unique Order Number is Generated
-            # ============================================================
-            # Generate unique order number (Format: YYYYMMDD-XXXXXX-XX)
-            order_number = Order.generate_order_number(request.user.id)
+                    # ============================================================
+                    # STEP 5: A Unique Order Number is Generated
+                    # ============================================================
+                    # Generate unique order number (Format: YYYYMMDD-XXXXXX)
+                    order_number = Order.generate_order_number(request.user.id)
             
-            if address_choice == 'saved' and saved_address_available:
-                address_line_1 = request.user.address_line_1
-                address_line_2 = request.user.address_line_2 or ''
-                city = request.user.city
-                state = request.user.state
-                country = request.user.country
-                pincode = request.user.pincode or ''
-            else:
-                address_line_1 = form.cleaned_data['address_line_1']
-                address_line_2 = form.cleaned_data.get('address_line_2', '')
-                city = form.cleaned_data['city']
-                state = form.cleaned_data['state']
-                country = form.cleaned_data['country']
-                pincode = form.cleaned_data.get('pincode', '')
+                    if address_choice == 'saved' and saved_address_available:
+                        address_line_1 = request.user.address_line_1
+                        address_line_2 = request.user.address_line_2 or ''
+                        city = request.user.city
+                        state = request.user.state
+                        country = request.user.country
+                        pincode = request.user.pincode or ''
+                    else:
+                        address_line_1 = form.cleaned_data['address_line_1']
+                        address_line_2 = form.cleaned_data.get('address_line_2', '')
+                        city = form.cleaned_data['city']
+                        state = form.cleaned_data['state']
+                        country = form.cleaned_data['country']
+                        pincode = form.cleaned_data.get('pincode', '')
             
-            # ============================================================
-            # STEP 4: An Order is Created (But Not Completed Yet)
-            # ============================================================
-            # Create order record with all customer and order details
-            # Initially: is_ordered=False, status='New'
-            order = Order.objects.create(
-                user=request.user,
-                payment=payment,
-                order_number=order_number,
-                first_name=form.cleaned_data['first_name'],
-                last_name=form.cleaned_data['last_name'],
-                phone=form.cleaned_data['phone'],
-                email=form.cleaned_data['email'],
-                address_line_1=address_line_1,
-                address_line_2=address_line_2,
-                city=city,
-                state=state,
-                country=country,
-                pincode=pincode,
-                order_note=form.cleaned_data.get('order_note', ''),
-                order_total=total,
-                tax=0,  # GST is already included in product prices
-                discount=discount,
-                final_total=final_total,
-                status='New',
-                ip=request.META.get('REMOTE_ADDR'),
-                is_ordered=False  # Will be set to True after all steps complete
-            )
+                    # ============================================================
+                    # STEP 4: An Order is Created (But Not Completed Yet)
+                    # ============================================================
+                    # Create order record with all customer and order details
+                    # Initially: is_ordered=False, status='New'
+                    order = Order.objects.create(
+                        user=request.user,
+                        payment=payment,
+                        order_number=order_number,
+                        first_name=form.cleaned_data['first_name'],
+                        last_name=form.cleaned_data['last_name'],
+                        phone=form.cleaned_data['phone'],
+                        email=form.cleaned_data['email'],
+                        address_line_1=address_line_1,
+                        address_line_2=address_line_2,
+                        city=city,
+                        state=state,
+                        country=country,
+                        pincode=pincode,
+                        order_note=form.cleaned_data.get('order_note', ''),
+                        order_total=total,
+                        tax=totals.gst,  # GST included in the product prices
+                        discount=discount,
+                        final_total=final_total,
+                        status='New',
+                        ip=request.META.get('REMOTE_ADDR'),
+                        is_ordered=False  # Will be set to True after all steps complete
+                    )
+            
+                    # Record coupon usage if applied
+                    if applied_coupon:
+                        from coupons.models import CouponUsage
+                        CouponUsage.objects.create(
+                            coupon=applied_coupon,
+                            user=request.user,
+                            order=order,
+                            discount_amount=discount
+                        )
+                        applied_coupon.used_count += 1
+                        applied_coupon.save()
+            
+                    # ============================================================
+                    # STEP 7 & 8: Order Products are Saved and Stock is Reduced
+                    # ============================================================
+                    # All cart products are locked together and re-checked; any
+                    # shortage raises InsufficientStock and rolls everything back.
+                    # Online payments only hold the stock until they are confirmed.
+                    place_order_lines(order, payment, request.user, cart_items,
+                                      hold=payment_method == 'RAZORPAY',
+                                      unit_prices=totals.unit_prices())
+            
+                    # ============================================================
+                    # STEP 9: Cart Is Fully Cleared
+                    # ============================================================
+                    # Clear cart - delete all cart items and the cart
+                    # (Items are already in order, so cart can be cleared)
+                    CartItem.objects.filter(cart=cart).delete()
+                    cart.delete()
+            except InsufficientStock as e:
+                messages.error(request, e.message)
+                return redirect('cart')
             
-            # Record coupon usage if applied
             if applied_coupon:
-                from coupons.models import CouponUsage
-                CouponUsage.objects.create(
-                    coupon=applied_coupon,
-                    user=request.user,
-                    order=order,
-                    discount_amount=discount
-                )
-                applied_coupon.used_count += 1
-                applied_coupon.save()
-                
                 # Clear coupon from session
                 del request.session['applied_coupon']
                 del request.session['coupon_discount']
-            
-            # ============================================================
-            # STEP 7: Order Products are Saved
-            # ============================================================
-            # Create order products and manage stock
-            for cart_item in cart_items:
-                # ============================================================
-                # STEP 8: Stock is Reduced (with double-check validation)
-                # ============================================================
-                # Use select_for_update to lock the product row and prevent race conditions
-                # This ensures only one order can reduce stock at a time
-                from django.db import transaction
-                
-                with transaction.atomic():
-                    # Lock the product row for update (prevents concurrent modifications)
-                    product = Product.objects.select_for_update().get(id=cart_item.product.id)
-                    
-                    # Double-check stock availability (in case it changed since initial validation)
-                    if product.stock < cart_item.quantity:
-                        # Stock insufficient - rollback transaction
-                        messages.error(
-                            request, 
-                            f'Sorry, {product.product_name} is now out of stock. '
-                            f'Only {product.stock} units available.'
-                        )
-                        # Delete the order and payment if stock is insufficient
-                        order.delete()
-                        payment.delete()
-                        return redirect('cart')
-                    
-                    # Create OrderProduct record for each cart item
-                    order_product = OrderProduct.objects.create(
-                        order=order,
-                        payment=payment,
-                        user=request.user,
-                        product=product,
-                        quantity=cart_item.quantity,
-                        product_price=product.price,
-                        ordered=True
-                    )
-                    # Add product variations (color, size, etc.)
-                    variations = cart_item.variations.all()
-                    if variations:
-                        order_product.variations.set(variations)
-                    
-                    # Reduce product stock
-                    product.stock -= cart_item.quantity
-                    
-                    # Update product availability if stock reaches 0
-                    if product.stock <= 0:
-                        product.is_available = False
-                        product.stock = 0  # Ensure stock doesn't go negative
-                    
-                    # Save product with updated stock
-                    product.save()
-                    
-                    # Check if stock is low and send notification
-                    if product.stock <= product.min_stock_alert:
-                        try:
-                            from notifications.utils import notify_low_stock
-                            notify_low_stock(product)
-                        except:
-                            pass  # Don't fail order if notification fails
-            
-            # ============================================================
-            # STEP 9: Cart Is Fully Cleared
-            # ============================================================
-            # Clear cart - delete all cart items and the cart
-            # (Items are already in order, so cart can be cleared)
-            cart_items.delete()
-            try:
-                cart.delete()
-            except:
-                pass
+            mark_cart_changed(request)
             
             # ============================================================
             # STEP 9.5: Handle Payment Method
@@ -476,29 +376,8 @@ def checkout(request):
             # Since we only support Razorpay now, this shouldn't be reached
             # But keeping it for safety
             if payment_method != 'RAZORPAY':
-                # Mark order as officially placed
-                order.is_ordered = True
-                order.status = 'New'
-                order.save()
-                
-                # Create order tracking entry
-                from orders.models import OrderTracking
-                OrderTracking.objects.create(
-                    order=order,
-                    status='New',
-                    description='Order placed successfully'
-                )
-                
-                # Send notifications
-                from notifications.utils import notify_new_order
-                notify_new_order(order)
-                
-                # Send invoice email
-                try:
-                    from orders.utils import send_invoice_email
-                    send_invoice_email(order)
-                except:
-                    pass
+                # Mark order as officially placed and queue its emails
+                finalize_order(order)
                 
                 messages.success(request, f'Order placed successfully! Your order number is {order_number}')
                 return redirect('orders:order_success', order_number=order_number)
@@ -572,16 +451,20 @@ def checkout(request):
             request.user.pincode,
         ])
 
+    totals = snapshot.totals(discount)
+    
     context = {
         'cart_items': cart_items,
-        'total': total,
-        'quantity': quantity,
-        'tax': tax,
-        'discount': discount,
-        'grand_total': grand_total,
+        'total': totals.subtotal,
+        'quantity': totals.quantity,
+        'tax': totals.gst,
+        'discount': totals.discount,
+        'grand_total': totals.grand_total,
+        'gst_breakdown': totals.gst_breakdown,
         'form': form,
         'applied_coupon': applied_coupon,
         'razorpay_enabled': razorpay_enabled,  # Pass to template
+        'idempotency_key': uuid.uuid4().hex,  # Makes a repeated submit return the first result
         'user_has_saved_address': user_has_saved_address,
     }
     return render(request, 'store/checkout.html', context)
@@ -1,6 +1,8 @@
-from .models import Category
+from django.utils.functional import SimpleLazyObject
+
+from .menu import get_menu_links
 
 
 def menu_links(request):
-    links = Category.objects.all()
-    return {'links': links}
\ No newline at end of file
+    # Lazy, so templates that never render the menu do not load it
+    return {'links': SimpleLazyObject(get_menu_links)}
@@ -1,3 +1,45 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from store.models import Product
+from .context_processors import menu_links
+from .menu import get_menu_links
+from .models import Category
+
+
+class MenuLinksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.attar = Category.objects.create(Category_name='Attar', slug='attar')
+        cls.mist = Category.objects.create(Category_name='Mist', slug='mist')
+        for name, available in [('Oud', True), ('Musk', True), ('Amber', False)]:
+            Product.objects.create(
+                product_name=name, slug=name.lower(), price=500, stock=5, category=cls.attar,
+                images='photos/products/x.jpg', is_available=available,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_available_products(self):
+        links = get_menu_links()
+        self.assertEqual([(c.slug, c.product_count) for c in links], [('attar', 2), ('mist', 0)])
+
+    def test_cached_until_categories_or_products_change(self):
+        get_menu_links()
+        with self.assertNumQueries(0):
+            get_menu_links()
+
+        Category.objects.create(Category_name='Bakhoor', slug='bakhoor')
+        self.assertEqual(len(get_menu_links()), 3)
+
+        Product.objects.get(slug='amber').delete()
+        Product.objects.create(
+            product_name='Rose', slug='rose', price=500, stock=5, category=self.mist, images='photos/products/x.jpg',
+        )
+        self.assertEqual([c.product_count for c in get_menu_links()], [2, 1, 0])
+
+    def test_context_processor_is_lazy(self):
+        with self.assertNumQueries(0):
+            context = menu_links(RequestFactory().get('/'))
+        self.assertEqual(len(context['links']), 2)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path
 from django.shortcuts import redirect
-from .models import Order, OrderProduct, Payment, OrderTracking, ReturnRequest
+from .models import Order, OrderProduct, Payment, OrderTracking, ReturnRequest, StockReservation, OrderNumberSequence, IdempotencyKey, DailySalesRollup, ProductSalesLedger
 from .admin_views import admin_dashboard, export_orders_csv, get_new_orders_count
 
 
@@ -71,11 +71,50 @@ class ReturnRequestAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at', 'updated_at')
 
 
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('order', 'product', 'quantity', 'status', 'expires_at', 'created_at')
+    list_filter = ('status', 'expires_at')
+    search_fields = ('order__order_number', 'product__product_name')
+    readonly_fields = ('created_at',)
+
+
+class OrderNumberSequenceAdmin(admin.ModelAdmin):
+    list_display = ('day', 'last_value')
+    readonly_fields = ('day', 'last_value')
+
+
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'key', 'user', 'status', 'response_status', 'created_at', 'expires_at')
+    list_filter = ('scope', 'status')
+    search_fields = ('key', 'user__email')
+    readonly_fields = ('created_at',)
+
+
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'status', 'orders', 'revenue', 'discount')
+    list_filter = ('status', 'day')
+    date_hierarchy = 'day'
+    readonly_fields = ('day', 'status', 'orders', 'revenue', 'discount')
+
+
+class ProductSalesLedgerAdmin(admin.ModelAdmin):
+    list_display = ('day', 'product', 'units', 'gross', 'refunded_units', 'refunds')
+    list_filter = ('day',)
+    search_fields = ('product__product_name',)
+    date_hierarchy = 'day'
+    readonly_fields = ('day', 'product', 'units', 'gross', 'refunded_units', 'refunds')
+
+
 admin.site.register(Order, OrderAdmin)
 admin.site.register(Payment, PaymentAdmin)
 admin.site.register(OrderProduct, OrderProductAdmin)
 admin.site.register(OrderTracking, OrderTrackingAdmin)
 admin.site.register(ReturnRequest, ReturnRequestAdmin)
+admin.site.register(StockReservation, StockReservationAdmin)
+admin.site.register(OrderNumberSequence, OrderNumberSequenceAdmin)
+admin.site.register(IdempotencyKey, IdempotencyKeyAdmin)
+admin.site.register(DailySalesRollup, DailySalesRollupAdmin)
+admin.site.register(ProductSalesLedger, ProductSalesLedgerAdmin)
 
 
 # Custom admin URLs
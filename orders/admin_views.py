@@ -1,11 +1,14 @@
 from django.shortcuts import render
 from django.contrib.admin.views.decorators import staff_member_required
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Sum, Count, Q
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.db.models import Sum, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
-import csv
-from .models import Order, OrderProduct, Payment
+from aromas.exports import streaming_csv_response, timestamped_filename
+from . import ledger
+from .exports import filter_orders, order_header, order_rows
+from .models import DailySalesRollup, Order
 from store.models import Product
 from notifications.models import Notification
 
@@ -15,50 +18,36 @@ def admin_dashboard(request):
     """Admin sales dashboard with analytics"""
     
     # Date ranges
-    today = timezone.now().date()
+    today = timezone.localdate()
     this_week = today - timedelta(days=7)
     this_month = today - timedelta(days=30)
     this_year = today - timedelta(days=365)
     
-    # Order statistics
-    total_orders = Order.objects.filter(is_ordered=True).count()
-    today_orders = Order.objects.filter(is_ordered=True, created_at__date=today).count()
-    week_orders = Order.objects.filter(is_ordered=True, created_at__date__gte=this_week).count()
-    month_orders = Order.objects.filter(is_ordered=True, created_at__date__gte=this_month).count()
-    
-    # Revenue statistics
-    total_revenue = Order.objects.filter(is_ordered=True).aggregate(
-        total=Sum('final_total')
-    )['total'] or 0
-    
-    today_revenue = Order.objects.filter(
-        is_ordered=True, 
-        created_at__date=today
-    ).aggregate(total=Sum('final_total'))['total'] or 0
-    
-    week_revenue = Order.objects.filter(
-        is_ordered=True,
-        created_at__date__gte=this_week
-    ).aggregate(total=Sum('final_total'))['total'] or 0
-    
-    month_revenue = Order.objects.filter(
-        is_ordered=True,
-        created_at__date__gte=this_month
-    ).aggregate(total=Sum('final_total'))['total'] or 0
+    # Order and revenue statistics, read from the daily sales rollups
+    # (one row per day and status) in a single query
+    rollups = DailySalesRollup.objects.all()
+    stats = rollups.aggregate(
+        total_orders=Sum('orders'),
+        today_orders=Sum('orders', filter=Q(day=today)),
+        week_orders=Sum('orders', filter=Q(day__gte=this_week)),
+        month_orders=Sum('orders', filter=Q(day__gte=this_month)),
+        total_revenue=Sum('revenue'),
+        today_revenue=Sum('revenue', filter=Q(day=today)),
+        week_revenue=Sum('revenue', filter=Q(day__gte=this_week)),
+        month_revenue=Sum('revenue', filter=Q(day__gte=this_month)),
+    )
+    stats = {key: value or 0 for key, value in stats.items()}
     
     # Order status breakdown
-    status_breakdown = Order.objects.filter(is_ordered=True).values('status').annotate(
-        count=Count('id')
-    )
+    status_breakdown = rollups.values('status').annotate(
+        count=Sum('orders')
+    ).filter(count__gt=0).order_by('status')
     
     # Recent orders
     recent_orders = Order.objects.filter(is_ordered=True).order_by('-created_at')[:10]
     
-    # Top selling products
-    top_products = OrderProduct.objects.values('product__product_name').annotate(
-        total_sold=Sum('quantity'),
-        total_revenue=Sum('product_price')
-    ).order_by('-total_sold')[:10]
+    # Top selling products, read from the per-product sales ledger
+    top_products = ledger.top_products(metric='units', limit=10)
     
     # Low stock alerts
     from django.db.models import F
@@ -82,14 +71,7 @@ def admin_dashboard(request):
     abandoned_carts = Cart.objects.filter(is_abandoned=True).count()
     
     context = {
-        'total_orders': total_orders,
-        'today_orders': today_orders,
-        'week_orders': week_orders,
-        'month_orders': month_orders,
-        'total_revenue': total_revenue,
-        'today_revenue': today_revenue,
-        'week_revenue': week_revenue,
-        'month_revenue': month_revenue,
+        **stats,
         'status_breakdown': status_breakdown,
         'recent_orders': recent_orders,
         'top_products': top_products,
@@ -102,40 +84,41 @@ def admin_dashboard(request):
     return render(request, 'admin/dashboard.html', context)
 
 
+def _date_param(request, name):
+    """Read an optional YYYY-MM-DD query parameter (ValueError if malformed)"""
+    value = request.GET.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
 @staff_member_required
 def export_orders_csv(request):
-    """Export orders to CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="orders_export.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'Order Number', 'Customer Name', 'Email', 'Phone', 'Status',
-        'Order Total', 'Tax', 'Discount', 'Final Total', 'Payment Method',
-        'Created At', 'City', 'State', 'Pincode'
-    ])
-    
-    orders = Order.objects.filter(is_ordered=True).order_by('-created_at')
-    
-    for order in orders:
-        writer.writerow([
-            order.order_number,
-            order.full_name(),
-            order.email,
-            order.phone,
-            order.status,
-            order.order_total,
-            order.tax,
-            order.discount,
-            order.final_total,
-            order.payment.get_payment_method_display() if order.payment else 'N/A',
-            order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            order.city,
-            order.state,
-            order.pincode,
-        ])
-    
-    return response
+    """
+    Export placed orders to CSV, streamed in chunks.
+
+    Query parameters: start and end (YYYY-MM-DD, inclusive), status, and
+    items=1 for one row per order line.
+    """
+    try:
+        start = _date_param(request, 'start')
+        end = _date_param(request, 'end')
+    except ValueError:
+        return HttpResponseBadRequest('Dates must be given as YYYY-MM-DD.')
+    status = request.GET.get('status', '')
+    if status and status not in dict(Order.STATUS):
+        return HttpResponseBadRequest('Unknown order status.')
+    include_items = request.GET.get('items') == '1'
+
+    orders = filter_orders(start=start, end=end, status=status)
+    return streaming_csv_response(
+        timestamped_filename('orders_export', 'csv'),
+        order_header(include_items),
+        order_rows(orders, include_items=include_items),
+    )
 
 
 @staff_member_required
@@ -0,0 +1,118 @@
+"""
+Order export rows.
+
+Orders are read in chunks with a values_list projection (the payment
+method comes from the same join), so an export of any size runs a fixed
+number of queries and holds one chunk in memory. With line items, each
+chunk of orders has its lines loaded by one prefetch query and the export
+has one row per line.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from aromas.exports import EXPORT_CHUNK_SIZE, format_datetime
+from .models import Order, OrderProduct, Payment
+
+ORDER_HEADER = [
+    'Order Number', 'Customer Name', 'Email', 'Phone', 'Status',
+    'Order Total', 'Tax', 'Discount', 'Final Total', 'Payment Method',
+    'Created At', 'City', 'State', 'Pincode'
+]
+
+LINE_HEADER = ['Product', 'Quantity', 'Unit Price', 'Line Total']
+
+ORDER_FIELDS = (
+    'order_number', 'first_name', 'last_name', 'email', 'phone', 'status',
+    'order_total', 'tax', 'discount', 'final_total', 'payment__payment_method',
+    'created_at', 'city', 'state', 'pincode',
+)
+
+PAYMENT_METHODS = dict(Payment.PAYMENT_METHOD_CHOICES)
+
+
+def filter_orders(start=None, end=None, status=None):
+    """
+    Placed orders, newest first, optionally limited to a period and status.
+
+    Args:
+        start: First day included (date)
+        end: Last day included (date)
+        status: Order status
+    """
+    orders = Order.objects.filter(is_ordered=True)
+    if start:
+        orders = orders.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        orders = orders.filter(created_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    if status:
+        orders = orders.filter(status=status)
+    return orders.order_by('-created_at', '-id')
+
+
+def _order_cells(order_number, first_name, last_name, email, phone, status, order_total, tax,
+                 discount, final_total, payment_method, created_at, city, state, pincode):
+    return [
+        order_number,
+        f'{first_name} {last_name}',
+        email,
+        phone,
+        status,
+        order_total,
+        tax,
+        discount,
+        final_total,
+        PAYMENT_METHODS.get(payment_method, payment_method) if payment_method else 'N/A',
+        format_datetime(created_at),
+        city,
+        state,
+        pincode,
+    ]
+
+
+def order_rows(orders, include_items=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield export rows for the orders.
+
+    Args:
+        orders: Order queryset (see filter_orders)
+        include_items: Add the order lines, one row per line
+        chunk_size: Orders read per database round trip
+
+    Returns:
+        generator: Row lists matching order_header(include_items)
+    """
+    if not include_items:
+        for values in orders.values_list(*ORDER_FIELDS).iterator(chunk_size=chunk_size):
+            yield _order_cells(*values)
+        return
+
+    lines = OrderProduct.objects.select_related('product').only(
+        'order_id', 'quantity', 'product_price', 'product__product_name',
+    ).order_by('id')
+    orders = (
+        orders.select_related('payment')
+        .only(*ORDER_FIELDS)
+        .prefetch_related(Prefetch('orderproduct_set', queryset=lines))
+    )
+    for order in orders.iterator(chunk_size=chunk_size):
+        cells = _order_cells(*[
+            (order.payment.payment_method if order.payment else None)
+            if field == 'payment__payment_method' else getattr(order, field)
+            for field in ORDER_FIELDS
+        ])
+        order_lines = order.orderproduct_set.all()
+        if not order_lines:
+            yield cells + [''] * len(LINE_HEADER)
+        for line in order_lines:
+            yield cells + [
+                line.product.product_name,
+                line.quantity,
+                line.product_price,
+                line.sub_total(),
+            ]
+
+
+def order_header(include_items=False):
+    return ORDER_HEADER + LINE_HEADER if include_items else ORDER_HEADER
@@ -0,0 +1,172 @@
+"""
+Idempotency keys for requests that must not run twice.
+
+A double-clicked "Place Order" button or a retried AJAX call would create
+a second payment and order, take stock twice and count the coupon twice.
+Views decorated with ``idempotent`` accept a key (the ``Idempotency-Key``
+header or an ``idempotency_key`` form field; the checkout page renders a
+fresh one into its form). The first request with a key claims it through
+a unique index and runs; its response is stored, and any request repeating
+the key within IDEMPOTENCY_KEY_TTL_MINUTES gets that response back without
+running the view again. A repeat that arrives while the first request is
+still running is answered straight away, rather than holding a worker
+while it waits: an AJAX call gets 409 Conflict and retries later, and a
+plain form post (a double-clicked submit button) is redirected to the
+view's ``busy_redirect`` page with a message.
+
+Only successful responses (status below 400, and passing the view's
+``store_if`` check) are kept: after an error the client can fix the
+problem and retry with the same key. Requests without a key run normally.
+
+Expired keys are removed by ``python manage.py purge_idempotency_keys``.
+"""
+import functools
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_TTL_MINUTES = getattr(settings, 'IDEMPOTENCY_KEY_TTL_MINUTES', 30)
+
+HEADER = 'Idempotency-Key'
+FIELD = 'idempotency_key'
+
+BUSY_MESSAGE = 'This request is already being processed. Please wait a moment.'
+
+
+def get_idempotency_key(request):
+    key = request.headers.get(HEADER) or request.POST.get(FIELD) or ''
+    return key.strip()[:100]
+
+
+def _claim(scope, user, key):
+    """
+    Claim a key for this request.
+
+    Returns:
+        IdempotencyKey: None if the key was claimed, else the existing record
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(scope=scope, user=user, key=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                scope=scope, user=user, key=key,
+                expires_at=now + timedelta(minutes=IDEMPOTENCY_KEY_TTL_MINUTES),
+            )
+        return None
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(scope=scope, user=user, key=key).first()
+
+
+def _store(record_filter, response):
+    IdempotencyKey.objects.filter(**record_filter).update(
+        status=IdempotencyKey.COMPLETED,
+        response_status=response.status_code,
+        response_content_type=response.get('Content-Type', ''),
+        response_location=response.get('Location', ''),
+        response_body=response.content.decode(response.charset or 'utf-8'),
+    )
+
+
+def _replay(record):
+    response = HttpResponse(
+        record.response_body,
+        status=record.response_status,
+        content_type=record.response_content_type or None,
+    )
+    if record.response_location:
+        response['Location'] = record.response_location
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _busy(request, busy_redirect):
+    """Answer a repeat of a request that is still running"""
+    if busy_redirect and request.headers.get('X-Requested-With') != 'XMLHttpRequest':
+        messages.info(request, BUSY_MESSAGE)
+        return redirect(busy_redirect)
+    return JsonResponse({'success': False, 'message': BUSY_MESSAGE}, status=409)
+
+
+def idempotent(scope, store_if=None, busy_redirect=None):
+    """
+    Make a view safe to repeat with the same idempotency key.
+
+    Args:
+        scope: Name of the operation (keys are unique per scope and user)
+        store_if: Optional check on a successful response; return False to
+            not keep it (e.g. a JSON body reporting a failure, or a form
+            re-rendered with errors)
+        busy_redirect: URL or URL name a non-AJAX repeat is redirected to
+            while the first request is still running; without it every
+            repeat gets a 409 JSON response
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = get_idempotency_key(request)
+            user = request.user if request.user.is_authenticated else None
+            if not key or user is None:
+                return view(request, *args, **kwargs)
+
+            record = _claim(scope, user, key)
+            if record is not None:
+                if record.status != IdempotencyKey.COMPLETED:
+                    return _busy(request, busy_redirect)
+                return _replay(record)
+
+            record_filter = {'scope': scope, 'user': user, 'key': key}
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                IdempotencyKey.objects.filter(**record_filter).delete()
+                raise
+
+            keep = (
+                response.status_code < 400
+                and not getattr(response, 'streaming', False)
+                and (store_if is None or store_if(response))
+            )
+            if keep:
+                _store(record_filter, response)
+            else:
+                IdempotencyKey.objects.filter(**record_filter).delete()
+            return response
+        return wrapper
+    return decorator
+
+
+def json_success(response):
+    """store_if check for views answering {"success": ...} JSON"""
+    if 'application/json' not in response.get('Content-Type', ''):
+        return True
+    try:
+        return bool(json.loads(response.content).get('success'))
+    except ValueError:
+        return False
+
+
+def purge_expired_keys(batch_size=1000):
+    """
+    Delete expired idempotency keys in batches.
+
+    Returns:
+        int: Number of keys deleted
+    """
+    deleted = 0
+    while True:
+        batch = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=batch).delete()[0]
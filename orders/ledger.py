@@ -0,0 +1,252 @@
+"""
+Per-product sales ledger.
+
+ProductSalesLedger keeps, per product and day, the units sold and their
+gross value (price charged x quantity) and the units and amount refunded,
+so "top products" reads a few ledger rows instead of every order line.
+
+Sales are booked when an order is finalized (see finalize_order), on the
+local date the order was created. Refunds are booked when a return
+request becomes "refunded" (see orders/signals.py), against the same day
+as the sale, so net figures for a period cover the orders placed in it.
+A return for a whole order is spread over its lines by value. Changes are
+applied once the transaction commits. ``python manage.py
+rebuild_sales_ledger`` recomputes the ledger from the orders and returns.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from store.models import Product
+from .models import OrderProduct, ProductSalesLedger, ReturnRequest
+
+# top_products() metric -> ledger total it is ordered by
+METRICS = {
+    'units': 'net_units',
+    'gross': 'sales',
+    'net': 'net_sales',
+}
+
+LEDGER_FIELDS = ('units', 'gross', 'refunded_units', 'refunds')
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def _sale_day(order):
+    return timezone.localtime(order.created_at).date()
+
+
+def order_sales(order):
+    """
+    What an order adds to the ledger.
+
+    Returns:
+        dict: (day, product_id) -> (units, gross, 0, 0)
+    """
+    day = _sale_day(order)
+    lines = (
+        OrderProduct.objects.filter(order=order)
+        .values('product_id')
+        .annotate(units=Sum('quantity'), gross=Sum(F('product_price') * F('quantity')))
+        .order_by()
+    )
+    return {
+        (day, line['product_id']): (line['units'], _money(line['gross']), 0, Decimal('0.00'))
+        for line in lines
+    }
+
+
+def return_refunds(return_request):
+    """
+    What a refunded return request adds to the ledger.
+
+    The refund amount (or, if none was entered, the value of the returned
+    lines) is spread over the returned lines by value.
+
+    Returns:
+        dict: (day, product_id) -> (0, 0, refunded_units, refunds); empty
+        if the request is not refunded or the order was never placed
+    """
+    order = return_request.order
+    if return_request.status != 'refunded' or not order.is_ordered:
+        return {}
+    if return_request.order_product_id:
+        lines = [return_request.order_product]
+    else:
+        lines = list(order.orderproduct_set.all())
+    values = [_money(line.product_price * line.quantity) for line in lines]
+    total = sum(values, Decimal('0.00'))
+    refund = total if return_request.refund_amount is None else _money(return_request.refund_amount)
+
+    day = _sale_day(order)
+    changes = defaultdict(lambda: [0, Decimal('0.00'), 0, Decimal('0.00')])
+    remaining = refund
+    for index, (line, value) in enumerate(zip(lines, values)):
+        if index == len(lines) - 1:
+            amount = remaining
+        else:
+            amount = _money(refund * value / total) if total else Decimal('0.00')
+            remaining -= amount
+        change = changes[(day, line.product_id)]
+        change[2] += line.quantity
+        change[3] += amount
+    return {key: tuple(change) for key, change in changes.items()}
+
+
+def apply_ledger_changes(changes, sign=1):
+    """
+    Add (or with sign=-1, subtract) amounts to the ledger rows.
+
+    Missing rows are inserted first (ignoring ones that already exist, e.g.
+    created by a concurrent order), then each day's rows are updated in
+    one statement.
+
+    Args:
+        changes: dict of (day, product_id) -> (units, gross, refunded_units, refunds)
+        sign: 1 to add, -1 to subtract
+    """
+    by_day = defaultdict(dict)
+    for (day, product_id), change in changes.items():
+        if any(change):
+            by_day[day][product_id] = change
+    for day, products in by_day.items():
+        ProductSalesLedger.objects.bulk_create(
+            [ProductSalesLedger(day=day, product_id=product_id) for product_id in products],
+            ignore_conflicts=True,
+        )
+        updates = {}
+        for index, field in enumerate(LEDGER_FIELDS):
+            output_field = IntegerField() if field.endswith('units') else DecimalField(max_digits=14, decimal_places=2)
+            updates[field] = F(field) + Case(
+                *[When(product_id=product_id, then=Value(sign * change[index])) for product_id, change in products.items()],
+                default=Value(0),
+                output_field=output_field,
+            )
+        ProductSalesLedger.objects.filter(day=day, product_id__in=list(products)).update(**updates)
+
+
+def record_order_sales(order):
+    """Book a finalized order's lines once the transaction commits"""
+    transaction.on_commit(lambda: apply_ledger_changes(order_sales(order)))
+
+
+def sync_return_change(old, new):
+    """
+    Apply the ledger change between two states of a return request.
+
+    Args:
+        old: return_refunds() before the change
+        new: return_refunds() after the change
+    """
+    if old == new:
+        return
+
+    def apply():
+        apply_ledger_changes(old, sign=-1)
+        apply_ledger_changes(new)
+
+    transaction.on_commit(apply)
+
+
+def last_days(days):
+    """The (start, end) date range covering the last ``days`` days up to today"""
+    today = timezone.localdate()
+    return today - timedelta(days=days), today
+
+
+def top_products(date_range=None, metric='units', limit=10):
+    """
+    Best selling products, read from the sales ledger.
+
+    Args:
+        date_range: (start, end) dates, inclusive; either may be None. None
+            covers all time.
+        metric: 'units' (net units sold), 'gross' (sales value) or 'net'
+            (sales value less refunds)
+        limit: Number of products returned
+
+    Returns:
+        list: dicts with product, units, gross, refunded_units, refunds and net
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {', '.join(METRICS)}")
+    start, end = date_range or (None, None)
+    ledger = ProductSalesLedger.objects.all()
+    if start:
+        ledger = ledger.filter(day__gte=start)
+    if end:
+        ledger = ledger.filter(day__lte=end)
+    totals = list(
+        ledger.values('product_id')
+        .annotate(
+            sold=Sum('units'),
+            sales=Sum('gross'),
+            returned=Sum('refunded_units'),
+            refunded=Sum('refunds'),
+        )
+        .annotate(net_units=F('sold') - F('returned'), net_sales=F('sales') - F('refunded'))
+        .order_by(f'-{METRICS[metric]}', 'product_id')[:limit]
+    )
+    products = Product.objects.in_bulk([row['product_id'] for row in totals])
+    return [
+        {
+            'product': products[row['product_id']],
+            'units': row['net_units'],
+            'gross': _money(row['sales']),
+            'refunded_units': row['returned'],
+            'refunds': _money(row['refunded']),
+            'net': _money(row['net_sales']),
+        }
+        for row in totals
+    ]
+
+
+def rebuild_sales_ledger(batch_size=500):
+    """
+    Recompute the whole ledger from the placed orders and refunded returns.
+
+    Returns:
+        int: Number of ledger rows written
+    """
+    totals = defaultdict(lambda: [0, Decimal('0.00'), 0, Decimal('0.00')])
+    sales = (
+        OrderProduct.objects.filter(order__is_ordered=True)
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', 'product_id')
+        .annotate(units=Sum('quantity'), gross=Sum(F('product_price') * F('quantity')))
+        .order_by()
+    )
+    for row in sales:
+        total = totals[(row['day'], row['product_id'])]
+        total[0] += row['units']
+        total[1] += _money(row['gross'])
+
+    refunded = (
+        ReturnRequest.objects.filter(status='refunded', order__is_ordered=True)
+        .select_related('order', 'order_product')
+        .prefetch_related('order__orderproduct_set')
+    )
+    for return_request in refunded.iterator(chunk_size=batch_size):
+        for key, (_, _, refunded_units, refunds) in return_refunds(return_request).items():
+            total = totals[key]
+            total[2] += refunded_units
+            total[3] += refunds
+
+    rows = [
+        ProductSalesLedger(
+            day=day, product_id=product_id,
+            units=units, gross=gross, refunded_units=refunded_units, refunds=refunds,
+        )
+        for (day, product_id), (units, gross, refunded_units, refunds) in totals.items()
+    ]
+    with transaction.atomic():
+        ProductSalesLedger.objects.all().delete()
+        ProductSalesLedger.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from orders.ledger import rebuild_sales_ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-product sales ledger from placed orders and refunded returns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of ledger rows written per INSERT batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_sales_ledger(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt the sales ledger. {rows} day/product rows written.')
+        )
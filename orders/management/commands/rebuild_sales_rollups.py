@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from orders.rollups import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily sales rollups from placed orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rollup rows written per INSERT batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild_sales_rollups(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt daily sales rollups. {rows} day/status rows written.')
+        )
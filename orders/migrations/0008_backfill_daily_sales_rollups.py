@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_sales_rollups(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    DailySalesRollup = apps.get_model('orders', 'DailySalesRollup')
+
+    stats = (
+        Order.objects.filter(is_ordered=True)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'status')
+        .annotate(orders=Count('id'), revenue=Sum('final_total'), discount=Sum('discount'))
+        .order_by()
+    )
+    DailySalesRollup.objects.bulk_create(
+        (
+            DailySalesRollup(
+                day=row['day'],
+                status=row['status'],
+                orders=row['orders'],
+                revenue=Decimal(str(row['revenue'] or 0)).quantize(Decimal('0.01')),
+                discount=Decimal(str(row['discount'] or 0)).quantize(Decimal('0.01')),
+            )
+            for row in stats
+        ),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_dailysalesrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_sales_rollups, migrations.RunPython.noop),
+    ]
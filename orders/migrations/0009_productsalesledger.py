@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 22:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_backfill_daily_sales_rollups'),
+        ('store', '0009_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.IntegerField(default=0)),
+                ('gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('refunded_units', models.IntegerField(default=0)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_ledger', to='store.product')),
+            ],
+            options={
+                'ordering': ['-day', 'product'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='orders_product_sales_ledger_unique')],
+            },
+        ),
+    ]
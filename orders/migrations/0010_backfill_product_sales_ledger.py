@@ -0,0 +1,73 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def backfill_product_sales_ledger(apps, schema_editor):
+    OrderProduct = apps.get_model('orders', 'OrderProduct')
+    ReturnRequest = apps.get_model('orders', 'ReturnRequest')
+    ProductSalesLedger = apps.get_model('orders', 'ProductSalesLedger')
+
+    totals = defaultdict(lambda: [0, Decimal('0.00'), 0, Decimal('0.00')])
+    sales = (
+        OrderProduct.objects.filter(order__is_ordered=True)
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', 'product_id')
+        .annotate(units=Sum('quantity'), gross=Sum(F('product_price') * F('quantity')))
+        .order_by()
+    )
+    for row in sales:
+        total = totals[(row['day'], row['product_id'])]
+        total[0] += row['units']
+        total[1] += _money(row['gross'])
+
+    refunded = ReturnRequest.objects.filter(status='refunded', order__is_ordered=True).annotate(
+        day=TruncDate('order__created_at')
+    )
+    for return_request in refunded:
+        if return_request.order_product_id:
+            lines = list(OrderProduct.objects.filter(id=return_request.order_product_id))
+        else:
+            lines = list(OrderProduct.objects.filter(order_id=return_request.order_id))
+        values = [_money(line.product_price * line.quantity) for line in lines]
+        line_total = sum(values, Decimal('0.00'))
+        refund = line_total if return_request.refund_amount is None else _money(return_request.refund_amount)
+        remaining = refund
+        for index, (line, value) in enumerate(zip(lines, values)):
+            if index == len(lines) - 1:
+                amount = remaining
+            else:
+                amount = _money(refund * value / line_total) if line_total else Decimal('0.00')
+                remaining -= amount
+            total = totals[(return_request.day, line.product_id)]
+            total[2] += line.quantity
+            total[3] += amount
+
+    ProductSalesLedger.objects.bulk_create(
+        (
+            ProductSalesLedger(
+                day=day, product_id=product_id,
+                units=units, gross=gross, refunded_units=refunded_units, refunds=refunds,
+            )
+            for (day, product_id), (units, gross, refunded_units, refunds) in totals.items()
+        ),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_productsalesledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_product_sales_ledger, migrations.RunPython.noop),
+    ]
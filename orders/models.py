@@ -1,8 +1,6 @@
 from django.db import models
 from accounts.models import Account
 from store.models import Product, Variation
-import random
-import string
 
 
 class Payment(models.Model):
@@ -68,25 +66,27 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Seller dashboard: placed orders by status, newest first
+            models.Index(fields=['is_ordered', 'status', 'created_at'], name='orders_order_status_idx'),
+            models.Index(fields=['is_ordered', 'created_at'], name='orders_order_placed_idx'),
+        ]
 
     @staticmethod
     def generate_order_number(user_id):
         """
         Generate a unique order number in e-commerce format.
         
-        Format: YYYYMMDD-XXXXXX-XX
+        Format: YYYYMMDD-XXXXXX
         Breakdown:
         - YYYYMMDD → Date (e.g., 20251120)
-        - XXXXXX → Order sequence number (padded with zeros, e.g., 000123)
-        - XX → Random digits to avoid duplicates (e.g., 18)
+        - XXXXXX → That day's order sequence number (padded with zeros, e.g., 000123)
         
-        Example: 20251120-000123-18
+        Example: 20251120-000123
         
-        This format is:
-        ✔ Unique (timestamp + sequence + random)
-        ✔ Sortable (by date)
-        ✔ Easy to read (with dashes)
-        ✔ Good for customer support
+        The sequence comes from a locked daily counter row, so it is unique
+        even when several orders are placed at the same time (see
+        orders/numbering.py).
         
         Args:
             user_id: The ID of the user placing the order
@@ -94,41 +94,8 @@ class Order(models.Model):
         Returns:
             str: A unique order number
         """
-        from datetime import datetime
-        
-        # Get current date (YYYYMMDD)
-        date_str = datetime.now().strftime('%Y%m%d')
-        
-        # Get the count of orders today to create sequence number
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_orders_count = Order.objects.filter(
-            created_at__gte=today_start
-        ).count()
-        
-        # Create sequence number (6 digits, padded with zeros)
-        # Add 1 because this will be the next order
-        sequence = str(today_orders_count + 1).zfill(6)
-        
-        # Add random 2 digits for uniqueness
-        random_str = ''.join(random.choices(string.digits, k=2))
-        
-        # Combine: date-sequence-random
-        order_number = f"{date_str}-{sequence}-{random_str}"
-        
-        # Ensure uniqueness - regenerate if exists
-        max_attempts = 100
-        attempts = 0
-        while Order.objects.filter(order_number=order_number).exists() and attempts < max_attempts:
-            random_str = ''.join(random.choices(string.digits, k=2))
-            order_number = f"{date_str}-{sequence}-{random_str}"
-            attempts += 1
-        
-        if attempts >= max_attempts:
-            # Fallback: use longer random string if still not unique
-            random_str = ''.join(random.choices(string.digits, k=4))
-            order_number = f"{date_str}-{sequence}-{random_str}"
-        
-        return order_number
+        from .numbering import next_order_number
+        return next_order_number()
 
     def full_name(self):
         return f'{self.first_name} {self.last_name}'
@@ -226,3 +193,113 @@ class ReturnRequest(models.Model):
 
     def __str__(self):
         return f"Return request for Order #{self.order.order_number}"
+
+
+class StockReservation(models.Model):
+    """Stock held for an order that is waiting for online payment"""
+    HELD = 'held'
+    CONVERTED = 'converted'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (CONVERTED, 'Converted'),
+        (RELEASED, 'Released'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.IntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField(help_text="Held stock is released after this time if the order is not paid")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'status', 'expires_at'], name='orders_reservation_active_idx'),
+            models.Index(fields=['status', 'expires_at'], name='orders_reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product} for Order #{self.order.order_number} ({self.status})"
+
+
+class OrderNumberSequence(models.Model):
+    """Daily order number counter (the last sequence number handed out for a day)"""
+    day = models.DateField(unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day:%Y%m%d}: {self.last_value}"
+
+
+class IdempotencyKey(models.Model):
+    """A client-supplied key and the response it got, so a replayed request is answered from here"""
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+    STATUS_CHOICES = [
+        (PROCESSING, 'Processing'),
+        (COMPLETED, 'Completed'),
+    ]
+
+    key = models.CharField(max_length=100)
+    scope = models.CharField(max_length=50, help_text="View the key was used for")
+    user = models.ForeignKey(Account, on_delete=models.CASCADE, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PROCESSING)
+    response_status = models.IntegerField(null=True, blank=True)
+    response_content_type = models.CharField(max_length=100, blank=True)
+    response_location = models.CharField(max_length=500, blank=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'user', 'key'], name='orders_idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='orders_idempotency_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.status})"
+
+
+class DailySalesRollup(models.Model):
+    """Placed orders, revenue and discount per day and order status (kept up to date by orders.rollups)"""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-day', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='orders_daily_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.orders} {self.status} orders"
+
+
+class ProductSalesLedger(models.Model):
+    """Units sold, gross sales and refunds per product and day (kept up to date by orders.ledger)"""
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_ledger')
+    units = models.IntegerField(default=0)
+    gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunded_units = models.IntegerField(default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-day', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='orders_product_sales_ledger_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: {self.units} x {self.product}"
@@ -0,0 +1,96 @@
+"""
+Order number allocation.
+
+Order numbers look like YYYYMMDD-NNNNNN: the local date and that day's
+sequence number. Each day has one OrderNumberSequence row; a number is
+taken by locking the row (SELECT ... FOR UPDATE) and incrementing it, so
+allocation is O(1) and concurrent checkouts can never get the same number.
+
+With the default ORDER_NUMBER_BLOCK_SIZE of 1 the increment is part of
+the order's transaction: if the order is rolled back so is its number, and
+numbers have no gaps. The counter row stays locked until the order
+commits, which serializes checkouts. For high-throughput sales set a
+larger block size: each process then reserves a block of numbers at a
+time and hands them out from memory (numbers stay unique and increasing
+per process, but can have gaps and interleave between processes).
+"""
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OrderNumberSequence
+
+ORDER_NUMBER_BLOCK_SIZE = getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 1)
+
+# Day -> [next, end) numbers reserved by this process
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def format_order_number(day, sequence):
+    return f"{day:%Y%m%d}-{sequence:06d}"
+
+
+def allocate_sequence(day, count=1):
+    """
+    Reserve ``count`` consecutive sequence numbers for a day.
+
+    Args:
+        day: Date the numbers belong to
+        count: How many numbers to reserve
+
+    Returns:
+        int: The first reserved number
+    """
+    with transaction.atomic():
+        counter, _ = OrderNumberSequence.objects.select_for_update().get_or_create(day=day)
+        first = counter.last_value + 1
+        counter.last_value += count
+        counter.save(update_fields=['last_value'])
+    return first
+
+
+def _take_from_block(day):
+    with _blocks_lock:
+        block = _blocks.get(day)
+        if block and block[0] < block[1]:
+            block[0] += 1
+            return block[0] - 1
+    return None
+
+
+def _store_block(day, start, end):
+    with _blocks_lock:
+        # Drop blocks of earlier days
+        for old_day in [d for d in _blocks if d != day]:
+            del _blocks[old_day]
+        _blocks[day] = [start, end]
+
+
+def next_order_number(block_size=None):
+    """
+    Get the next order number.
+
+    Args:
+        block_size: Numbers reserved per database round trip (defaults to
+            ORDER_NUMBER_BLOCK_SIZE)
+
+    Returns:
+        str: A unique order number (YYYYMMDD-NNNNNN)
+    """
+    block_size = block_size or ORDER_NUMBER_BLOCK_SIZE
+    day = timezone.localdate()
+
+    if block_size > 1:
+        sequence = _take_from_block(day)
+        if sequence is not None:
+            return format_order_number(day, sequence)
+
+    sequence = allocate_sequence(day, block_size)
+    if block_size > 1:
+        # The rest of the block only becomes usable once the reservation is
+        # committed; if it is rolled back nobody else can hand them out twice
+        transaction.on_commit(lambda: _store_block(day, sequence + 1, sequence + block_size))
+    return format_order_number(day, sequence)
@@ -0,0 +1,117 @@
+"""
+Daily sales rollups.
+
+DailySalesRollup keeps, per day and order status, how many orders were
+placed and their revenue and discount, so dashboards read a few rollup
+rows instead of scanning the order table.
+
+Rows are maintained incrementally from Order saves and deletes (see
+orders/signals.py): an order counts once it is placed (is_ordered), on
+the local date it was created, under its current status. When an order
+is placed, changes status or changes amount, its old contribution is
+subtracted and the new one added. The change is applied once the order's
+transaction commits, so the busy row for today is only locked for one
+short statement. ``python manage.py rebuild_sales_rollups`` recomputes
+the rows from the orders.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesRollup, Order
+
+
+def _money(value):
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def order_contribution(order):
+    """
+    What an order adds to the rollups.
+
+    Returns:
+        tuple: (day, status, revenue, discount), or None if it doesn't count
+    """
+    if not order.is_ordered or not order.created_at:
+        return None
+    return (
+        timezone.localtime(order.created_at).date(),
+        order.status,
+        _money(order.final_total),
+        _money(order.discount),
+    )
+
+
+def apply_rollup_change(day, status, orders, revenue, discount):
+    """Add (or with negative values, subtract) amounts to a day's rollup row"""
+    row = DailySalesRollup.objects.filter(day=day, status=status)
+    updates = dict(
+        orders=F('orders') + orders,
+        revenue=F('revenue') + revenue,
+        discount=F('discount') + discount,
+    )
+    if row.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            DailySalesRollup.objects.create(
+                day=day, status=status, orders=orders, revenue=revenue, discount=discount,
+            )
+    except IntegrityError:
+        # Created by a concurrent order in the meantime
+        row.update(**updates)
+
+
+def sync_order_change(old, new):
+    """
+    Apply the rollup change between two states of an order.
+
+    Args:
+        old: order_contribution() before the change, or None
+        new: order_contribution() after the change, or None
+    """
+    if old == new:
+        return
+
+    def apply():
+        if old:
+            day, status, revenue, discount = old
+            apply_rollup_change(day, status, -1, -revenue, -discount)
+        if new:
+            day, status, revenue, discount = new
+            apply_rollup_change(day, status, 1, revenue, discount)
+
+    transaction.on_commit(apply)
+
+
+def rebuild_sales_rollups(batch_size=500):
+    """
+    Recompute every rollup row from the placed orders.
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    stats = (
+        Order.objects.filter(is_ordered=True)
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'status')
+        .annotate(orders=Count('id'), revenue=Sum('final_total'), discount=Sum('discount'))
+        .order_by()
+    )
+    rows = [
+        DailySalesRollup(
+            day=row['day'],
+            status=row['status'],
+            orders=row['orders'],
+            revenue=_money(row['revenue']),
+            discount=_money(row['discount']),
+        )
+        for row in stats
+    ]
+    with transaction.atomic():
+        DailySalesRollup.objects.all().delete()
+        DailySalesRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
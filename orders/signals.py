@@ -0,0 +1,51 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import Order, ReturnRequest
+from .ledger import return_refunds, sync_return_change
+from .rollups import order_contribution, sync_order_change
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_sales_state(sender, instance, **kwargs):
+    instance._previous_sales_state = None
+    if instance.pk:
+        previous = Order.objects.filter(pk=instance.pk).only(
+            'is_ordered', 'status', 'final_total', 'discount', 'created_at'
+        ).first()
+        if previous is not None:
+            instance._previous_sales_state = order_contribution(previous)
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_order_change(getattr(instance, '_previous_sales_state', None), order_contribution(instance))
+
+
+@receiver(post_delete, sender=Order)
+def update_sales_rollup_on_delete(sender, instance, **kwargs):
+    sync_order_change(order_contribution(instance), None)
+
+
+@receiver(pre_save, sender=ReturnRequest)
+def remember_previous_refunds(sender, instance, **kwargs):
+    instance._previous_refunds = {}
+    if instance.pk:
+        previous = ReturnRequest.objects.filter(pk=instance.pk).select_related('order', 'order_product').first()
+        if previous is not None:
+            instance._previous_refunds = return_refunds(previous)
+
+
+@receiver(post_save, sender=ReturnRequest)
+def update_sales_ledger_on_return(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_return_change(getattr(instance, '_previous_refunds', {}), return_refunds(instance))
+
+
+@receiver(pre_delete, sender=ReturnRequest)
+def update_sales_ledger_on_return_delete(sender, instance, **kwargs):
+    # Read before the delete: when the order itself is being deleted its
+    # lines may be gone by post_delete
+    sync_return_change(return_refunds(instance), {})
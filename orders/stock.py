@@ -0,0 +1,238 @@
+"""
+Stock accounting for orders.
+
+Cash on delivery orders take stock immediately. Orders paid online hold it
+instead: a StockReservation keeps the units out of the available-to-sell
+count for STOCK_RESERVATION_TTL_MINUTES while the customer pays. The
+Razorpay callback converts the holds into a real stock decrement, and
+holds that were never paid are released by the
+release_expired_reservations command, so abandoned payments cannot strand
+inventory.
+
+Available to sell = Product.stock - active (held, unexpired) reservations.
+
+Every function that checks or changes stock locks the product rows with
+SELECT ... FOR UPDATE in id order, so concurrent checkouts cannot oversell
+or deadlock.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from aromas.cache import invalidate_model
+from store.models import Product
+from .models import StockReservation
+
+logger = logging.getLogger(__name__)
+
+STOCK_RESERVATION_TTL_MINUTES = getattr(settings, 'STOCK_RESERVATION_TTL_MINUTES', 15)
+
+
+class InsufficientStock(Exception):
+    """Raised when an order asks for more units than are available"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(self.message)
+
+    @property
+    def message(self):
+        error_msg = "Some products don't have sufficient stock:\n"
+        for item in self.shortages:
+            error_msg += f"- {item['product']}: Available {item['available']}, Requested {item['requested']}\n"
+        return error_msg
+
+
+def active_holds(product_ids, exclude_order=None):
+    """
+    Units currently held for unpaid orders.
+
+    Args:
+        product_ids: Products to check
+        exclude_order: Order whose own holds should not count
+
+    Returns:
+        dict: product id -> held quantity
+    """
+    holds = StockReservation.objects.filter(
+        product_id__in=product_ids,
+        status=StockReservation.HELD,
+        expires_at__gt=timezone.now(),
+    )
+    if exclude_order is not None:
+        holds = holds.exclude(order=exclude_order)
+    return dict(holds.values('product_id').annotate(held=Sum('quantity')).values_list('product_id', 'held'))
+
+
+def available_stock(product):
+    """Units of a product that can still be sold (stock minus active holds)"""
+    return max(product.stock - active_holds([product.id]).get(product.id, 0), 0)
+
+
+def lock_products(product_ids):
+    """Lock product rows (in id order) for the rest of the transaction"""
+    return {
+        product.id: product
+        for product in Product.objects.select_for_update().filter(id__in=product_ids).order_by('id')
+    }
+
+
+def check_availability(products, requested):
+    """
+    Raise InsufficientStock unless every requested quantity is available.
+
+    Args:
+        products: Locked products by id
+        requested: product id -> quantity
+    """
+    held = active_holds(requested.keys())
+    shortages = []
+    for product_id, quantity in requested.items():
+        available = max(products[product_id].stock - held.get(product_id, 0), 0)
+        if available < quantity:
+            shortages.append({
+                'product': products[product_id].product_name,
+                'available': available,
+                'requested': quantity,
+            })
+    if shortages:
+        raise InsufficientStock(shortages)
+
+
+def decrement_stock(products, requested):
+    """
+    Take stock for locked products in one UPDATE.
+
+    Products that run out are marked unavailable, and low stock alerts are
+    sent once the transaction commits. The cached listings, facets and menu
+    only change when a product sells out (in-stock counts, availability),
+    so they are invalidated only then, not on every sale.
+
+    Args:
+        products: Locked products by id
+        requested: product id -> quantity
+    """
+    if not requested:
+        return
+
+    sold_out = [
+        product_id for product_id, quantity in requested.items()
+        if products[product_id].stock <= quantity
+        and (products[product_id].stock > 0 or products[product_id].is_available)
+    ]
+    Product.objects.filter(id__in=requested).update(
+        stock=Case(*[
+            When(id=product_id, then=Greatest(F('stock') - quantity, Value(0)))
+            for product_id, quantity in requested.items()
+        ]),
+        is_available=Case(When(id__in=sold_out, then=Value(False)), default=F('is_available')),
+    )
+    if sold_out:
+        invalidate_model(Product)
+
+    low_stock = []
+    for product_id, quantity in requested.items():
+        product = products[product_id]
+        product.stock = max(product.stock - quantity, 0)
+        if product.stock <= 0:
+            product.is_available = False
+        if product.stock <= product.min_stock_alert:
+            low_stock.append(product)
+    if low_stock:
+        transaction.on_commit(lambda: _notify_low_stock(low_stock))
+
+
+def _notify_low_stock(products):
+    try:
+        from notifications.utils import notify_low_stock
+        for product in products:
+            notify_low_stock(product)
+    except Exception:
+        pass  # Don't fail order if notification fails
+
+
+def hold_stock(order, products, requested):
+    """
+    Hold stock for an order awaiting payment (locked products, checked first).
+
+    Returns:
+        list: The created StockReservation objects
+    """
+    expires_at = timezone.now() + timedelta(minutes=STOCK_RESERVATION_TTL_MINUTES)
+    return StockReservation.objects.bulk_create([
+        StockReservation(order=order, product=products[product_id], quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in requested.items()
+    ])
+
+
+def convert_stock_reservations(order):
+    """
+    Turn an order's holds into a stock decrement once it has been paid.
+
+    Holds that already expired (or were released) are converted too, since
+    the customer has paid; if the stock was sold in the meantime it is
+    clamped at zero and a warning is logged for follow-up.
+
+    Args:
+        order: Paid order
+
+    Returns:
+        int: Number of reservations converted
+    """
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order=order)
+            .exclude(status=StockReservation.CONVERTED)
+        )
+        if not reservations:
+            return 0
+
+        requested = defaultdict(int)
+        for reservation in reservations:
+            requested[reservation.product_id] += reservation.quantity
+        products = lock_products(requested)
+
+        late = [r for r in reservations if r.status != StockReservation.HELD or r.expires_at <= timezone.now()]
+        if late:
+            held = active_holds(requested.keys(), exclude_order=order)
+            for product_id, quantity in requested.items():
+                if products[product_id].stock - held.get(product_id, 0) < quantity:
+                    logger.warning(
+                        f"Order {order.order_number} was paid after its stock hold expired; "
+                        f"{products[product_id].product_name} may be oversold"
+                    )
+
+        decrement_stock(products, requested)
+        StockReservation.objects.filter(id__in=[r.id for r in reservations]).update(status=StockReservation.CONVERTED)
+    return len(reservations)
+
+
+def release_expired_reservations(batch_size=500):
+    """
+    Release expired holds in batches.
+
+    Args:
+        batch_size: Reservations released per UPDATE
+
+    Returns:
+        int: Number of reservations released
+    """
+    released = 0
+    while True:
+        batch = list(
+            StockReservation.objects.filter(status=StockReservation.HELD, expires_at__lte=timezone.now())
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            return released
+        released += StockReservation.objects.filter(id__in=batch, status=StockReservation.HELD).update(
+            status=StockReservation.RELEASED
+        )
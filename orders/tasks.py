@@ -0,0 +1,26 @@
+"""
+Background tasks for orders (run by the ``run_tasks`` worker).
+
+Queued by ``orders.utils.finalize_order`` so the checkout and payment
+callback respond without waiting for emails or the PDF invoice.
+"""
+from tasks.queue import task
+from .models import Order
+
+
+@task('orders.notify_new_order')
+def notify_new_order_task(order_id):
+    """Notify the admins about a new order"""
+    from notifications.utils import notify_new_order
+    order = Order.objects.filter(id=order_id).first()
+    if order is not None:
+        notify_new_order(order)
+
+
+@task('orders.send_invoice_email')
+def send_invoice_email_task(order_id):
+    """Email the customer their invoice"""
+    from .utils import send_invoice_email
+    order = Order.objects.filter(id=order_id).first()
+    if order is not None:
+        send_invoice_email(order)
@@ -1,3 +1,685 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.messages import get_messages
+from django.db import connection, transaction
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from aromas.cache import get_version
+
+from accounts.models import Account
+from cart.models import Cart, CartItem
+from category.models import Category
+from store.models import Product, Variation
+from tasks.models import Task
+from .idempotency import BUSY_MESSAGE, idempotent, json_success
+from . import numbering
+from .exports import LINE_HEADER, ORDER_HEADER, filter_orders, order_header, order_rows
+from .ledger import order_sales, rebuild_sales_ledger, record_order_sales, return_refunds, top_products
+from .rollups import rebuild_sales_rollups
+from .models import (
+    DailySalesRollup, IdempotencyKey, Order, OrderNumberSequence, OrderProduct, OrderTracking, Payment,
+    ProductSalesLedger, ReturnRequest, StockReservation,
+)
+from .stock import (
+    InsufficientStock, available_stock, convert_stock_reservations, decrement_stock, lock_products,
+    release_expired_reservations,
+)
+from .utils import finalize_order, place_order_lines
+
+FORM_DATA = {
+    'first_name': 'Asha', 'last_name': 'Rao', 'phone': '9999999999', 'email': 'asha@example.com',
+    'address_line_1': '1 Street', 'city': 'Pune', 'state': 'MH', 'country': 'India', 'pincode': '411001',
+}
+
+
+class OrderTestMixin:
+    """Users, products and carts shared by the order tests"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(Category_name='Attar', slug='attar')
+        cls.user = Account.objects.create_user('Asha', 'Rao', 'asha', 'asha@example.com', 'secret')
+        cls.user.is_active = True
+        cls.user.save()
+
+    @classmethod
+    def create_product(cls, name, price=500, stock=10, **fields):
+        return Product.objects.create(
+            product_name=name, slug=name.lower().replace(' ', '-'), price=price, stock=stock,
+            category=cls.category, images=f'photos/products/{name.lower()}.jpg', **fields,
+        )
+
+    def create_cart(self, lines, user=None):
+        """Cart holding (product, quantity) lines"""
+        cart = Cart.objects.create(cart_id=f'cart-{Cart.objects.count()}', user=user)
+        for product, quantity in lines:
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+        return cart
+
+    def create_pending_order(self, lines):
+        """An order awaiting online payment, with its stock held"""
+        payment = Payment.objects.create(
+            user=self.user, payment_id='pay_pending', payment_method='UPI', amount_paid='0', status='Pending',
+        )
+        order = Order.objects.create(
+            user=self.user, payment=payment, order_number=Order.generate_order_number(self.user.id),
+            order_total=0, tax=0, final_total=0, is_ordered=False, **FORM_DATA,
+        )
+        cart = self.create_cart(lines)
+        place_order_lines(order, payment, self.user, cart.cartitem_set.all(), hold=True)
+        return order
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class RazorpayCallbackTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        self.product = self.create_product('Oud', stock=10)
+        self.order = self.create_pending_order([(self.product, 2)])
+
+    def post_callback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('orders:razorpay_payment_callback'), {
+                'razorpay_order_id': 'order_1',
+                'razorpay_payment_id': 'pay_1',
+                'razorpay_signature': 'sig',
+                'order_number': self.order.order_number,
+            })
+
+    @mock.patch('orders.views.verify_razorpay_payment', return_value=False)
+    def test_bad_signature_leaves_order_and_holds(self, verify):
+        with self.assertLogs('orders.views', level='WARNING'):
+            self.assertFalse(self.post_callback().json()['success'])
+
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_ordered)
+        self.assertEqual(self.order.payment.status, 'Pending')
+        self.assertEqual(StockReservation.objects.get(order=self.order).status, StockReservation.HELD)
+        self.assertEqual(available_stock(self.product), 8)
+
+    @mock.patch('orders.views.verify_razorpay_payment', return_value=True)
+    def test_replayed_callback_finalizes_once(self, verify):
+        self.assertTrue(self.post_callback().json()['success'])
+        self.assertTrue(self.post_callback().json()['success'])
+
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertTrue(self.order.is_ordered)
+        self.assertEqual(self.product.stock, 8)
+        self.assertEqual(OrderTracking.objects.filter(order=self.order).count(), 1)
+        self.assertEqual(Task.objects.filter(name='orders.notify_new_order').count(), 1)
+        self.assertEqual(Task.objects.filter(name='orders.send_invoice_email').count(), 1)
+        self.assertEqual(ProductSalesLedger.objects.get(product=self.product).units, 2)
+        self.assertEqual(DailySalesRollup.objects.get(status='New').orders, 1)
+        self.assertEqual(
+            StockReservation.objects.get(order=self.order).status, StockReservation.CONVERTED,
+        )
+
+
+class StockHoldTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        self.product = self.create_product('Oud', stock=5)
+
+    def test_holds_reduce_available_stock(self):
+        order = self.create_pending_order([(self.product, 3)])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        self.assertEqual(available_stock(self.product), 2)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            self.create_pending_order([(self.product, 3)])
+        self.assertEqual(raised.exception.shortages[0]['available'], 2)
+        self.assertEqual(StockReservation.objects.exclude(order=order).count(), 0)
+
+    def test_expired_holds_are_released(self):
+        order = self.create_pending_order([(self.product, 3)])
+        fresh = self.create_pending_order([(self.product, 1)])
+        StockReservation.objects.filter(order=order).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(available_stock(self.product), 4)
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(StockReservation.objects.get(order=order).status, StockReservation.RELEASED)
+        self.assertEqual(StockReservation.objects.get(order=fresh).status, StockReservation.HELD)
+
+    def test_paid_order_converts_holds_once(self):
+        order = self.create_pending_order([(self.product, 3)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(convert_stock_reservations(order), 1)
+            self.assertEqual(convert_stock_reservations(order), 0)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertEqual(available_stock(self.product), 2)
+
+    def test_payment_after_expiry_still_takes_stock(self):
+        order = self.create_pending_order([(self.product, 3)])
+        StockReservation.objects.filter(order=order).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.create_pending_order([(self.product, 4)])
+
+        with self.assertLogs('orders.stock', level='WARNING'), self.captureOnCommitCallbacks(execute=True):
+            convert_stock_reservations(order)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+
+
+class PlaceOrderLinesTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        self.oud = self.create_product('Oud', price=500, stock=5)
+        self.musk = self.create_product('Musk', price=300, stock=5)
+        self.payment = Payment.objects.create(
+            user=self.user, payment_id='pay', payment_method='COD', amount_paid='0', status='Completed',
+        )
+
+    def place(self, cart):
+        order = Order.objects.create(
+            user=self.user, payment=self.payment, order_number=f'order-{Order.objects.count()}',
+            order_total=0, tax=0, **FORM_DATA,
+        )
+        with transaction.atomic():
+            place_order_lines(order, self.payment, self.user, cart.cartitem_set.all())
+        return order
+
+    def stock(self):
+        return list(Product.objects.filter(id__in=[self.oud.id, self.musk.id]).order_by('id').values_list('stock', flat=True))
+
+    def test_takes_stock_and_copies_lines(self):
+        red = Variation.objects.create(product=self.oud, variation_category='color', variation_value='red')
+        cart = self.create_cart([(self.oud, 2), (self.musk, 5)])
+        cart.cartitem_set.get(product=self.oud).variations.add(red)
+
+        order = self.place(cart)
+
+        self.assertEqual(self.stock(), [3, 0])
+        self.assertFalse(Product.objects.get(id=self.musk.id).is_available)
+        lines = {line.product_id: line for line in OrderProduct.objects.filter(order=order)}
+        self.assertEqual(lines[self.oud.id].product_price, 500)
+        self.assertEqual(list(lines[self.oud.id].variations.all()), [red])
+
+    def test_lines_of_one_product_are_checked_together(self):
+        cart = self.create_cart([(self.oud, 3)])
+        CartItem.objects.create(cart=cart, product=self.oud, quantity=3, variation_signature='7')
+
+        with self.assertRaises(InsufficientStock) as raised:
+            self.place(cart)
+        self.assertEqual(raised.exception.shortages, [{'product': 'Oud', 'available': 5, 'requested': 6}])
+
+    def test_shortage_writes_nothing(self):
+        with self.assertRaises(InsufficientStock):
+            self.place(self.create_cart([(self.oud, 2), (self.musk, 6)]))
+        self.assertEqual(self.stock(), [5, 5])
+        self.assertFalse(OrderProduct.objects.exists())
+
+    def test_query_count_does_not_grow_with_lines(self):
+        def queries(products):
+            cart = self.create_cart([(product, 1) for product in products])
+            with CaptureQueriesContext(connection) as captured:
+                self.place(cart)
+            return len(captured)
+
+        others = [self.create_product(f'Attar {i}') for i in range(4)]
+        self.assertEqual(queries([self.oud, self.musk]), queries([self.oud, self.musk] + others))
+
+
+class DecrementStockTests(OrderTestMixin, TestCase):
+    namespace = 'store:facets'
+
+    def setUp(self):
+        import store.facets  # noqa: F401  (registers the namespace on Product)
+        self.product = self.create_product('Oud', stock=5)
+
+    def decrement(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            decrement_stock(lock_products([self.product.id]), {self.product.id: quantity})
+        self.product.refresh_from_db()
+
+    def test_sale_keeps_product_caches(self):
+        version = get_version(self.namespace)
+        self.decrement(2)
+        self.assertEqual(self.product.stock, 3)
+        self.assertTrue(self.product.is_available)
+        self.assertEqual(get_version(self.namespace), version)
+
+    def test_selling_out_invalidates_product_caches(self):
+        version = get_version(self.namespace)
+        self.decrement(5)
+        self.assertEqual(self.product.stock, 0)
+        self.assertFalse(self.product.is_available)
+        self.assertNotEqual(get_version(self.namespace), version)
+
+
+calls = []
+
+
+@idempotent('tests', store_if=json_success)
+def counting_view(request):
+    calls.append(request.POST.get('value'))
+    if request.POST.get('value') == 'bad':
+        return JsonResponse({'success': False}, status=400)
+    return JsonResponse({'success': True, 'call': len(calls)})
+
+
+class IdempotencyTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def call(self, key='key-1', value='ok'):
+        request = RequestFactory().post('/', {'value': value}, HTTP_IDEMPOTENCY_KEY=key)
+        request.user = self.user
+        return counting_view(request)
+
+    def test_repeated_key_replays_first_response(self):
+        first = self.call()
+        replay = self.call()
+
+        self.assertEqual(calls, ['ok'])
+        self.assertEqual(replay.status_code, 200)
+        self.assertEqual(replay.content, first.content)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(self.call(key='key-2').content)['call'], 2)
+
+    def test_key_in_flight_conflicts_without_waiting(self):
+        IdempotencyKey.objects.create(
+            scope='tests', user=self.user, key='key-1', expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        response = self.call()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(calls, [])
+
+    def test_expired_key_runs_again(self):
+        self.call()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(json.loads(self.call().content)['call'], 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_failed_response_is_not_kept(self):
+        self.assertEqual(self.call(value='bad').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.call().status_code, 200)
+        self.assertEqual(calls, ['bad', 'ok'])
+
+
+class CheckoutIdempotencyTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        self.product = self.create_product('Oud', stock=10)
+        self.create_cart([(self.product, 2)], user=self.user)
+        self.client.force_login(self.user)
+
+    def checkout(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('checkout'), {
+                **FORM_DATA, 'payment_method': 'COD', 'idempotency_key': 'key-1', **data,
+            })
+
+    def test_invalid_form_is_not_replayed(self):
+        response = self.checkout(email='not-an-email')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # The corrected form goes through with the same key
+        response = self.checkout()
+        order = Order.objects.get()
+        self.assertRedirects(
+            response, reverse('orders:order_success', args=[order.order_number]), fetch_redirect_response=False,
+        )
+
+    def test_placed_order_is_replayed(self):
+        first = self.checkout()
+        replay = self.checkout()
+
+        self.assertEqual(replay['Location'], first['Location'])
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_double_submit_while_placing_redirects_to_orders(self):
+        repeats = []
+
+        def submit_again(*args, **kwargs):
+            # The browser posts the form again while the first request is still running
+            repeats.append(self.client.post(reverse('checkout'), {
+                **FORM_DATA, 'payment_method': 'COD', 'idempotency_key': 'key-1',
+            }))
+            return finalize_order(*args, **kwargs)
+
+        with mock.patch('cart.views.finalize_order', side_effect=submit_again):
+            first = self.checkout()
+
+        order = Order.objects.get()
+        self.assertEqual(first['Location'], reverse('orders:order_success', args=[order.order_number]))
+        self.assertRedirects(repeats[0], reverse('orders:order_list'), fetch_redirect_response=False)
+        messages = [str(message) for message in get_messages(repeats[0].wsgi_request)]
+        self.assertEqual(messages, [BUSY_MESSAGE])
+
+    def test_ajax_repeat_while_placing_conflicts(self):
+        IdempotencyKey.objects.create(
+            scope='checkout', user=self.user, key='key-1', expires_at=timezone.now() + timedelta(minutes=5),
+        )
+        response = self.client.post(reverse('checkout'), {
+            **FORM_DATA, 'payment_method': 'COD', 'idempotency_key': 'key-1',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderNumberTests(TestCase):
+    day = date(2025, 11, 20)
+
+    def setUp(self):
+        numbering._blocks.clear()
+        patcher = mock.patch('orders.numbering.timezone.localdate', side_effect=lambda: self.day)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_numbers_follow_the_daily_sequence(self):
+        self.assertEqual(numbering.next_order_number(), '20251120-000001')
+        self.assertEqual(numbering.next_order_number(), '20251120-000002')
+
+        self.day = date(2025, 11, 21)
+        self.assertEqual(numbering.next_order_number(), '20251121-000001')
+        self.assertEqual(OrderNumberSequence.objects.get(day=date(2025, 11, 20)).last_value, 2)
+
+    def test_rolled_back_order_leaves_no_gap(self):
+        numbering.next_order_number()
+        try:
+            with transaction.atomic():
+                numbering.next_order_number()
+                raise RuntimeError('checkout failed')
+        except RuntimeError:
+            pass
+        self.assertEqual(numbering.next_order_number(), '20251120-000002')
+
+    def test_block_reserves_numbers_in_one_round_trip(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(numbering.next_order_number(block_size=3), '20251120-000001')
+        with self.assertNumQueries(0):
+            self.assertEqual(numbering.next_order_number(block_size=3), '20251120-000002')
+            self.assertEqual(numbering.next_order_number(block_size=3), '20251120-000003')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(numbering.next_order_number(block_size=3), '20251120-000004')
+        self.assertEqual(OrderNumberSequence.objects.get().last_value, 6)
+
+    def test_block_is_used_only_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            numbering.next_order_number(block_size=3)
+        # The reservation never committed, so its block is not handed out
+        self.assertEqual(numbering.next_order_number(block_size=3), '20251120-000004')
+
+    def test_generate_order_number_uses_the_sequence(self):
+        self.assertEqual(Order.generate_order_number(user_id=1), '20251120-000001')
+
+
+class SalesRollupTests(OrderTestMixin, TestCase):
+    def create_order(self, final_total='1000.00', discount='0.00', **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Order.objects.create(
+                user=self.user, order_number=f'order-{Order.objects.count()}', order_total=final_total,
+                tax=0, final_total=final_total, discount=discount, **{**FORM_DATA, **fields},
+            )
+
+    def save(self, order):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+
+    def rollups(self):
+        return {
+            row.status: (row.orders, row.revenue, row.discount)
+            for row in DailySalesRollup.objects.filter(day=timezone.localdate())
+        }
+
+    def test_only_placed_orders_count(self):
+        order = self.create_order(is_ordered=False)
+        self.assertEqual(self.rollups(), {})
+
+        order.is_ordered = True
+        self.save(order)
+        self.create_order(final_total='500.00', discount='50.00', is_ordered=True)
+        self.assertEqual(self.rollups(), {'New': (2, Decimal('1500.00'), Decimal('50.00'))})
+
+    def test_status_change_moves_the_order(self):
+        order = self.create_order(is_ordered=True)
+        self.create_order(is_ordered=True)
+        order.status = 'Shipped'
+        self.save(order)
+
+        self.assertEqual(self.rollups(), {
+            'New': (1, Decimal('1000.00'), Decimal('0.00')),
+            'Shipped': (1, Decimal('1000.00'), Decimal('0.00')),
+        })
+
+    def test_amount_change_and_delete(self):
+        order = self.create_order(is_ordered=True)
+        order.final_total = Decimal('800.00')
+        order.discount = Decimal('200.00')
+        self.save(order)
+        self.assertEqual(self.rollups(), {'New': (1, Decimal('800.00'), Decimal('200.00'))})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+        self.assertEqual(self.rollups(), {'New': (0, Decimal('0.00'), Decimal('0.00'))})
+
+    def test_rebuild_matches_incremental_rows(self):
+        for status in ['New', 'New', 'Cancelled']:
+            self.create_order(is_ordered=True, status=status)
+        Order.objects.filter(status='Cancelled').update(final_total=0)  # bypasses the signals
+        DailySalesRollup.objects.update(orders=99)
+
+        self.assertEqual(rebuild_sales_rollups(), 2)
+        self.assertEqual(self.rollups(), {
+            'New': (2, Decimal('2000.00'), Decimal('0.00')),
+            'Cancelled': (1, Decimal('0.00'), Decimal('0.00')),
+        })
+
+
+class SalesLedgerTests(OrderTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.oud = cls.create_product('Oud', price=300)
+        cls.musk = cls.create_product('Musk', price=100)
+
+    def place_order(self, lines):
+        """A placed order of (product, quantity, price) lines, booked in the ledger"""
+        order = Order.objects.create(
+            user=self.user, order_number=f'order-{Order.objects.count()}', order_total=0, tax=0,
+            is_ordered=True, **FORM_DATA,
+        )
+        for product, quantity, price in lines:
+            OrderProduct.objects.create(
+                order=order, user=self.user, product=product, quantity=quantity, product_price=price, ordered=True,
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            record_order_sales(order)
+        return order
+
+    def refund(self, order, refund_amount=None, order_product=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ReturnRequest.objects.create(
+                order=order, order_product=order_product, user=self.user, reason='Damaged',
+                status='refunded', refund_amount=refund_amount,
+            )
+
+    def ledger(self):
+        return {
+            row.product_id: (row.units, row.gross, row.refunded_units, row.refunds)
+            for row in ProductSalesLedger.objects.all()
+        }
+
+    def test_order_sales(self):
+        order = self.place_order([(self.oud, 2, 300), (self.musk, 1, 100)])
+        day = timezone.localdate()
+
+        self.assertEqual(order_sales(order), {
+            (day, self.oud.pk): (2, Decimal('600.00'), 0, Decimal('0.00')),
+            (day, self.musk.pk): (1, Decimal('100.00'), 0, Decimal('0.00')),
+        })
+        self.place_order([(self.oud, 1, 250)])
+        self.assertEqual(self.ledger(), {
+            self.oud.pk: (3, Decimal('850.00'), 0, Decimal('0.00')),
+            self.musk.pk: (1, Decimal('100.00'), 0, Decimal('0.00')),
+        })
+
+    def test_whole_order_refund_is_spread_by_line_value(self):
+        order = self.place_order([(self.oud, 2, 300), (self.musk, 1, 100)])
+        self.refund(order, refund_amount=350)
+
+        # 600:100 of 350, with the last line taking the remainder
+        self.assertEqual(self.ledger(), {
+            self.oud.pk: (2, Decimal('600.00'), 2, Decimal('300.00')),
+            self.musk.pk: (1, Decimal('100.00'), 1, Decimal('50.00')),
+        })
+
+    def test_line_refund_defaults_to_line_value(self):
+        order = self.place_order([(self.oud, 2, 300), (self.musk, 1, 100)])
+        line = order.orderproduct_set.get(product=self.musk)
+
+        self.assertEqual(return_refunds(ReturnRequest(order=order, order_product=line, status='approved')), {})
+        self.refund(order, order_product=line)
+        self.assertEqual(self.ledger()[self.musk.pk], (1, Decimal('100.00'), 1, Decimal('100.00')))
+
+    def test_refund_is_booked_on_the_sale_day(self):
+        order = self.place_order([(self.oud, 1, 300)])
+        sale_day = timezone.localdate() - timedelta(days=3)
+        Order.objects.filter(pk=order.pk).update(created_at=order.created_at - timedelta(days=3))
+        ProductSalesLedger.objects.update(day=sale_day)
+        order.refresh_from_db()
+
+        self.refund(order, refund_amount=120)
+        row = ProductSalesLedger.objects.get()
+        self.assertEqual((row.day, row.refunds), (sale_day, Decimal('120.00')))
+
+    def test_return_status_changes_and_delete(self):
+        order = self.place_order([(self.oud, 2, 300)])
+        with self.captureOnCommitCallbacks(execute=True):
+            return_request = ReturnRequest.objects.create(order=order, user=self.user, reason='Damaged')
+        self.assertEqual(self.ledger()[self.oud.pk][2:], (0, Decimal('0.00')))
+
+        return_request.status = 'refunded'
+        with self.captureOnCommitCallbacks(execute=True):
+            return_request.save()
+        self.assertEqual(self.ledger()[self.oud.pk][2:], (2, Decimal('600.00')))
+
+        return_request.refund_amount = 200
+        with self.captureOnCommitCallbacks(execute=True):
+            return_request.save()
+        self.assertEqual(self.ledger()[self.oud.pk][2:], (2, Decimal('200.00')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return_request.delete()
+        self.assertEqual(self.ledger()[self.oud.pk][2:], (0, Decimal('0.00')))
+
+    def test_top_products_metrics(self):
+        order = self.place_order([(self.oud, 1, 300), (self.musk, 4, 100)])
+        self.refund(order, refund_amount=300, order_product=order.orderproduct_set.get(product=self.oud))
+
+        self.assertEqual([row['product'] for row in top_products(metric='units')], [self.musk, self.oud])
+        self.assertEqual([row['product'] for row in top_products(metric='gross')], [self.musk, self.oud])
+        net = top_products(metric='net')
+        self.assertEqual([(row['product'], row['units'], row['net']) for row in net], [
+            (self.musk, 4, Decimal('400.00')), (self.oud, 0, Decimal('0.00')),
+        ])
+        self.assertEqual(top_products(metric='net', limit=1)[0]['product'], self.musk)
+
+        today = timezone.localdate()
+        self.assertEqual(top_products((today + timedelta(days=1), None)), [])
+        with self.assertRaises(ValueError):
+            top_products(metric='profit')
+
+    def test_rebuild_matches_incremental_rows(self):
+        order = self.place_order([(self.oud, 2, 300), (self.musk, 1, 100)])
+        self.place_order([(self.musk, 3, 100)])
+        self.refund(order, refund_amount=350)
+        expected = self.ledger()
+        ProductSalesLedger.objects.update(units=99)
+
+        self.assertEqual(rebuild_sales_ledger(), 2)
+        self.assertEqual(self.ledger(), expected)
+
+
+class OrderExportTests(OrderTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.staff = Account.objects.create_user('Sam', 'Staff', 'sam', 'sam@example.com', 'secret')
+        cls.staff.is_active = True
+        cls.staff.is_staff = True
+        cls.staff.save()
+        cls.oud = cls.create_product('Oud', price=300)
+        cls.musk = cls.create_product('Musk', price=100)
+        payment = Payment.objects.create(
+            user=cls.user, payment_id='pay_1', payment_method='COD', amount_paid='700', status='Completed',
+        )
+        cls.orders = []
+        for number, status, days_ago in [('A-1', 'New', 0), ('A-2', 'Shipped', 2), ('A-3', 'New', 5)]:
+            order = Order.objects.create(
+                user=cls.user, payment=payment if number == 'A-1' else None, order_number=number,
+                order_total=700, tax=0, final_total=700, is_ordered=True, status=status, **FORM_DATA,
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+            cls.orders.append(order)
+        Order.objects.create(
+            user=cls.user, order_number='A-4', order_total=0, tax=0, is_ordered=False, **FORM_DATA,
+        )
+        for product, quantity in [(cls.oud, 2), (cls.musk, 1)]:
+            OrderProduct.objects.create(
+                order=cls.orders[0], user=cls.user, product=product, quantity=quantity,
+                product_price=product.price, ordered=True,
+            )
+
+    def numbers(self, orders):
+        return list(orders.values_list('order_number', flat=True))
+
+    def test_filter_orders(self):
+        today = timezone.localdate()
+        self.assertEqual(self.numbers(filter_orders()), ['A-1', 'A-2', 'A-3'])
+        self.assertEqual(self.numbers(filter_orders(start=today - timedelta(days=2))), ['A-1', 'A-2'])
+        self.assertEqual(self.numbers(filter_orders(end=today - timedelta(days=1))), ['A-2', 'A-3'])
+        self.assertEqual(self.numbers(filter_orders(status='New')), ['A-1', 'A-3'])
+
+    def test_order_rows(self):
+        rows = list(order_rows(filter_orders()))
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(len(row) == len(ORDER_HEADER) for row in rows))
+        self.assertEqual(rows[0][:2], ['A-1', 'Asha Rao'])
+        self.assertEqual([row[9] for row in rows], ['Cash on Delivery', 'N/A', 'N/A'])
+
+    def test_order_rows_with_items(self):
+        self.assertEqual(order_header(include_items=True), ORDER_HEADER + LINE_HEADER)
+        with self.assertNumQueries(2):
+            rows = list(order_rows(filter_orders(), include_items=True))
+
+        self.assertEqual([row[0] for row in rows], ['A-1', 'A-1', 'A-2', 'A-3'])
+        self.assertEqual(rows[0][-4:], ['Oud', 2, 300.0, 600.0])
+        self.assertEqual(rows[1][-4:], ['Musk', 1, 100.0, 100.0])
+        self.assertEqual(rows[2][-4:], [''] * len(LINE_HEADER))
+        self.assertEqual(rows[0][9], 'Cash on Delivery')
+
+    def export(self, **params):
+        self.client.force_login(self.staff)
+        return self.client.get(reverse('admin_export_orders_csv'), params)
+
+    def test_export_view_streams_csv(self):
+        response = self.export(status='New', items='1')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'attachment; filename="orders_export_\d{8}_\d{6}\.csv"')
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(','), ORDER_HEADER + LINE_HEADER)
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['A-1', 'A-1', 'A-3'])
+
+    def test_export_view_rejects_bad_parameters(self):
+        self.assertEqual(self.export(start='15/01/2025').status_code, 400)
+        self.assertEqual(self.export(end='2025-13-01').status_code, 400)
+        self.assertEqual(self.export(status='Lost').status_code, 400)
+
+    def test_export_view_is_staff_only(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin_export_orders_csv'))
+        self.assertEqual(response.status_code, 302)
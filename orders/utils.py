@@ -2,7 +2,13 @@ from io import BytesIO
 from django.http import HttpResponse
 from django.template.loader import get_template
 from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from .models import Order, OrderProduct, Payment
+from cart.pricing import price_cart, unit_price
+from tasks.queue import enqueue
+from .stock import InsufficientStock, check_availability, decrement_stock, hold_stock, lock_products
+from collections import defaultdict
 import uuid
 try:
     from xhtml2pdf import pisa
@@ -64,8 +70,8 @@ def generate_order_number(user_id):
     Generate a unique order number for a user.
     
     This is a utility wrapper around the model's static method.
-    Format: YYYYMMDDHHMMSS + UserID (4 digits) + Random (4 digits)
-    Example: 2024121514302500015678
+    Format: YYYYMMDD-XXXXXX (date + daily sequence)
+    Example: 20241215-000042
     
     Args:
         user_id: The ID of the user placing the order
@@ -76,6 +82,108 @@ def generate_order_number(user_id):
     return Order.generate_order_number(user_id)
 
 
+def place_order_lines(order, payment, user, cart_items, hold=False, unit_prices=None):
+    """
+    Reserve stock for the cart and create the order's products.
+
+    Must run inside transaction.atomic(). All cart products are locked in id
+    order and checked against the total requested per product (minus units
+    held for other unpaid orders). Stock is then either taken in a single
+    UPDATE or, for orders awaiting online payment, held with a
+    StockReservation until the payment callback converts it (see
+    orders.stock). Order products and their variations are bulk inserted.
+    If any product is short, InsufficientStock is raised before anything is
+    written, and the caller's transaction rolls back.
+
+    Args:
+        order: Order the lines belong to
+        payment: Payment for the order
+        user: User placing the order
+        cart_items: Active CartItem objects
+        hold: Hold the stock instead of taking it (payment still pending)
+        unit_prices: Cart item id -> price charged per unit (from
+            cart.pricing; defaults to each product's current price)
+
+    Returns:
+        list: The created OrderProduct objects
+
+    Raises:
+        InsufficientStock: If a product does not have enough stock
+    """
+    cart_items = list(cart_items)
+    prefetch_related_objects(cart_items, 'variations')
+    unit_prices = unit_prices or {}
+
+    requested = defaultdict(int)
+    for cart_item in cart_items:
+        requested[cart_item.product_id] += cart_item.quantity
+
+    products = lock_products(requested)
+    check_availability(products, requested)
+    if hold:
+        hold_stock(order, products, requested)
+    else:
+        decrement_stock(products, requested)
+
+    order_products = OrderProduct.objects.bulk_create([
+        OrderProduct(
+            order=order,
+            payment=payment,
+            user=user,
+            product=products[cart_item.product_id],
+            quantity=cart_item.quantity,
+            product_price=unit_prices.get(cart_item.id) or unit_price(products[cart_item.product_id]),
+            ordered=True,
+        )
+        for cart_item in cart_items
+    ])
+    OrderProduct.variations.through.objects.bulk_create([
+        OrderProduct.variations.through(orderproduct_id=order_product.id, variation_id=variation.id)
+        for order_product, cart_item in zip(order_products, cart_items)
+        for variation in cart_item.variations.all()
+    ])
+    return order_products
+
+
+def finalize_order(order, description='Order placed successfully'):
+    """
+    Mark an order as placed and queue its follow-up work.
+
+    The tracking entry is written here, while the admin notification and
+    the invoice email are queued as tasks in the same transaction and sent
+    by the task worker, so the request does not wait for them.
+
+    Call this once per order: it also books the order into the
+    co-purchase index and the sales ledger. Callers that can run more than
+    once for an order (a replayed payment callback) must lock it and check
+    is_ordered first.
+
+    Args:
+        order: Order being finalized
+        description: Tracking entry description
+    """
+    from .ledger import record_order_sales
+    from .models import OrderTracking
+    from store.utils import record_co_purchases
+
+    with transaction.atomic():
+        order.is_ordered = True
+        order.status = 'New'
+        order.save()
+
+        OrderTracking.objects.create(
+            order=order,
+            status='New',
+            description=description
+        )
+
+        # Add the order to the "frequently bought together" index
+        record_co_purchases(order)
+        record_order_sales(order)
+        enqueue('orders.notify_new_order', order_id=order.id)
+        enqueue('orders.send_invoice_email', order_id=order.id)
+
+
 def create_order_from_cart(user, cart_items, form_data, payment_method='COD', discount=0):
     """
     Create an order from cart items.
@@ -88,7 +196,7 @@ def create_order_from_cart(user, cart_items, form_data, payment_method='COD', di
     - Creates order products
     - Manages stock
     - Creates tracking entry
-    - Sends notifications
+    - Queues notifications and the invoice email
     
     Args:
         user: The user placing the order
@@ -100,118 +208,60 @@ def create_order_from_cart(user, cart_items, form_data, payment_method='COD', di
     Returns:
         tuple: (order, success_message) or (None, error_message)
     """
-    from store.models import Product
-    
-    # Validate stock availability
-    insufficient_stock_items = []
-    for cart_item in cart_items:
-        if cart_item.product.stock < cart_item.quantity:
-            insufficient_stock_items.append({
-                'product': cart_item.product.product_name,
-                'available': cart_item.product.stock,
-                'requested': cart_item.quantity
-            })
-    
-    if insufficient_stock_items:
-        error_msg = "Some products don't have sufficient stock:\n"
-        for item in insufficient_stock_items:
-            error_msg += f"- {item['product']}: Available {item['available']}, Requested {item['requested']}\n"
-        return None, error_msg
+    cart_items = list(cart_items)
+    prefetch_related_objects(cart_items, 'product')
     
     # Calculate totals (GST already included in product prices)
-    total = 0
-    tax = 0
-    for cart_item in cart_items:
-        item_total = cart_item.product.price * cart_item.quantity
-        total += item_total
-        # GST is already included in product price
-    final_total = total - discount
-    
-    # Create payment
-    payment = Payment.objects.create(
-        user=user,
-        payment_id=str(uuid.uuid4()),
-        payment_method=payment_method,
-        amount_paid=str(final_total),
-        status='Pending' if payment_method == 'COD' else 'Completed'
-    )
-    
-    # Generate unique order number
-    order_number = generate_order_number(user.id)
-    
-    # Create order
-    order = Order.objects.create(
-        user=user,
-        payment=payment,
-        order_number=order_number,
-        first_name=form_data['first_name'],
-        last_name=form_data['last_name'],
-        phone=form_data['phone'],
-        email=form_data['email'],
-        address_line_1=form_data['address_line_1'],
-        address_line_2=form_data.get('address_line_2', ''),
-        city=form_data['city'],
-        state=form_data['state'],
-        country=form_data['country'],
-        pincode=form_data.get('pincode', ''),
-        order_note=form_data.get('order_note', ''),
-        order_total=total,
-        tax=0,  # GST is already included in product prices
-        discount=discount,
-        final_total=final_total,
-        status='New',
-        is_ordered=True
-    )
-    
-    # Create order products and manage stock
-    for cart_item in cart_items:
-        order_product = OrderProduct.objects.create(
-            order=order,
-            payment=payment,
-            user=user,
-            product=cart_item.product,
-            quantity=cart_item.quantity,
-            product_price=cart_item.product.price,
-            ordered=True
-        )
-        # Add variations
-        variations = cart_item.variations.all()
-        if variations:
-            order_product.variations.set(variations)
-        
-        # Reduce product stock and update availability
-        product = cart_item.product
-        product.stock -= cart_item.quantity
-        
-        # Update product availability if stock reaches 0
-        if product.stock <= 0:
-            product.is_available = False
-            product.stock = 0  # Ensure stock doesn't go negative
-        
-        product.save()
+    totals = price_cart(cart_items, discount)
+    total = totals.subtotal
+    discount = totals.discount
+    final_total = totals.grand_total
     
-    # Create order tracking entry
-    from .models import OrderTracking
-    OrderTracking.objects.create(
-        order=order,
-        status='New',
-        description='Order placed successfully'
-    )
-    
-    # Send notifications
     try:
-        from notifications.utils import notify_new_order
-        notify_new_order(order)
-    except Exception as e:
-        # Don't fail order if notification fails
-        pass
+        with transaction.atomic():
+            # Create payment
+            payment = Payment.objects.create(
+                user=user,
+                payment_id=str(uuid.uuid4()),
+                payment_method=payment_method,
+                amount_paid=str(final_total),
+                status='Pending' if payment_method == 'COD' else 'Completed'
+            )
+            
+            # Generate unique order number
+            order_number = generate_order_number(user.id)
+            
+            # Create order
+            order = Order.objects.create(
+                user=user,
+                payment=payment,
+                order_number=order_number,
+                first_name=form_data['first_name'],
+                last_name=form_data['last_name'],
+                phone=form_data['phone'],
+                email=form_data['email'],
+                address_line_1=form_data['address_line_1'],
+                address_line_2=form_data.get('address_line_2', ''),
+                city=form_data['city'],
+                state=form_data['state'],
+                country=form_data['country'],
+                pincode=form_data.get('pincode', ''),
+                order_note=form_data.get('order_note', ''),
+                order_total=total,
+                tax=totals.gst,  # GST included in the product prices
+                discount=discount,
+                final_total=final_total,
+                status='New',
+                is_ordered=True
+            )
+            
+            # Create order products and reserve stock (all or nothing)
+            place_order_lines(order, payment, user, cart_items, unit_prices=totals.unit_prices())
+    except InsufficientStock as e:
+        return None, e.message
     
-    # Send invoice email
-    try:
-        send_invoice_email(order)
-    except Exception as e:
-        # Don't fail order if email fails
-        pass
+    # Tracking entry, co-purchase index and queued notification/invoice tasks
+    finalize_order(order)
     
     success_message = f'Order placed successfully! Your order number is {order_number}'
     return order, success_message
@@ -4,9 +4,12 @@ from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
+from django.db import transaction
 from .models import Order, OrderProduct, OrderTracking, ReturnRequest
-from .utils import generate_pdf_invoice
+from .utils import finalize_order, generate_pdf_invoice
 from .payment_utils import is_razorpay_enabled, create_razorpay_order, verify_razorpay_payment, update_payment_status
+from .idempotency import idempotent, json_success
+from .stock import convert_stock_reservations
 from notifications.utils import create_notification, send_email_notification
 import json
 
@@ -123,6 +126,7 @@ def request_return(request, order_number):
 
 
 @login_required(login_url='accounts:login')
+@idempotent('razorpay_payment', store_if=json_success)
 def create_razorpay_payment(request, order_number):
     """
     Create Razorpay payment order and return payment details.
@@ -236,34 +240,20 @@ def razorpay_payment_callback(request):
             
             # Verify payment signature
             if verify_razorpay_payment(razorpay_order_id, razorpay_payment_id, razorpay_signature):
-                # Update payment status (this also sets is_ordered=True)
-                update_payment_status(order, razorpay_payment_id, status='Completed')
-                
-                # Finalize order (cart is already cleared in checkout)
-                order.is_ordered = True
-                order.status = 'New'
-                order.save()
-                
-                # Create order tracking entry
-                OrderTracking.objects.create(
-                    order=order,
-                    status='New',
-                    description='Payment completed via Razorpay'
-                )
-                
-                # Send notifications
-                try:
-                    from notifications.utils import notify_new_order
-                    notify_new_order(order)
-                except:
-                    pass
-                
-                # Send invoice email
-                try:
-                    from orders.utils import send_invoice_email
-                    send_invoice_email(order)
-                except:
-                    pass
+                with transaction.atomic():
+                    # Lock the order: a concurrent or replayed callback waits
+                    # here and then finds it already finalized
+                    order = Order.objects.select_for_update().get(pk=order.pk)
+                    if not order.is_ordered:
+                        # Update payment status (this also sets is_ordered=True)
+                        update_payment_status(order, razorpay_payment_id, status='Completed')
+                        
+                        # Take the stock that was held while the customer paid
+                        convert_stock_reservations(order)
+                        
+                        # Finalize order (cart is already cleared in checkout);
+                        # emails are sent by the task worker
+                        finalize_order(order, 'Payment completed via Razorpay')
                 
                 return JsonResponse({
                     'success': True,
@@ -271,8 +261,13 @@ def razorpay_payment_callback(request):
                     'redirect_url': f'/orders/order-success/{order_number}/'
                 })
             else:
-                # Payment verification failed
-                update_payment_status(order, razorpay_payment_id, status='Failed')
+                # Payment verification failed. Anyone can post a bad signature
+                # for an order number, so the order, its payment and its held
+                # stock are left alone: a real payment may still complete, and
+                # unpaid holds expire through release_expired_reservations.
+                import logging
+                logger = logging.getLogger(__name__)
+                logger.warning(f"Razorpay signature verification failed for order {order_number}")
                 return JsonResponse({
                     'success': False,
                     'message': 'Payment verification failed.'
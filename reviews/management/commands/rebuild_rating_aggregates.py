@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from reviews.utils import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Rebuild denormalized product rating aggregates from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of products written per UPDATE batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        rated = rebuild_rating_aggregates(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt rating aggregates. {rated} products have approved reviews.')
+        )
@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Avg, Count, Q
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+
+    star_fields = {stars: f'rating_{stars}_count' for stars in range(1, 6)}
+    stats = Review.objects.filter(is_approved=True, rating__in=star_fields.keys()).values('product').annotate(
+        count=Count('id'),
+        avg=Avg('rating'),
+        **{field: Count('id', filter=Q(rating=stars)) for stars, field in star_fields.items()}
+    ).order_by()
+
+    for row in stats:
+        Product.objects.filter(pk=row['product']).update(
+            rating_count=row['count'],
+            rating_avg=round(row['avg'], 2),
+            **{field: row[field] for field in star_fields.values()}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_alter_review_review_text'),
+        ('store', '0006_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
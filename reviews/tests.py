@@ -1,4 +1,79 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import Account
+from category.models import Category
+from store.models import Product
+from .models import Review
+from .utils import STAR_FIELDS, apply_rating_change, rebuild_rating_aggregates
+
+
+class RatingAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(Category_name='Attar', slug='attar')
+        cls.product = Product.objects.create(
+            product_name='Oud', slug='oud', price=500, stock=10, category=category, images='photos/products/oud.jpg',
+        )
+        cls.users = [
+            Account.objects.create_user('R', str(i), f'reviewer{i}', f'reviewer{i}@example.com', 'secret')
+            for i in range(3)
+        ]
+
+    def aggregates(self):
+        product = Product.objects.get(pk=self.product.pk)
+        return product.rating_avg, product.rating_count, [getattr(product, STAR_FIELDS[stars]) for stars in range(1, 6)]
+
+    def review(self, user, rating, is_approved=True):
+        return Review.objects.create(product=self.product, user=user, rating=rating, is_approved=is_approved)
+
+    def test_apply_rating_change(self):
+        apply_rating_change(self.product.pk, added=5)
+        apply_rating_change(self.product.pk, added=4)
+        self.assertEqual(self.aggregates(), (Decimal('4.50'), 2, [0, 0, 0, 1, 1]))
+
+        # A rating changed from 4 to 1
+        apply_rating_change(self.product.pk, removed=4, added=1)
+        self.assertEqual(self.aggregates(), (Decimal('3.00'), 2, [1, 0, 0, 0, 1]))
+
+        apply_rating_change(self.product.pk, removed=1)
+        self.assertEqual(self.aggregates(), (Decimal('5.00'), 1, [0, 0, 0, 0, 1]))
+        apply_rating_change(self.product.pk, removed=5)
+        self.assertEqual(self.aggregates(), (Decimal('0.00'), 0, [0, 0, 0, 0, 0]))
+
+    def test_only_approved_reviews_count(self):
+        review = self.review(self.users[0], 4, is_approved=False)
+        self.assertEqual(self.aggregates(), (Decimal('0.00'), 0, [0, 0, 0, 0, 0]))
+
+        review.is_approved = True
+        review.save()
+        self.assertEqual(self.aggregates(), (Decimal('4.00'), 1, [0, 0, 0, 1, 0]))
+
+    def test_edit_moves_rating(self):
+        self.review(self.users[0], 5)
+        review = self.review(self.users[1], 2)
+        self.assertEqual(self.aggregates(), (Decimal('3.50'), 2, [0, 1, 0, 0, 1]))
+
+        review.rating = 3
+        review.save()
+        self.assertEqual(self.aggregates(), (Decimal('4.00'), 2, [0, 0, 1, 0, 1]))
+
+    def test_delete_down_to_zero(self):
+        reviews = [self.review(user, rating) for user, rating in zip(self.users, [5, 4, 4])]
+        self.assertEqual(self.aggregates(), (Decimal('4.33'), 3, [0, 0, 0, 2, 1]))
+
+        reviews[0].delete()
+        self.assertEqual(self.aggregates(), (Decimal('4.00'), 2, [0, 0, 0, 2, 0]))
+        for review in reviews[1:]:
+            review.delete()
+        self.assertEqual(self.aggregates(), (Decimal('0.00'), 0, [0, 0, 0, 0, 0]))
+
+    def test_rebuild_matches_incremental_updates(self):
+        for user, rating in zip(self.users, [5, 3, 1]):
+            self.review(user, rating)
+        Review.objects.filter(rating=1).update(is_approved=False)  # bypasses the signals
+        expected = (Decimal('4.00'), 2, [0, 0, 1, 0, 1])
 
+        self.assertEqual(rebuild_rating_aggregates(), 1)
+        self.assertEqual(self.aggregates(), expected)
@@ -0,0 +1,104 @@
+from django.db import transaction
+from django.db.models import Avg, Case, Count, DecimalField, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+from store.models import Product
+from .models import Review
+
+
+STAR_FIELDS = {stars: f'rating_{stars}_count' for stars in range(1, 6)}
+
+
+def _contribution(rating, is_approved):
+    """Rating a review contributes to product aggregates (None if it doesn't count)"""
+    if is_approved and rating in STAR_FIELDS:
+        return rating
+    return None
+
+
+def apply_rating_change(product_id, removed=None, added=None):
+    """
+    Incrementally update a product's rating aggregates.
+
+    Args:
+        product_id: ID of the reviewed product
+        removed: Rating (1-5) that no longer counts, or None
+        added: Rating (1-5) that now counts, or None
+
+    The counters and the average are updated in a single UPDATE statement.
+    Every right-hand side reads the pre-update row, so the new average is
+    derived from the old histogram plus this change.
+    """
+    if removed == added:
+        return
+
+    star_deltas = {}
+    for rating, delta in ((removed, -1), (added, 1)):
+        if rating is not None:
+            star_deltas[rating] = star_deltas.get(rating, 0) + delta
+    count_delta = sum(star_deltas.values())
+    weighted_delta = sum(stars * delta for stars, delta in star_deltas.items())
+
+    weighted_total = Value(weighted_delta)
+    for stars, field in STAR_FIELDS.items():
+        weighted_total = weighted_total + F(field) * stars
+    new_count = F('rating_count') + count_delta
+
+    updates = {STAR_FIELDS[stars]: F(STAR_FIELDS[stars]) + delta for stars, delta in star_deltas.items()}
+    updates['rating_count'] = new_count
+    updates['rating_avg'] = Case(
+        When(
+            rating_count__gt=-count_delta,
+            then=Cast(Cast(weighted_total, FloatField()) / new_count, DecimalField(max_digits=3, decimal_places=2)),
+        ),
+        default=Value(0),
+        output_field=DecimalField(max_digits=3, decimal_places=2),
+    )
+    Product.objects.filter(pk=product_id).update(**updates)
+
+
+def sync_review_change(old, review):
+    """
+    Apply the aggregate change between two states of a review.
+
+    Args:
+        old: (product_id, rating, is_approved) before the change, or None if new
+        review: Review instance after the change, or None if deleted
+    """
+    old_product_id, old_rating = (old[0], _contribution(old[1], old[2])) if old else (None, None)
+    new_product_id, new_rating = (
+        (review.product_id, _contribution(review.rating, review.is_approved)) if review else (None, None)
+    )
+
+    if old_product_id and old_product_id != new_product_id:
+        # Review removed or moved to another product
+        apply_rating_change(old_product_id, removed=old_rating)
+        old_rating = None
+    if new_product_id:
+        apply_rating_change(new_product_id, removed=old_rating, added=new_rating)
+
+
+def rebuild_rating_aggregates(batch_size=500):
+    """
+    Recompute rating aggregates for every product from approved reviews.
+
+    Returns:
+        int: Number of products that have at least one approved review
+    """
+    stats = Review.objects.filter(is_approved=True, rating__in=STAR_FIELDS.keys()).values('product').annotate(
+        count=Count('id'),
+        avg=Avg('rating'),
+        **{field: Count('id', filter=Q(rating=stars)) for stars, field in STAR_FIELDS.items()}
+    ).order_by()
+
+    products = []
+    for row in stats:
+        product = Product(pk=row['product'], rating_count=row['count'], rating_avg=round(row['avg'], 2))
+        for field in STAR_FIELDS.values():
+            setattr(product, field, row[field])
+        products.append(product)
+
+    fields = ['rating_avg', 'rating_count'] + list(STAR_FIELDS.values())
+    with transaction.atomic():
+        Product.objects.update(**{field: 0 for field in fields})
+        Product.objects.bulk_update(products, fields, batch_size=batch_size)
+    return len(products)
@@ -2,7 +2,6 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Avg, Count
 from store.models import Product
 from orders.models import OrderProduct
 from .models import Review
@@ -114,10 +113,10 @@ def submit_review_ajax(request, product_id):
     review.is_approved = True  # Auto-approve
     review.save()
     
-    # Calculate updated average rating
-    reviews = Review.objects.filter(product=product, is_approved=True)
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-    review_count = reviews.count()
+    # Read the updated average rating maintained by the review signals
+    product.refresh_from_db(fields=['rating_avg', 'rating_count'])
+    avg_rating = product.get_average_rating()
+    review_count = product.get_review_count()
     
     return JsonResponse({
         'success': True,
@@ -1,3 +1,51 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import Account
+from orders.models import Order
+
+
+class SellerDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = Account.objects.create_user('Sam', 'Seller', 'sam', 'sam@example.com', 'secret')
+        cls.staff.is_active = True
+        cls.staff.is_staff = True
+        cls.staff.save()
+        for i, status in enumerate(['New', 'New', 'Packed', 'Shipped', 'Completed']):
+            Order.objects.create(
+                user=cls.staff, order_number=f'20250101-00000{i}-01', first_name='Asha', last_name=f'Rao{i}',
+                phone='9999999999', email='asha@example.com', address_line_1='1 Street', city='Pune',
+                state='MH', country='India', order_total=100, tax=0, is_ordered=True, status=status,
+            )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def dashboard(self, **params):
+        return self.client.get(reverse('seller:dashboard'), params).context
+
+    def test_counters_come_from_status_counts(self):
+        context = self.dashboard()
+        self.assertEqual(context['order_count'], 5)
+        self.assertEqual(context['total_orders'], 5)
+        self.assertEqual(context['new_orders'], 2)
+        self.assertEqual(context['in_process_orders'], 1)
+        self.assertEqual(context['shipped_orders'], 1)
+        self.assertEqual(context['completed_orders'], 1)
+        self.assertEqual(len(context['orders'].object_list), 5)
+
+    def test_order_count_follows_status_changes(self):
+        self.assertEqual(self.dashboard(status='New')['order_count'], 2)
+        Order.objects.filter(status='New').update(status='Accepted')
+
+        context = self.dashboard(status='New')
+        self.assertEqual(context['order_count'], 0)
+        self.assertEqual(context['new_orders'], 0)
+        self.assertEqual(self.dashboard(status='Accepted')['order_count'], 2)
+
+    def test_search_counts_matching_orders(self):
+        context = self.dashboard(search='Rao3')
+        self.assertEqual(context['order_count'], 1)
+        self.assertEqual(context['total_orders'], 5)
+        self.assertEqual([order.last_name for order in context['orders'].object_list], ['Rao3'])
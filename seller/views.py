@@ -2,23 +2,39 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Prefetch, prefetch_related_objects
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time, timedelta
+from orders.ledger import last_days, top_products
 from orders.models import Order, OrderProduct, OrderTracking
 from notifications.utils import create_notification
+from store.pagination import KeysetPaginator
+
+ORDERS_PER_PAGE = 25
+
+
+def _local_day_start(day):
+    """Aware datetime of local midnight at the start of ``day``"""
+    return timezone.make_aware(datetime.combine(day, time.min))
 
 
 @staff_member_required
 def seller_dashboard(request):
-    """Seller dashboard to view and manage all orders"""
+    """
+    Seller dashboard to view and manage all orders.
+
+    The order list is keyset paginated on (created_at, id) with a ``cursor``
+    parameter, so every page costs the same. The statistics cards, the
+    status badges and the order total all come from one grouped count per
+    status (searches and date filters add one count of their own).
+    """
     # Get filter parameters
     status_filter = request.GET.get('status', '')
     search_query = request.GET.get('search', '')
     date_filter = request.GET.get('date', '')
     
     # Start with all ordered orders
-    orders = Order.objects.filter(is_ordered=True).order_by('-created_at')
+    orders = Order.objects.filter(is_ordered=True)
     
     # Apply status filter
     if status_filter:
@@ -34,56 +50,60 @@ def seller_dashboard(request):
             Q(phone__icontains=search_query)
         )
     
-    # Apply date filter
-    if date_filter == 'today':
-        today = timezone.now().date()
-        orders = orders.filter(created_at__date=today)
-    elif date_filter == 'week':
-        week_ago = timezone.now().date() - timedelta(days=7)
-        orders = orders.filter(created_at__date__gte=week_ago)
-    elif date_filter == 'month':
-        month_ago = timezone.now().date() - timedelta(days=30)
-        orders = orders.filter(created_at__date__gte=month_ago)
+    # Apply date filter (as a created_at range, which can use the index)
+    date_filter_days = {'today': 0, 'week': 7, 'month': 30}
+    if date_filter in date_filter_days:
+        since = timezone.localdate() - timedelta(days=date_filter_days[date_filter])
+        orders = orders.filter(created_at__gte=_local_day_start(since))
     
-    # Get order statistics
-    total_orders = Order.objects.filter(is_ordered=True).count()
-    new_orders = Order.objects.filter(is_ordered=True, status='New').count()
-    in_process_orders = Order.objects.filter(
-        is_ordered=True, 
-        status__in=['Accepted', 'Packed']
-    ).count()
-    ready_to_ship = Order.objects.filter(
-        is_ordered=True, 
-        status='Packed'
-    ).count()
-    shipped_orders = Order.objects.filter(
-        is_ordered=True, 
-        status__in=['Shipped', 'Out for Delivery']
-    ).count()
-    completed_orders = Order.objects.filter(
-        is_ordered=True, 
-        status__in=['Delivered', 'Completed']
-    ).count()
+    paginator = KeysetPaginator(orders, ORDERS_PER_PAGE, ordering='-created_at')
+    page = paginator.get_page(request.GET.get('cursor'))
+    prefetch_related_objects(
+        page.object_list,
+        Prefetch('orderproduct_set', queryset=OrderProduct.objects.select_related('product').order_by('id')),
+    )
     
-    # Get status counts for filter badges
+    # Get status counts for the statistics cards and filter badges
     status_counts = Order.objects.filter(is_ordered=True).values('status').annotate(
         count=Count('id')
-    )
+    ).order_by()
     status_count_dict = {item['status']: item['count'] for item in status_counts}
     
+    def count_of(*statuses):
+        return sum(status_count_dict.get(status, 0) for status in statuses)
+    
+    # Orders matching the filters. Without a search or date filter this comes
+    # from the same status counts as the cards (the paginator's count is
+    # cached and would disagree with them for a few minutes)
+    if search_query or date_filter in date_filter_days:
+        order_count = orders.count()
+    elif status_filter:
+        order_count = count_of(status_filter)
+    else:
+        order_count = sum(status_count_dict.values())
+    
+    # Best sellers over the selected period, from the sales ledger
+    top_products_range = {'today': last_days(0), 'week': last_days(7), 'month': last_days(30)}.get(date_filter)
+    
+    filter_params = request.GET.copy()
+    filter_params.pop('cursor', None)
+    
     context = {
-        'orders': orders,
+        'orders': page,
+        'order_count': order_count,
+        'current_query_string': filter_params.urlencode(),
         'status_filter': status_filter,
         'search_query': search_query,
         'date_filter': date_filter,
-        'total_orders': total_orders,
-        'new_orders': new_orders,
-        'in_process_orders': in_process_orders,
-        'ready_to_ship': ready_to_ship,
-        'shipped_orders': shipped_orders,
-        'completed_orders': completed_orders,
+        'total_orders': sum(status_count_dict.values()),
+        'new_orders': count_of('New'),
+        'in_process_orders': count_of('Accepted', 'Packed'),
+        'ready_to_ship': count_of('Packed'),
+        'shipped_orders': count_of('Shipped', 'Out for Delivery'),
+        'completed_orders': count_of('Delivered', 'Completed'),
         'status_counts': status_count_dict,
         'status_choices': Order.STATUS,
+        'top_products': top_products(top_products_range, metric='units', limit=5),
     }
     
     return render(request, 'seller/dashboard.html', context)
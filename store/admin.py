@@ -22,7 +22,8 @@ class ProductAdmin(admin.ModelAdmin):
     search_fields = ('product_name', 'description')
     list_editable = ('is_available', 'is_featured', 'is_flash_sale', 'gst_percentage')
     inlines = [ProductImageInline]
-    readonly_fields = ('created_date', 'modified_date')
+    readonly_fields = ('created_date', 'modified_date', 'rating_avg', 'rating_count',
+                       'rating_5_count', 'rating_4_count', 'rating_3_count', 'rating_2_count', 'rating_1_count')
     
     fieldsets = (
         ('Basic Information', {
@@ -37,6 +38,11 @@ class ProductAdmin(admin.ModelAdmin):
         ('Features', {
             'fields': ('is_featured', 'is_flash_sale', 'flash_sale_start', 'flash_sale_end')
         }),
+        ('Ratings', {
+            'fields': ('rating_avg', 'rating_count',
+                       'rating_5_count', 'rating_4_count', 'rating_3_count', 'rating_2_count', 'rating_1_count'),
+            'classes': ('collapse',)
+        }),
     )
 
 
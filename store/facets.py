@@ -0,0 +1,51 @@
+"""
+Cached store listing facets.
+
+Price bounds and product counts change only when products do, so they are
+computed once and kept in the cache until a Product or Category is saved
+or deleted.
+"""
+from django.db.models import Count, Max, Min, Q
+
+from aromas.cache import cache_on_model
+from category.models import Category
+from .models import Product
+
+
+@cache_on_model(Product, Category, namespace='store:facets')
+def get_store_facets():
+    """
+    Get price bounds and facet counts for available products.
+
+    Returns:
+        dict: price_bounds, total_count, on_sale_count, in_stock_count and
+        categories (id, slug, Category_name, product_count for each category)
+    """
+    totals = Product.objects.filter(is_available=True).aggregate(
+        min_price=Min('price'),
+        max_price=Max('price'),
+        total=Count('id'),
+        on_sale=Count('id', filter=Q(sale_price__isnull=False)),
+        in_stock=Count('id', filter=Q(stock__gt=0)),
+    )
+    categories = list(
+        Category.objects.annotate(
+            product_count=Count('product', filter=Q(product__is_available=True))
+        ).values('id', 'slug', 'Category_name', 'product_count').order_by('id')
+    )
+
+    min_price = totals['min_price'] or 0
+    max_price = totals['max_price'] or min_price
+    return {
+        'price_bounds': {
+            'min': min_price,
+            'max': max_price,
+            'slider_min': 0,
+            'slider_max': max(max_price, min_price + 1000, 5000),
+        },
+        'total_count': totals['total'],
+        'on_sale_count': totals['on_sale'],
+        'in_stock_count': totals['in_stock'],
+        'categories': categories,
+    }
+
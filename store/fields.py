@@ -0,0 +1,16 @@
+from django.db import models
+
+
+class SearchDocumentField(models.TextField):
+    """
+    Full-text search document column.
+
+    A ``tsvector`` on PostgreSQL (GIN indexed and maintained by
+    store.search); an unused nullable text column on other databases, so
+    the model and its migrations load without psycopg2 installed.
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'tsvector'
+        return super().db_type(connection)
@@ -0,0 +1,65 @@
+"""
+Home page assembler.
+
+The home page shows the active banner and a few short product rows
+(featured, flash sale, new arrivals) instead of the whole catalog. Every
+section is loaded lazily, so when the template serves the rendered
+fragments from the cache the sections are never queried.
+
+Fragments are cached for HOME_PAGE_CACHE_TIMEOUT seconds (which also picks
+up flash sales starting or ending) under the 'home' cache namespace version,
+which Product/ProductImage/Banner changes bump.
+"""
+from django.conf import settings
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from aromas.cache import get_version, invalidate_on_change
+from .models import Product, ProductImage, Banner
+
+
+HOME_SECTION_SIZE = getattr(settings, 'HOME_SECTION_SIZE', 8)
+HOME_PAGE_CACHE_TIMEOUT = getattr(settings, 'HOME_PAGE_CACHE_TIMEOUT', 300)
+HOME_CACHE_NAMESPACE = 'home'
+
+invalidate_on_change(HOME_CACHE_NAMESPACE, Product, ProductImage, Banner)
+
+
+class HomePage:
+    """Lazily loaded home page sections (each is one bounded query)"""
+
+    cache_timeout = HOME_PAGE_CACHE_TIMEOUT
+
+    def __init__(self, limit=HOME_SECTION_SIZE):
+        self.limit = limit
+
+    @cached_property
+    def version(self):
+        return get_version(HOME_CACHE_NAMESPACE)
+
+    def _products(self):
+        return Product.objects.filter(is_available=True).prefetch_related('product_images')
+
+    @cached_property
+    def banner(self):
+        return Banner.get_active_banner()
+
+    @cached_property
+    def featured(self):
+        return list(self._products().filter(is_featured=True).order_by('-modified_date', '-id')[:self.limit])
+
+    @cached_property
+    def flash_sale(self):
+        now = timezone.now()
+        return list(
+            self._products().filter(
+                is_flash_sale=True,
+                sale_price__isnull=False,
+                flash_sale_start__lte=now,
+                flash_sale_end__gte=now,
+            ).order_by('flash_sale_end', 'id')[:self.limit]
+        )
+
+    @cached_property
+    def new_arrivals(self):
+        return list(self._products().order_by('-created_date', '-id')[:self.limit])
@@ -0,0 +1,102 @@
+from django.db.models import Exists, OuterRef, Prefetch, Value, BooleanField
+from django.shortcuts import get_object_or_404
+
+from cart.snapshot import get_cart_snapshot
+from orders.models import OrderProduct
+from reviews.models import Review
+from wishlist.models import WishlistItem
+from .models import Product, Variation
+from .utils import get_similar_products, get_frequently_bought_together
+
+
+def _false():
+    return Value(False, output_field=BooleanField())
+
+
+def load_product_detail(request, product_slug, review_limit=10):
+    """
+    Build the product detail page context in a fixed number of queries.
+
+    The wishlist and purchase checks are folded into the product query as
+    EXISTS annotations, the cart check reads the request's shared cart
+    snapshot, and images, active variations and reviews are prefetched, so
+    the cost does not depend on how many images, variations or reviews the
+    product has:
+
+    - product with category and annotations
+    - product images
+    - active color/size variations
+    - latest approved reviews (with their authors)
+    - the current user's own review (authenticated users only)
+    - similar products
+    - frequently bought together
+
+    Args:
+        request: Current request (for the user and cart session)
+        product_slug: Slug of an available product
+        review_limit: Number of latest approved reviews to show
+
+    Returns:
+        dict: Template context for product_detail.html
+    """
+    user = request.user
+
+    annotations = {
+        'in_wishlist': _false(),
+        # Not named user_can_review: that would shadow Product.user_can_review(user)
+        'can_review_annotated': _false(),
+    }
+    prefetches = [
+        'product_images',
+        Prefetch(
+            'variation_set',
+            queryset=Variation.objects.filter(is_active=True, variation_category__in=['color', 'size']),
+            to_attr='active_variations',
+        ),
+        Prefetch(
+            'reviews',
+            queryset=Review.objects.filter(is_approved=True).select_related('user').order_by('-created_at')[:review_limit],
+            to_attr='latest_reviews',
+        ),
+    ]
+
+    if user.is_authenticated:
+        annotations['in_wishlist'] = Exists(WishlistItem.objects.filter(
+            wishlist__user=user,
+            product=OuterRef('pk'),
+        ))
+        # User can review only products they have purchased
+        annotations['can_review_annotated'] = Exists(OrderProduct.objects.filter(
+            user=user,
+            product=OuterRef('pk'),
+            ordered=True,
+        ))
+        prefetches.append(Prefetch('reviews', queryset=Review.objects.filter(user=user), to_attr='user_reviews'))
+
+    product = get_object_or_404(
+        Product.objects.select_related('category').annotate(**annotations).prefetch_related(*prefetches),
+        slug=product_slug,
+        is_available=True,
+    )
+
+    colors = [v for v in product.active_variations if v.variation_category == 'color']
+    sizes = [v for v in product.active_variations if v.variation_category == 'size']
+    user_review = product.user_reviews[0] if getattr(product, 'user_reviews', None) else None
+
+    return {
+        'product': product,
+        'in_cart': product.id in get_cart_snapshot(request).product_ids,
+        'in_wishlist': product.in_wishlist,
+        'colors': colors,
+        'sizes': sizes,
+        'has_variations': bool(colors or sizes),
+        'product_images': product.product_images.all(),
+        'reviews': product.latest_reviews,
+        'avg_rating': product.get_average_rating(),
+        'review_count': product.get_review_count(),
+        'user_review': user_review,
+        'user_can_review': product.can_review_annotated,
+        'user_has_reviewed': user_review is not None,
+        'similar_products': list(get_similar_products(product, limit=4)),
+        'frequently_bought': get_frequently_bought_together(product, limit=4),
+    }
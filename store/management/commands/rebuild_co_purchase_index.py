@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from store.utils import rebuild_co_purchase_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "frequently bought together" co-purchase index from finalized orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows read and written per batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        pairs = rebuild_co_purchase_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt co-purchase index with {pairs} product pairs.'))
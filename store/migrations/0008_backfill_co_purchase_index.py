@@ -0,0 +1,38 @@
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import migrations
+
+
+def backfill_co_purchase_index(apps, schema_editor):
+    OrderProduct = apps.get_model('orders', 'OrderProduct')
+    ProductCoPurchase = apps.get_model('store', 'ProductCoPurchase')
+
+    counts = Counter()
+    rows = OrderProduct.objects.filter(order__is_ordered=True).values_list(
+        'order_id', 'product_id'
+    ).order_by('order_id').distinct()
+    for _, order_rows in groupby(rows.iterator(chunk_size=1000), key=itemgetter(0)):
+        product_ids = sorted({product_id for _, product_id in order_rows})
+        counts.update((a, b) for a in product_ids for b in product_ids if a != b)
+
+    ProductCoPurchase.objects.bulk_create(
+        (
+            ProductCoPurchase(product_id=a, related_product_id=b, order_count=count)
+            for (a, b), count in counts.items()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_productcopurchase'),
+        ('orders', '0003_order_delivered_at_order_discount_order_final_total_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_co_purchase_index, migrations.RunPython.noop),
+    ]
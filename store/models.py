@@ -1,5 +1,6 @@
 from django.db import models
 from category.models import Category
+from .fields import SearchDocumentField
 from django.urls import reverse
 
 
@@ -29,6 +30,18 @@ class Product(models.Model):
         help_text="GST percentage for this product (e.g., 2.00 for 2%, 5.00 for 5%, 18.00 for 18%)"
     )
 
+    # Denormalized review aggregates (kept in sync by the reviews app)
+    rating_avg = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+
+    # Full-text search document (PostgreSQL only, maintained by store.search)
+    search_vector = SearchDocumentField(null=True, editable=False)
+
     def get_url(self):
         return reverse('product_detail', args=[self.category.slug, self.slug])
     
@@ -40,8 +53,8 @@ class Product(models.Model):
         return 0
     
     def get_current_price(self):
-        """Get current price (sale price if available, else regular price)"""
-        if self.sale_price and self.is_available:
+        """Get current price (sale price while on sale, else regular price)"""
+        if self.is_on_sale():
             return self.sale_price
         return self.price
     
@@ -58,24 +71,21 @@ class Product(models.Model):
     
     def get_average_rating(self):
         """Get average rating from approved reviews"""
-        from reviews.models import Review
-        from django.db.models import Avg
-        result = Review.objects.filter(
-            product=self, 
-            is_approved=True
-        ).aggregate(Avg('rating'))
-        return result['rating__avg'] or 0
+        return float(self.rating_avg) if self.rating_count else 0
     
     def get_review_count(self):
         """Get count of approved reviews"""
-        from reviews.models import Review
-        return Review.objects.filter(product=self, is_approved=True).count()
+        return self.rating_count
     
     def get_rating_percentage(self):
         """Get rating as percentage (for star display)"""
         avg_rating = self.get_average_rating()
         return (avg_rating / 5) * 100 if avg_rating else 0
     
+    def get_rating_histogram(self):
+        """Get (stars, count) pairs from 5 stars down to 1 star"""
+        return [(stars, getattr(self, f'rating_{stars}_count')) for stars in range(5, 0, -1)]
+    
     def user_can_review(self, user):
         """Check if user can review this product (must have purchased it)"""
         if not user.is_authenticated:
@@ -210,4 +220,22 @@ class Banner(models.Model):
     @classmethod
     def get_active_banner(cls):
         """Get the first active banner"""
-        return cls.objects.filter(is_active=True).first()
\ No newline at end of file
+        return cls.objects.filter(is_active=True).first()
+
+class ProductCoPurchase(models.Model):
+    """How many finalized orders contained both products (kept for both directions of each pair)"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='co_purchases')
+    related_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    order_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('product', 'related_product')
+        indexes = [
+            models.Index(fields=['product', '-order_count'], name='store_copurchase_top_idx'),
+        ]
+        verbose_name = 'co-purchase'
+        verbose_name_plural = 'co-purchases'
+
+    def __str__(self):
+        return f"{self.product_id} + {self.related_product_id} ({self.order_count} orders)"
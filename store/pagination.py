@@ -0,0 +1,195 @@
+"""
+Keyset (cursor) pagination.
+
+Offset pagination has to COUNT(*) the whole result and skip OFFSET rows on
+every request, so deep pages get slower as the table grows. A keyset page
+instead continues from the last row seen: the cursor carries the sort value
+and primary key of the boundary row, and the next page is a plain
+``WHERE (sort, pk) > (value, pk) ORDER BY sort, pk LIMIT n``, which costs the
+same on page 1 and page 1000.
+
+The total is optional and approximate: it is counted once and cached for a
+few minutes per distinct query instead of being recounted on every page.
+"""
+import base64
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+COUNT_CACHE_TIMEOUT = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 300)
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded"""
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision (DjangoJSONEncoder rounds to milliseconds)"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'v': values, 'd': direction}, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload['v'], payload['d']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values, direction
+
+
+def cached_count(queryset, timeout=COUNT_CACHE_TIMEOUT):
+    """
+    Count a queryset, reusing a recent count of the same query.
+
+    The count may be up to ``timeout`` seconds stale, which is fine for an
+    "N items found" label but not for anything that needs an exact figure.
+    """
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+    key = 'count:' + hashlib.md5(sql.encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class KeysetPage:
+    """One page of a keyset paginated queryset (iterable like a Paginator page)"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not (self._has_next and self.object_list):
+            return None
+        return encode_cursor(self.paginator.cursor_values(self.object_list[-1]), 'next')
+
+    @property
+    def previous_cursor(self):
+        if not (self._has_previous and self.object_list):
+            return None
+        return encode_cursor(self.paginator.cursor_values(self.object_list[0]), 'prev')
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on ``ordering`` with the primary key as tiebreaker.
+
+    Args:
+        queryset: Queryset to paginate (its own ordering is replaced)
+        per_page: Page size
+        ordering: Field or annotation name, '-' prefixed for descending.
+            Must not be nullable, otherwise rows with NULL would be skipped.
+    """
+
+    def __init__(self, queryset, per_page, ordering='-pk'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        if self.field == 'pk':
+            self.field = queryset.model._meta.pk.name
+
+    @property
+    def count(self):
+        return cached_count(self.queryset)
+
+    def cursor_values(self, obj):
+        pk_name = self.queryset.model._meta.pk.attname
+        return [getattr(obj, self.field), getattr(obj, pk_name)]
+
+    def _output_field(self, name):
+        annotations = self.queryset.query.annotations
+        if name in annotations:
+            return annotations[name].output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _parse(self, values):
+        value, pk = values
+        return self._output_field(self.field).to_python(value), self.queryset.model._meta.pk.to_python(pk)
+
+    def _seek(self, values, forward):
+        value, pk = values
+        pk_name = self.queryset.model._meta.pk.name
+        # Walking forward through a descending list means going to smaller values
+        lookup = 'lt' if forward == self.descending else 'gt'
+        if self.field == pk_name:
+            return Q(**{f'{pk_name}__{lookup}': pk})
+        return Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value, f'{pk_name}__{lookup}': pk})
+
+    def _order_by(self, forward):
+        descending = self.descending if forward else not self.descending
+        prefix = '-' if descending else ''
+        pk_name = self.queryset.model._meta.pk.name
+        if self.field == pk_name:
+            return [f'{prefix}{pk_name}']
+        return [f'{prefix}{self.field}', f'{prefix}{pk_name}']
+
+    def get_page(self, cursor=None):
+        """
+        Get the page after (or before) ``cursor``; a missing or malformed
+        cursor returns the first page.
+        """
+        values, direction = None, 'next'
+        if cursor:
+            try:
+                values, direction = decode_cursor(cursor)
+                values = self._parse(values)
+            except (InvalidCursor, ValidationError, ValueError, TypeError):
+                values, direction = None, 'next'
+
+        forward = direction == 'next'
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        rows = list(queryset.order_by(*self._order_by(forward))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if forward:
+            return KeysetPage(rows, self, has_next=has_more, has_previous=values is not None)
+        rows.reverse()
+        return KeysetPage(rows, self, has_next=True, has_previous=has_more)
@@ -0,0 +1,151 @@
+"""
+Product search backends.
+
+Every backend takes a Product queryset and a keyword and returns the
+matching products annotated with a ``search_rank`` (higher is better), so
+the store filters and sorting can still be applied on top of the result.
+
+The backend is chosen with settings.PRODUCT_SEARCH_BACKEND ('postgres',
+'sqlite_fts' or 'simple'). When unset it follows the database vendor:
+PostgreSQL full-text search with a GIN index in production, an SQLite FTS5
+table in development and tests.
+"""
+import logging
+import re
+
+from django.conf import settings
+from django.db import connection, DatabaseError
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'store_product_fts'
+
+
+class SimpleSearchBackend:
+    """Unindexed substring search (fallback when no full-text index is available)"""
+    name = 'simple'
+
+    def search(self, queryset, keyword):
+        return queryset.filter(
+            Q(product_name__icontains=keyword) | Q(description__icontains=keyword)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_product(self, product):
+        """Bring the search index up to date for a saved product"""
+
+    def remove_product(self, product_id):
+        """Drop a deleted product from the search index"""
+
+
+class PostgresSearchBackend(SimpleSearchBackend):
+    """
+    PostgreSQL full-text search over Product.search_vector (GIN indexed).
+
+    django.contrib.postgres needs psycopg2, so it is only imported when
+    this backend is used.
+    """
+    name = 'postgres'
+    config = 'english'
+
+    def search_vector(self):
+        from django.contrib.postgres.search import SearchVector
+
+        return (
+            SearchVector('product_name', weight='A', config=self.config)
+            + SearchVector('description', weight='B', config=self.config)
+        )
+
+    def search(self, queryset, keyword):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+        query = SearchQuery(keyword, search_type='websearch', config=self.config)
+        # The column is already a tsvector; the cast only gives it the field
+        # type whose lookups compile to the @@ match operator
+        document = Cast('search_vector', output_field=SearchVectorField())
+        return queryset.alias(search_document=document).filter(search_document=query).annotate(
+            search_rank=SearchRank(F('search_document'), query)
+        )
+
+    def index_product(self, product):
+        # Queryset update, so post_save is not sent again
+        Product.objects.filter(pk=product.pk).update(search_vector=self.search_vector())
+
+
+class SQLiteFTSSearchBackend(SimpleSearchBackend):
+    """SQLite FTS5 search (development and tests)"""
+    name = 'sqlite_fts'
+
+    @staticmethod
+    def match_expression(keyword):
+        """Turn free text into an FTS5 query: every word must match as a prefix"""
+        terms = re.findall(r'\w+', keyword)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, keyword):
+        match = self.match_expression(keyword)
+        if not match:
+            return queryset.none()
+
+        # Both the matching rows and their ranks stay in SQL, so every match
+        # is counted and paginated however many there are
+        matches = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        # bm25() is lower-is-better; product names weigh more than descriptions
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{Product._meta.db_table}"."id"',
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+    def index_product(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, product_name, description) VALUES (%s, %s, %s)',
+                [product.pk, product.product_name, product.description],
+            )
+
+    def remove_product(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (SimpleSearchBackend, PostgresSearchBackend, SQLiteFTSSearchBackend)
+}
+
+
+_fts_table_found = False
+
+
+def _sqlite_fts_available():
+    global _fts_table_found
+    if not _fts_table_found:
+        try:
+            _fts_table_found = FTS_TABLE in connection.introspection.table_names()
+        except DatabaseError:
+            return False
+    return _fts_table_found
+
+
+def get_search_backend():
+    """Get the configured product search backend"""
+    name = getattr(settings, 'PRODUCT_SEARCH_BACKEND', '')
+    if not name:
+        if connection.vendor == 'postgresql':
+            name = 'postgres'
+        elif connection.vendor == 'sqlite' and _sqlite_fts_available():
+            name = 'sqlite_fts'
+        else:
+            name = 'simple'
+    if name not in BACKENDS:
+        logger.warning(f"Unknown PRODUCT_SEARCH_BACKEND '{name}', using simple search")
+        name = 'simple'
+    return BACKENDS[name]()
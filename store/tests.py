@@ -1,3 +1,445 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Account
+from cart.models import Cart, CartItem
+from cart.snapshot import get_cart_snapshot
+from category.models import Category
+from orders.models import Order, OrderProduct
+from reviews.models import Review
+from wishlist.models import Wishlist, WishlistItem
+from .facets import get_store_facets
+from .home import HomePage
+from .loaders import load_product_detail
+from .models import Product, ProductCoPurchase, ProductImage, Variation
+from .pagination import KeysetPaginator
+from .search import FTS_TABLE, get_search_backend
+from .utils import rebuild_co_purchase_index, record_co_purchases
+
+
+class ProductDetailLoaderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(Category_name='Attar', slug='attar')
+        cls.product = cls._create_product('Oud', stock=10)
+        cls.other = cls._create_product('Musk', stock=5)
+        for i in range(3):
+            ProductImage.objects.create(product=cls.product, image=f'photos/products/gallery/oud-{i}.jpg')
+        for value in ['red', 'blue']:
+            Variation.objects.create(product=cls.product, variation_category='color', variation_value=value)
+        Variation.objects.create(product=cls.product, variation_category='size', variation_value='small')
+
+        cls.user = Account.objects.create_user('Asha', 'Rao', 'asha', 'asha@example.com', 'secret')
+        reviewers = [
+            Account.objects.create_user('R', str(i), f'reviewer{i}', f'reviewer{i}@example.com', 'secret')
+            for i in range(4)
+        ]
+        for i, reviewer in enumerate(reviewers):
+            Review.objects.create(product=cls.product, user=reviewer, rating=i + 2, is_approved=True)
+        Review.objects.create(product=cls.product, user=cls.user, rating=5, is_approved=True)
+
+        order = Order.objects.create(
+            user=cls.user, order_number='20250101-000001-01', first_name='Asha', last_name='Rao',
+            phone='9999999999', email='asha@example.com', address_line_1='1 Street', city='Pune',
+            state='MH', country='India', order_total=100, tax=0, is_ordered=True,
+        )
+        for product in [cls.product, cls.other]:
+            OrderProduct.objects.create(
+                order=order, user=cls.user, product=product, quantity=1, product_price=product.price, ordered=True,
+            )
+        record_co_purchases(order)
+        wishlist = Wishlist.objects.create(user=cls.user)
+        WishlistItem.objects.create(wishlist=wishlist, product=cls.product)
+
+    @classmethod
+    def _create_product(cls, name, stock):
+        return Product.objects.create(
+            product_name=name, slug=name.lower(), price=500, stock=stock,
+            category=cls.category, images=f'photos/products/{name.lower()}.jpg',
+        )
+
+    def _request(self, user):
+        request = RequestFactory().get(reverse('product_detail', args=[self.product.slug]))
+        request.user = user
+        request.session = SessionStore()
+        request.session.create()
+        return request
+
+    def _load_cart_snapshot(self, request):
+        # The navbar badge loads the shared cart snapshot for every page
+        return get_cart_snapshot(request).count
+
+    def test_anonymous_query_budget(self):
+        request = self._request(AnonymousUser())
+        Cart.objects.create(cart_id=request.session.session_key)
+        self._load_cart_snapshot(request)
+
+        with self.assertNumQueries(6):
+            context = load_product_detail(request, self.product.slug)
+            list(context['product_images'])
+
+        self.assertFalse(context['in_cart'])
+        self.assertFalse(context['in_wishlist'])
+        self.assertEqual(len(context['colors']), 2)
+        self.assertEqual(len(context['sizes']), 1)
+        self.assertEqual(len(context['reviews']), 5)
+        self.assertEqual(context['review_count'], 5)
+        self.assertIsNone(context['user_review'])
+
+    def test_authenticated_query_budget(self):
+        request = self._request(self.user)
+        cart = Cart.objects.create(cart_id=request.session.session_key, user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+        self._load_cart_snapshot(request)
+
+        with self.assertNumQueries(7):
+            context = load_product_detail(request, self.product.slug)
+            list(context['product_images'])
+            [review.user.get_display_name() for review in context['reviews']]
+
+        self.assertTrue(context['in_cart'])
+        self.assertTrue(context['in_wishlist'])
+        self.assertTrue(context['user_can_review'])
+        # The annotation does not shadow the model method
+        self.assertTrue(context['product'].user_can_review(self.user))
+        self.assertTrue(context['user_has_reviewed'])
+        self.assertEqual(context['user_review'].rating, 5)
+        self.assertEqual(context['frequently_bought'], [self.other])
+
+
+class SearchBackendSelectionTests(TestCase):
+    def test_follows_database_vendor(self):
+        self.assertEqual(get_search_backend().name, 'sqlite_fts' if connection.vendor == 'sqlite' else 'postgres')
+        with mock.patch('store.search.connection') as fake_connection:
+            fake_connection.vendor = 'postgresql'
+            self.assertEqual(get_search_backend().name, 'postgres')
+            fake_connection.vendor = 'mysql'
+            self.assertEqual(get_search_backend().name, 'simple')
+
+    @override_settings(PRODUCT_SEARCH_BACKEND='simple')
+    def test_setting_overrides_vendor(self):
+        self.assertEqual(get_search_backend().name, 'simple')
+
+    @override_settings(PRODUCT_SEARCH_BACKEND='elastic')
+    def test_unknown_setting_falls_back_to_simple(self):
+        with self.assertLogs('store.search', level='WARNING'):
+            self.assertEqual(get_search_backend().name, 'simple')
+
+
+class SearchTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(Category_name='Attar', slug='attar')
+        cls.oud = cls._create_product('Royal Oud', description='Smoky and deep')
+        cls.rose = cls._create_product('Rose Water', description='Pairs well with oud')
+        cls.musk = cls._create_product('White Musk', description='Clean and soft')
+
+    @classmethod
+    def _create_product(cls, name, description=''):
+        return Product.objects.create(
+            product_name=name, slug=name.lower().replace(' ', '-'), description=description,
+            price=500, stock=10, category=cls.category, images='photos/products/x.jpg',
+        )
+
+    def search(self, keyword):
+        return get_search_backend().search(Product.objects.all(), keyword)
+
+
+class SimpleSearchTests(SearchTestMixin, TestCase):
+    @override_settings(PRODUCT_SEARCH_BACKEND='simple')
+    def test_matches_name_and_description_substrings(self):
+        self.assertEqual(set(self.search('oud')), {self.oud, self.rose})
+        self.assertEqual(list(self.search('lavender')), [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite FTS5 backend')
+class SQLiteFTSSearchTests(SearchTestMixin, TestCase):
+    def test_ranks_name_matches_above_description_matches(self):
+        results = list(self.search('oud').order_by('-search_rank'))
+        self.assertEqual(results, [self.oud, self.rose])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(list(self.search('roya')), [self.oud])
+        self.assertEqual(list(self.search('rose wat')), [self.rose])
+        self.assertEqual(list(self.search('!!')), [])
+
+    def test_save_reindexes_product(self):
+        self.musk.product_name = 'Amber Musk'
+        self.musk.save()
+        self.assertEqual(list(self.search('amber')), [self.musk])
+        self.assertEqual(list(self.search('white')), [])
+
+    def test_save_without_search_fields_skips_reindex(self):
+        # Change the name behind the ORM's back; a stock-only save must not reindex it
+        Product.objects.filter(pk=self.musk.pk).update(product_name='Amber Musk')
+        self.musk.stock = 3
+        self.musk.save(update_fields=['stock'])
+        self.assertEqual(list(self.search('white')), [self.musk])
+        self.assertEqual(list(self.search('amber')), [])
+
+    def test_delete_removes_product_from_index(self):
+        musk_id = self.musk.pk
+        self.musk.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE rowid = %s', [musk_id])
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(list(self.search('musk')), [])
+
+    def test_returns_every_match(self):
+        backend = get_search_backend()
+        extra = Product.objects.bulk_create([
+            Product(
+                product_name=f'Sandal {i}', slug=f'sandal-{i}', price=500, stock=10,
+                category=self.category, images='photos/products/x.jpg',
+            )
+            for i in range(600)
+        ])
+        for product in extra:
+            backend.index_product(product)
+        results = self.search('sandal')
+        self.assertEqual(results.count(), 600)
+        self.assertEqual(len(results.order_by('-search_rank')[550:]), 50)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL full-text search backend')
+class PostgresSearchTests(SearchTestMixin, TestCase):
+    def test_ranks_name_matches_above_description_matches(self):
+        self.assertEqual(list(self.search('oud').order_by('-search_rank')), [self.oud, self.rose])
+
+    def test_save_reindexes_product(self):
+        self.musk.product_name = 'Amber Musk'
+        self.musk.save()
+        self.assertEqual(list(self.search('amber')), [self.musk])
+
+
+class CoPurchaseTests(SearchTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = Account.objects.create_user('Asha', 'Rao', 'asha', 'asha@example.com', 'secret')
+
+    def order(self, *products):
+        order = Order.objects.create(
+            user=self.user, order_number=f'2025-{Order.objects.count()}', first_name='Asha', last_name='Rao',
+            phone='9999999999', email='asha@example.com', address_line_1='1 Street', city='Pune',
+            state='MH', country='India', order_total=0, tax=0, is_ordered=True,
+        )
+        for product in products:
+            OrderProduct.objects.create(
+                order=order, user=self.user, product=product, quantity=1, product_price=500, ordered=True,
+            )
+        return order
+
+    def counts(self):
+        return {
+            (row.product_id, row.related_product_id): row.order_count
+            for row in ProductCoPurchase.objects.all()
+        }
+
+    def test_orders_increment_both_directions(self):
+        record_co_purchases(self.order(self.oud, self.rose))
+        record_co_purchases(self.order(self.oud, self.rose, self.musk))
+        record_co_purchases(self.order(self.musk))
+
+        counts = self.counts()
+        self.assertEqual(counts[(self.oud.id, self.rose.id)], 2)
+        self.assertEqual(counts[(self.rose.id, self.oud.id)], 2)
+        self.assertEqual(counts[(self.musk.id, self.oud.id)], 1)
+        self.assertEqual(len(counts), 6)
+
+        self.assertEqual(rebuild_co_purchase_index(), 6)
+        self.assertEqual(self.counts(), counts)
+
+    def test_pair_created_concurrently_keeps_both_increments(self):
+        bulk_create = ProductCoPurchase.objects.bulk_create
+
+        def concurrent_bulk_create(objs, **kwargs):
+            # Another order records the same pair just before our insert
+            ProductCoPurchase.objects.create(product=self.oud, related_product=self.rose, order_count=1)
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(ProductCoPurchase.objects, 'bulk_create', concurrent_bulk_create):
+            record_co_purchases(self.order(self.oud, self.rose))
+
+        counts = self.counts()
+        self.assertEqual(counts[(self.oud.id, self.rose.id)], 2)
+        self.assertEqual(counts[(self.rose.id, self.oud.id)], 1)
+
+
+class StoreFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.attar = Category.objects.create(Category_name='Attar', slug='attar')
+        cls.mist = Category.objects.create(Category_name='Mist', slug='mist')
+        cls.oud = cls._create_product('Oud', cls.attar, price=1200, stock=3, sale_price=999)
+        cls._create_product('Musk', cls.attar, price=300, stock=0)
+        cls._create_product('Rose', cls.mist, price=450, stock=8)
+        cls._create_product('Amber', cls.mist, price=9000, stock=8, is_available=False)
+
+    @classmethod
+    def _create_product(cls, name, category, price, stock, **fields):
+        return Product.objects.create(
+            product_name=name, slug=name.lower(), price=price, stock=stock,
+            category=category, images='photos/products/x.jpg', **fields,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_available_products(self):
+        facets = get_store_facets()
+        self.assertEqual(facets['price_bounds'], {'min': 300, 'max': 1200, 'slider_min': 0, 'slider_max': 5000})
+        self.assertEqual(facets['total_count'], 3)
+        self.assertEqual(facets['on_sale_count'], 1)
+        self.assertEqual(facets['in_stock_count'], 2)
+        self.assertEqual(
+            [(row['slug'], row['product_count']) for row in facets['categories']], [('attar', 2), ('mist', 1)],
+        )
+
+    def test_cached_until_products_change(self):
+        get_store_facets()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_store_facets()['total_count'], 3)
+
+        self.oud.is_available = False
+        self.oud.save()
+        facets = get_store_facets()
+        self.assertEqual(facets['total_count'], 2)
+        self.assertEqual(facets['price_bounds']['max'], 450)
+
+    def test_category_change_invalidates(self):
+        get_store_facets()
+        Category.objects.create(Category_name='Bakhoor', slug='bakhoor')
+        self.assertEqual(len(get_store_facets()['categories']), 3)
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(Category_name='Attar', slug='attar')
+        # Repeated prices, so pages must break ties on the primary key
+        cls.products = [
+            Product.objects.create(
+                product_name=f'Attar {i}', slug=f'attar-{i}', price=price, stock=5,
+                category=category, images='photos/products/x.jpg',
+            )
+            for i, price in enumerate([300, 500, 500, 500, 700, 700, 900, 1100, 1100, 1300, 1500, 1700, 1900])
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, ordering, per_page=3):
+        paginator = KeysetPaginator(Product.objects.all(), per_page, ordering=ordering)
+        pages = [paginator.get_page()]
+        while pages[-1].next_cursor:
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_pages_cover_every_row_once_in_order(self):
+        for ordering in ['price', '-price', '-pk']:
+            with self.subTest(ordering=ordering):
+                _, pages = self.walk(ordering)
+                rows = [product for page in pages for product in page]
+                expected = sorted(self.products, key=lambda p: (p.price, p.pk), reverse=ordering.startswith('-'))
+                self.assertEqual(rows, expected)
+                self.assertFalse(pages[0].has_previous())
+                self.assertFalse(pages[-1].has_next())
+
+    def test_previous_cursor_returns_the_page_before(self):
+        paginator, pages = self.walk('price')
+        for before, page in zip(pages, pages[1:]):
+            previous = paginator.get_page(page.previous_cursor)
+            self.assertEqual(list(previous), list(before))
+            self.assertTrue(previous.has_next())
+
+    def test_every_page_costs_one_query(self):
+        paginator, pages = self.walk('price')
+        with self.assertNumQueries(1):
+            list(paginator.get_page(pages[-2].next_cursor))
+
+    def test_malformed_cursor_returns_first_page(self):
+        paginator, pages = self.walk('price')
+        for cursor in ['garbage', 'eyJ2IjpbXSwiZCI6Im5leHQifQ']:
+            self.assertEqual(list(paginator.get_page(cursor)), list(pages[0]))
+
+    def test_count_is_cached(self):
+        paginator = KeysetPaginator(Product.objects.filter(price__gte=700), 3, ordering='price')
+        self.assertEqual(paginator.count, 9)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 9)
+
+    def test_store_json_listing_in_cursor_mode(self):
+        url = reverse('store')
+        data = self.client.get(url, {'format': 'json', 'cursor': '', 'sort': 'price_low_high'}).json()
+        names = [row['name'] for row in data['results']]
+        while data['next_cursor']:
+            data = self.client.get(url, {
+                'format': 'json', 'cursor': data['next_cursor'], 'sort': 'price_low_high',
+            }).json()
+            names += [row['name'] for row in data['results']]
+
+        self.assertEqual(data['count'], 13)
+        self.assertEqual(names, [product.product_name for product in self.products])
+
+
+class HomePageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(Category_name='Attar', slug='attar')
+        now = timezone.now()
+        for i in range(10):
+            cls._create_product(f'Attar {i}', is_featured=i % 2 == 0)
+        cls.live_sale = cls._create_product(
+            'Live Sale', sale_price=400, is_flash_sale=True,
+            flash_sale_start=now - timedelta(hours=1), flash_sale_end=now + timedelta(hours=1),
+        )
+        cls._create_product(
+            'Ended Sale', sale_price=400, is_flash_sale=True,
+            flash_sale_start=now - timedelta(days=2), flash_sale_end=now - timedelta(days=1),
+        )
+        cls._create_product('Hidden', is_featured=True, is_available=False)
+
+    @classmethod
+    def _create_product(cls, name, **fields):
+        return Product.objects.create(
+            product_name=name, slug=name.lower().replace(' ', '-'), price=500, stock=5,
+            category=cls.category, images='photos/products/x.jpg', **fields,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sections_are_bounded(self):
+        home = HomePage(limit=4)
+        self.assertEqual(len(home.new_arrivals), 4)
+        self.assertEqual(home.new_arrivals[0].product_name, 'Ended Sale')
+        self.assertEqual([p.product_name for p in home.featured], ['Attar 8', 'Attar 6', 'Attar 4', 'Attar 2'])
+        self.assertEqual(home.flash_sale, [self.live_sale])
+
+    def test_sections_load_lazily(self):
+        with self.assertNumQueries(0):
+            HomePage()
+
+    def test_cached_page_skips_product_queries(self):
+        self.client.get(reverse('home'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Live Sale')
+        self.assertFalse([q for q in queries if 'store_product' in q['sql']])
+
+    def test_product_change_refreshes_page(self):
+        self.client.get(reverse('home'))
+        self.live_sale.product_name = 'Renamed Sale'
+        self.live_sale.save()
+        self.assertContains(self.client.get(reverse('home')), 'Renamed Sale')
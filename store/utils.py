@@ -1,4 +1,10 @@
-from .models import Product
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Product, ProductCoPurchase
 from orders.models import OrderProduct
 
 
@@ -12,29 +18,73 @@ def get_similar_products(product, limit=4):
 
 
 def get_frequently_bought_together(product, limit=4):
-    """Get products frequently bought together"""
-    # Get orders that contain this product
-    orders_with_product = OrderProduct.objects.filter(
-        product=product
-    ).values_list('order_id', flat=True).distinct()
-    
-    # Get other products from those orders
-    from django.db.models import Count
-    frequently_bought = OrderProduct.objects.filter(
-        order_id__in=orders_with_product
-    ).exclude(product=product).values('product').annotate(
-        count=Count('product')
-    ).order_by('-count')[:limit]
-    
-    product_ids = [item['product'] for item in frequently_bought]
-    products = Product.objects.filter(
-        id__in=product_ids,
-        is_available=True
-    )
-    
-    # Return in order of frequency
-    product_dict = {p.id: p for p in products}
-    return [product_dict[pid] for pid in product_ids if pid in product_dict]
+    """Get products frequently bought together (one indexed read of the co-purchase table)"""
+    co_purchases = ProductCoPurchase.objects.filter(
+        product=product,
+        related_product__is_available=True
+    ).select_related('related_product').order_by('-order_count', 'related_product_id')[:limit]
+    return [row.related_product for row in co_purchases]
+
+
+def _co_purchase_pairs(product_ids):
+    return [(a, b) for a in product_ids for b in product_ids if a != b]
+
+
+def record_co_purchases(order):
+    """
+    Add a finalized order to the co-purchase index.
+
+    Every ordered pair of distinct products in the order gets its
+    order_count incremented by one: missing pairs are first inserted with
+    a count of zero (a single INSERT that skips rows already present), then
+    all pairs are incremented with a single UPDATE. Inserting first means
+    a pair created by a concurrent order cannot swallow this increment.
+    Call this once per order, when it is finalized.
+    """
+    product_ids = sorted(set(
+        OrderProduct.objects.filter(order=order).values_list('product_id', flat=True)
+    ))
+    if len(product_ids) < 2:
+        return
+
+    with transaction.atomic():
+        ProductCoPurchase.objects.bulk_create(
+            [
+                ProductCoPurchase(product_id=a, related_product_id=b, order_count=0)
+                for a, b in _co_purchase_pairs(product_ids)
+            ],
+            ignore_conflicts=True
+        )
+        ProductCoPurchase.objects.filter(
+            product_id__in=product_ids,
+            related_product_id__in=product_ids
+        ).update(order_count=F('order_count') + 1, updated_at=timezone.now())
+
+
+def rebuild_co_purchase_index(batch_size=1000):
+    """
+    Rebuild the co-purchase index from all finalized orders.
+
+    Returns:
+        int: Number of product pairs written
+    """
+    counts = Counter()
+    rows = OrderProduct.objects.filter(order__is_ordered=True).values_list(
+        'order_id', 'product_id'
+    ).order_by('order_id').distinct()
+    for _, order_rows in groupby(rows.iterator(chunk_size=batch_size), key=itemgetter(0)):
+        counts.update(_co_purchase_pairs(sorted({product_id for _, product_id in order_rows})))
+
+    with transaction.atomic():
+        ProductCoPurchase.objects.all().delete()
+        ProductCoPurchase.objects.bulk_create(
+            (
+                ProductCoPurchase(product_id=a, related_product_id=b, order_count=count)
+                for (a, b), count in counts.items()
+            ),
+            batch_size=batch_size
+        )
+    return len(counts)
 
 
 def check_pincode_serviceability(pincode):
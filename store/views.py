@@ -1,20 +1,18 @@
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
-from django.db.models import Q, Avg, Min, Max
 from django.http import JsonResponse
 from decimal import Decimal, InvalidOperation
 
 from category.models import Category
-from .models import Product, Variation, Pincode
-from cart.models import Cart, CartItem
-from .utils import get_similar_products, get_frequently_bought_together, check_pincode_serviceability
+from .models import Product, Pincode
+from cart.snapshot import get_cart_snapshot
+from .utils import check_pincode_serviceability
+from .loaders import load_product_detail
+from .search import get_search_backend
+from .facets import get_store_facets
+from .pagination import KeysetPaginator
 
-
-def _get_cart_id(request):
-    cart = request.session.session_key
-    if not cart:
-        cart = request.session.create()
-    return cart
+PRODUCTS_PER_PAGE = 6
 
 
 def check_pincode(request):
@@ -50,24 +48,10 @@ def check_pincode(request):
 
 
 def _get_price_bounds():
-    bounds = Product.objects.filter(is_available=True).aggregate(
-        min_price=Min('price'),
-        max_price=Max('price'),
-    )
-    min_price = bounds['min_price'] or 0
-    max_price = bounds['max_price'] or min_price
-    slider_min = 0
-    slider_max = max(max_price, min_price + 1000, 5000)
-
-    return {
-        'min': min_price,
-        'max': max_price,
-        'slider_min': slider_min,
-        'slider_max': slider_max,
-    }
+    return get_store_facets()['price_bounds']
 
 
-def _apply_product_filters(request, queryset):
+def _apply_product_filters(request, queryset, default_sort='newest'):
     price_bounds = _get_price_bounds()
 
     filters = {
@@ -75,7 +59,7 @@ def _apply_product_filters(request, queryset):
         'max_price': request.GET.get('max_price', ''),
         'sale_only': request.GET.get('sale_only') == 'on',
         'in_stock': request.GET.get('in_stock') == 'on',
-        'sort': request.GET.get('sort', 'newest'),
+        'sort': request.GET.get('sort', default_sort),
     }
 
     def parse_price(value):
@@ -111,11 +95,14 @@ def _apply_product_filters(request, queryset):
         'name_asc': 'product_name',
         'name_desc': '-product_name',
     }
+    # Relevance ordering is only available on search results
+    if 'search_rank' in queryset.query.annotations:
+        sort_map['relevance'] = '-search_rank'
     queryset = queryset.order_by(sort_map.get(filters['sort'], '-created_date'))
 
     query_params = request.GET.copy()
-    if 'page' in query_params:
-        query_params.pop('page')
+    for key in ['page', 'cursor', 'format']:
+        query_params.pop(key, None)
     clean_params = query_params.copy()
     for key in ['min_price', 'max_price']:
         if not query_params.get(key):
@@ -126,12 +113,53 @@ def _apply_product_filters(request, queryset):
         max_price_value is not None,
         filters['sale_only'],
         filters['in_stock'],
-        filters['sort'] != 'newest'
+        filters['sort'] != default_sort
     ])
 
     return queryset, filters, current_query_string, filters_applied, price_bounds
 
 
+def _paginate_products(request, products):
+    """
+    Paginate a filtered, ordered product listing.
+
+    Passing ``cursor`` (empty for the first page) switches to keyset
+    pagination on the active sort order, which costs the same on every page
+    and uses a cached total; otherwise the numbered offset pages are used.
+
+    Returns:
+        tuple: (page, product_count, pagination_mode)
+    """
+    if 'cursor' in request.GET:
+        paginator = KeysetPaginator(products, PRODUCTS_PER_PAGE, ordering=products.query.order_by[0])
+        return paginator.get_page(request.GET.get('cursor')), paginator.count, 'cursor'
+
+    paginator = Paginator(products, PRODUCTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('page')), paginator.count, 'page'
+
+
+def _products_json(page, product_count, products_in_cart):
+    """JSON listing for infinite scroll and API consumers (cursor mode)"""
+    return JsonResponse({
+        'count': product_count,
+        'next_cursor': getattr(page, 'next_cursor', None),
+        'previous_cursor': getattr(page, 'previous_cursor', None),
+        'results': [
+            {
+                'id': product.id,
+                'name': product.product_name,
+                'slug': product.slug,
+                'price': product.price,
+                'current_price': product.get_current_price(),
+                'image': product.images.url if product.images else '',
+                'in_stock': product.stock > 0,
+                'in_cart': product.id in products_in_cart,
+            }
+            for product in page
+        ],
+    })
+
+
 def store(request, category_slug=None):
     category = None
 
@@ -143,24 +171,18 @@ def store(request, category_slug=None):
 
     products, filters, current_query_string, filters_applied, price_bounds = _apply_product_filters(request, products)
 
-    # Pagination - 6 products per page
-    paginator = Paginator(products, 6)
-    page = request.GET.get('page')
-    paged_products = paginator.get_page(page)
-    product_count = products.count()
+    paged_products, product_count, pagination_mode = _paginate_products(request, products)
 
     # Check which products are in cart
-    products_in_cart = []
-    try:
-        cart = Cart.objects.get(cart_id=_get_cart_id(request))
-        cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-        products_in_cart = [item.product.id for item in cart_items]
-    except Cart.DoesNotExist:
-        products_in_cart = []
+    products_in_cart = get_cart_snapshot(request).product_ids
+
+    if request.GET.get('format') == 'json':
+        return _products_json(paged_products, product_count, products_in_cart)
 
     context = {
         'products': paged_products,
         'product_count': product_count,
+        'pagination_mode': pagination_mode,
         'selected_category': category,
         'products_in_cart': products_in_cart,
         'keyword': request.GET.get('keyword'),
@@ -168,89 +190,13 @@ def store(request, category_slug=None):
         'filters_applied': filters_applied,
         'current_query_string': current_query_string,
         'price_bounds': price_bounds,
+        'facets': get_store_facets(),
     }
     return render(request, 'store/store.html', context)
 
 
 def product_detail(request, product_slug):
-    product = get_object_or_404(Product, slug=product_slug, is_available=True)
-    
-    # Check if product is in cart
-    in_cart = False
-    try:
-        cart = Cart.objects.get(cart_id=_get_cart_id(request))
-        cart_item = CartItem.objects.filter(cart=cart, product=product).exists()
-        in_cart = cart_item
-    except Cart.DoesNotExist:
-        in_cart = False
-    
-    colors = Variation.objects.filter(product=product, variation_category='color', is_active=True)
-    sizes = Variation.objects.filter(product=product, variation_category='size', is_active=True)
-    has_variations = colors.exists() or sizes.exists()
-    
-    # Get product images
-    product_images = product.product_images.all()
-    
-    # Get reviews
-    from reviews.models import Review
-    reviews = Review.objects.filter(product=product, is_approved=True).order_by('-created_at')[:10]
-    avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] if reviews.exists() else 0
-    review_count = reviews.count()
-    
-    # Get user's review if exists
-    user_review = None
-    user_can_review = False
-    user_has_reviewed = False
-    
-    if request.user.is_authenticated:
-        # Check if user can review (has purchased the product)
-        from orders.models import OrderProduct
-        user_can_review = OrderProduct.objects.filter(
-            user=request.user,
-            product=product,
-            ordered=True
-        ).exists()
-        
-        # Check if user has already reviewed
-        try:
-            user_review = Review.objects.get(product=product, user=request.user)
-            user_has_reviewed = True
-        except Review.DoesNotExist:
-            user_review = None
-            user_has_reviewed = False
-    
-    # Get similar products
-    similar_products = get_similar_products(product, limit=4)
-    
-    # Get frequently bought together
-    frequently_bought = get_frequently_bought_together(product, limit=4)
-    
-    # Check if in wishlist
-    in_wishlist = False
-    if request.user.is_authenticated:
-        from wishlist.models import WishlistItem
-        in_wishlist = WishlistItem.objects.filter(
-            wishlist__user=request.user,
-            product=product
-        ).exists()
-    
-    context = {
-        'product': product,
-        'in_cart': in_cart,
-        'in_wishlist': in_wishlist,
-        'colors': colors,
-        'sizes': sizes,
-        'has_variations': has_variations,
-        'product_images': product_images,
-        'reviews': reviews,
-        'avg_rating': avg_rating,
-        'review_count': review_count,
-        'user_review': user_review,
-        'user_can_review': user_can_review,
-        'user_has_reviewed': user_has_reviewed,
-        'similar_products': similar_products,
-        'frequently_bought': frequently_bought,
-    }
+    context = load_product_detail(request, product_slug)
     return render(request, 'product_detail.html', context)
 
 
@@ -259,16 +205,11 @@ def search(request):
     product_count = 0
     
     if keyword:
-        products = Product.objects.filter(
-            Q(product_name__icontains=keyword) | Q(description__icontains=keyword),
-            is_available=True
-        ).distinct()
-        products, filters, current_query_string, filters_applied, price_bounds = _apply_product_filters(request, products)
-        product_count = products.count()
-
-        paginator = Paginator(products, 6)
-        page = request.GET.get('page')
-        paged_products = paginator.get_page(page)
+        products = get_search_backend().search(Product.objects.filter(is_available=True), keyword)
+        products, filters, current_query_string, filters_applied, price_bounds = _apply_product_filters(
+            request, products, default_sort='relevance'
+        )
+        paged_products, product_count, pagination_mode = _paginate_products(request, products)
     else:
         products = Product.objects.none()
         filters = {
@@ -276,27 +217,26 @@ def search(request):
             'max_price': '',
             'sale_only': False,
             'in_stock': False,
-            'sort': 'newest'
+            'sort': 'relevance'
         }
         current_query_string = ''
         filters_applied = False
         price_bounds = _get_price_bounds()
-        paginator = Paginator(products, 6)
+        paginator = Paginator(products, PRODUCTS_PER_PAGE)
         paged_products = paginator.get_page(1)
         product_count = 0
+        pagination_mode = 'page'
     
     # Check which products are in cart
-    products_in_cart = []
-    try:
-        cart = Cart.objects.get(cart_id=_get_cart_id(request))
-        cart_items = CartItem.objects.filter(cart=cart, is_active=True)
-        products_in_cart = [item.product.id for item in cart_items]
-    except Cart.DoesNotExist:
-        products_in_cart = []
+    products_in_cart = get_cart_snapshot(request).product_ids
+
+    if request.GET.get('format') == 'json':
+        return _products_json(paged_products, product_count, products_in_cart)
     
     context = {
         'products': paged_products,
         'product_count': product_count,
+        'pagination_mode': pagination_mode,
         'keyword': keyword,
         'selected_category': None,
         'products_in_cart': products_in_cart,
@@ -304,6 +244,7 @@ def search(request):
         'filters_applied': filters_applied,
         'current_query_string': current_query_string,
         'price_bounds': price_bounds,
+        'facets': get_store_facets(),
     }
     return render(request, 'store/store.html', context)
 
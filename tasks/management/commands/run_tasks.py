@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from tasks.queue import run_due_tasks, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (keeps polling unless --once is given)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the tasks that are due now and exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Maximum number of tasks run per poll (default: 50)',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        if options['once']:
+            ran = run_due_tasks(batch_size=options['batch_size'], worker=worker)
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} tasks.'))
+            return
+
+        self.stdout.write(f'Task worker {worker} started.')
+        try:
+            while True:
+                if not run_due_tasks(batch_size=options['batch_size'], worker=worker):
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Task worker stopped.'))
@@ -0,0 +1,163 @@
+"""
+Database-backed task queue.
+
+Slow side effects (emails, PDF invoices) are recorded as Task rows and run
+by the ``run_tasks`` worker command instead of inside the request. Tasks
+are written in the caller's transaction, so they exist exactly when the
+change that caused them is committed, and they survive restarts.
+
+    @task('orders.send_invoice_email')
+    def send_invoice_email_task(order_id):
+        ...
+
+    enqueue('orders.send_invoice_email', order_id=order.id)
+
+Handlers live in each app's tasks.py (loaded by the tasks app) and must be
+safe to run more than once: a task is retried with exponential backoff
+when it raises, and a task whose worker died is picked up again once its
+lock times out.
+
+With TASKS_ALWAYS_EAGER = True (the default) tasks run in-process right
+after the transaction commits, so nothing is lost when no worker is
+deployed. With TASKS_ALWAYS_EAGER = False they only run when a
+``run_tasks`` worker is running; without one they stay pending and the
+order emails are never sent.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASK_RETRY_BASE_SECONDS = getattr(settings, 'TASK_RETRY_BASE_SECONDS', 30)
+TASK_LOCK_TIMEOUT_SECONDS = getattr(settings, 'TASK_LOCK_TIMEOUT_SECONDS', 10 * 60)
+
+_registry = {}
+
+
+def task(name, max_attempts=5):
+    """Register a function as a task handler under ``name``"""
+    def decorator(func):
+        _registry[name] = func
+        func.task_name = name
+        func.max_attempts = max_attempts
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _registry.get(name)
+
+
+def enqueue(name, delay=None, **kwargs):
+    """
+    Queue a task.
+
+    Args:
+        name: Registered task name
+        delay: Optional timedelta before the task may run
+        **kwargs: JSON-serializable arguments for the handler
+
+    Returns:
+        Task: The queued task
+    """
+    handler = get_handler(name)
+    if handler is None:
+        raise ValueError(f"Unknown task '{name}'")
+
+    queued = Task.objects.create(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=handler.max_attempts,
+        run_at=timezone.now() + (delay or timedelta()),
+    )
+    if getattr(settings, 'TASKS_ALWAYS_EAGER', True):
+        transaction.on_commit(lambda: run_task(queued.id, worker='eager'))
+    return queued
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _claim(task_id, worker):
+    """Atomically take a due task; only one worker can win the UPDATE"""
+    return Task.objects.filter(id=task_id, status=Task.PENDING).update(
+        status=Task.RUNNING,
+        locked_at=timezone.now(),
+        locked_by=worker,
+    ) == 1
+
+
+def run_task(task_id, worker=None):
+    """
+    Claim and run one task.
+
+    Returns:
+        bool: True if the task was claimed by this call
+    """
+    worker = worker or worker_name()
+    if not _claim(task_id, worker):
+        return False
+
+    queued = Task.objects.get(id=task_id)
+    queued.attempts += 1
+    handler = get_handler(queued.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task '{queued.name}'")
+        handler(**queued.kwargs)
+    except Exception:
+        queued.last_error = traceback.format_exc()
+        if queued.attempts >= queued.max_attempts:
+            queued.status = Task.FAILED
+            queued.finished_at = timezone.now()
+            logger.error(f"Task {queued.id} {queued.name} failed after {queued.attempts} attempts")
+        else:
+            queued.status = Task.PENDING
+            queued.run_at = timezone.now() + timedelta(seconds=TASK_RETRY_BASE_SECONDS * 2 ** (queued.attempts - 1))
+            logger.warning(f"Task {queued.id} {queued.name} failed, retrying at {queued.run_at}")
+    else:
+        queued.status = Task.DONE
+        queued.finished_at = timezone.now()
+        queued.last_error = ''
+    queued.locked_at = None
+    queued.save(update_fields=['status', 'attempts', 'run_at', 'locked_at', 'last_error', 'finished_at'])
+    return True
+
+
+def requeue_stale_tasks():
+    """Give tasks whose worker stopped mid-run back to the queue"""
+    cutoff = timezone.now() - timedelta(seconds=TASK_LOCK_TIMEOUT_SECONDS)
+    return Task.objects.filter(status=Task.RUNNING, locked_at__lt=cutoff).update(
+        status=Task.PENDING, locked_at=None,
+    )
+
+
+def run_due_tasks(batch_size=50, worker=None):
+    """
+    Run the tasks that are due, oldest first.
+
+    Args:
+        batch_size: Maximum number of tasks to run
+        worker: Worker name recorded on claimed tasks
+
+    Returns:
+        int: Number of tasks run
+    """
+    worker = worker or worker_name()
+    requeue_stale_tasks()
+    due = Task.objects.filter(status=Task.PENDING, run_at__lte=timezone.now()).order_by('run_at', 'id')
+    ran = 0
+    for task_id in due.values_list('id', flat=True)[:batch_size]:
+        if run_task(task_id, worker):
+            ran += 1
+    return ran
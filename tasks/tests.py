@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .queue import (
+    TASK_LOCK_TIMEOUT_SECONDS, TASK_RETRY_BASE_SECONDS,
+    enqueue, requeue_stale_tasks, run_due_tasks, run_task, task,
+)
+
+calls = []
+
+
+@task('tests.record', max_attempts=3)
+def record(value):
+    calls.append(value)
+
+
+@task('tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+
+@override_settings(TASKS_ALWAYS_EAGER=False)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_stores_pending_task(self):
+        queued = enqueue('tests.record', value=1)
+        self.assertEqual(queued.status, Task.PENDING)
+        self.assertEqual(queued.kwargs, {'value': 1})
+        self.assertEqual(queued.max_attempts, 3)
+        self.assertEqual(calls, [])
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+    def test_run_task_runs_handler_once(self):
+        queued = enqueue('tests.record', value='a')
+        self.assertTrue(run_task(queued.id, worker='w1'))
+        # A second worker cannot claim a task that is no longer pending
+        self.assertFalse(run_task(queued.id, worker='w2'))
+
+        queued.refresh_from_db()
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(queued.status, Task.DONE)
+        self.assertEqual(queued.attempts, 1)
+        self.assertEqual(queued.locked_by, 'w1')
+        self.assertIsNotNone(queued.finished_at)
+
+    def test_running_task_cannot_be_claimed(self):
+        queued = enqueue('tests.record', value='a')
+        Task.objects.filter(id=queued.id).update(status=Task.RUNNING, locked_at=timezone.now())
+        self.assertFalse(run_task(queued.id))
+        self.assertEqual(calls, [])
+
+    def test_failure_is_retried_with_backoff(self):
+        queued = enqueue('tests.fail')
+        before = timezone.now()
+        run_task(queued.id)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.PENDING)
+        self.assertEqual(queued.attempts, 1)
+        self.assertIn('RuntimeError: boom', queued.last_error)
+        self.assertGreaterEqual(queued.run_at, before + timedelta(seconds=TASK_RETRY_BASE_SECONDS))
+        # Not due yet, so the worker leaves it alone
+        self.assertEqual(run_due_tasks(), 0)
+
+    def test_failure_after_max_attempts(self):
+        queued = enqueue('tests.fail')
+        run_task(queued.id)
+        run_task(queued.id)
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+        self.assertIsNotNone(queued.finished_at)
+        self.assertFalse(run_task(queued.id))
+
+    def test_run_due_tasks_skips_future_tasks(self):
+        enqueue('tests.record', value='now')
+        enqueue('tests.record', value='later', delay=timedelta(hours=1))
+        self.assertEqual(run_due_tasks(), 1)
+        self.assertEqual(calls, ['now'])
+
+    def test_run_due_tasks_respects_batch_size(self):
+        for value in range(3):
+            enqueue('tests.record', value=value)
+        self.assertEqual(run_due_tasks(batch_size=2), 2)
+        self.assertEqual(calls, [0, 1])
+
+    def test_stale_running_task_is_requeued(self):
+        stale = enqueue('tests.record', value='stale')
+        fresh = enqueue('tests.record', value='fresh')
+        Task.objects.filter(id=stale.id).update(
+            status=Task.RUNNING, locked_at=timezone.now() - timedelta(seconds=TASK_LOCK_TIMEOUT_SECONDS + 60),
+        )
+        Task.objects.filter(id=fresh.id).update(status=Task.RUNNING, locked_at=timezone.now())
+
+        self.assertEqual(requeue_stale_tasks(), 1)
+        self.assertEqual(Task.objects.get(id=stale.id).status, Task.PENDING)
+        self.assertEqual(Task.objects.get(id=fresh.id).status, Task.RUNNING)
+
+
+class EagerTaskTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(TASKS_ALWAYS_EAGER=True)
+    def test_eager_task_runs_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queued = enqueue('tests.record', value='eager')
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ['eager'])
+        self.assertEqual(Task.objects.get(id=queued.id).status, Task.DONE)
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_queued_task_waits_for_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queued = enqueue('tests.record', value='queued')
+        self.assertEqual(calls, [])
+        self.assertEqual(Task.objects.get(id=queued.id).status, Task.PENDING)